@@ -1,9 +1,18 @@
 from django.contrib import admin
-from .models import Usuario, Sucursal, Libro, Ejemplar, Prestamo, Reserva
+from .models import (
+    Usuario, Sucursal, Libro, Ejemplar, Prestamo, Reserva, ColaReserva, ContadorEjemplares,
+    ResumenDiarioLibro, ResumenDiarioUsuario, ResumenDiarioSucursal, MultaUsuario,
+)
 
 admin.site.register(Usuario)
 admin.site.register(Sucursal)
 admin.site.register(Libro)
 admin.site.register(Ejemplar)
 admin.site.register(Prestamo)
-admin.site.register(Reserva)
\ No newline at end of file
+admin.site.register(Reserva)
+admin.site.register(ColaReserva)
+admin.site.register(ContadorEjemplares)
+admin.site.register(ResumenDiarioLibro)
+admin.site.register(ResumenDiarioUsuario)
+admin.site.register(ResumenDiarioSucursal)
+admin.site.register(MultaUsuario)
\ No newline at end of file
@@ -0,0 +1,128 @@
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import Usuario
+
+# Autenticación JWT sin leer Usuario en cada petición.
+# El token lleva el id y el tipo del usuario; los permisos (EsAdmin, EsBibliotecarioOAdmin) solo
+# necesitan eso. La fila se carga la primera vez que una vista pide otro campo y se guarda unos
+# segundos en CACHES['usuarios'] (locmem, propia de cada proceso).
+# Revocación: el estado (activo, tipo) de cada usuario se guarda en CACHES['compartida'] durante la vida de
+# un access token. Al guardar o borrar un Usuario las señales lo reescriben; si falta (vencido, desalojado o
+# nunca leído) se consulta la base de datos, así que una marca perdida cuesta una consulta y no reabre el
+# acceso. Los tokens de un usuario desactivado, borrado o con otro tipo se rechazan en la siguiente
+# petición. Los cambios por queryset (update) no pasan por las señales: tardan hasta que vence la marca.
+
+ALIAS = 'usuarios'
+ALIAS_ESTADO = 'compartida'
+
+
+def _clave(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def obtener_usuario(usuario_id):
+    """Usuario desde la caché del proceso o, si no está, desde la base de datos."""
+    cache = caches[ALIAS]
+    usuario = cache.get(_clave(usuario_id))
+    if usuario is None:
+        usuario = Usuario.objects.filter(pk=usuario_id).first()
+        if usuario is None:
+            raise AuthenticationFailed('Usuario no encontrado.', code='user_not_found')
+        cache.set(_clave(usuario_id), usuario)
+    if not usuario.is_active:
+        raise AuthenticationFailed('Usuario inactivo.', code='user_inactive')
+    return usuario
+
+
+def olvidar_usuario(usuario_id):
+    caches[ALIAS].delete(_clave(usuario_id))
+
+
+def _clave_estado(usuario_id):
+    return f'usuario:estado:{usuario_id}'
+
+
+def _vigencia_estado():
+    return api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+
+
+def publicar_estado(usuario_id, activo, tipo):
+    """Estado vigente de un usuario modificado; tipo None si se eliminó."""
+    caches[ALIAS_ESTADO].set(_clave_estado(usuario_id), (activo, tipo), _vigencia_estado())
+
+
+def estado_usuario(usuario_id):
+    """(activo, tipo) del usuario desde CACHES['compartida'] o, si no está, desde la base de datos."""
+    cache = caches[ALIAS_ESTADO]
+    estado = cache.get(_clave_estado(usuario_id))
+    if estado is None:
+        estado = Usuario.objects.filter(pk=usuario_id).values_list('is_active', 'tipo').first() or (False, None)
+        # add: no pisa el estado que una señal haya publicado mientras tanto
+        cache.add(_clave_estado(usuario_id), estado, _vigencia_estado())
+    return estado
+
+
+def controlar_revocacion(usuario_id, tipo):
+    """Rechaza el token si el usuario fue desactivado, eliminado o cambió de tipo después de emitirlo."""
+    activo, tipo_actual = estado_usuario(usuario_id)
+    if tipo_actual is None:
+        raise AuthenticationFailed('Usuario no encontrado.', code='user_not_found')
+    if not activo:
+        raise AuthenticationFailed('Usuario inactivo.', code='user_inactive')
+    if tipo_actual != tipo:
+        raise AuthenticationFailed('El tipo de usuario cambió; refresca el token.', code='token_not_valid')
+
+
+# Usuario de la petición: id, pk y tipo salen del token; cualquier otro atributo carga la fila
+class UsuarioPerezoso(SimpleLazyObject):
+    def __init__(self, usuario_id, tipo):
+        super().__init__(lambda: obtener_usuario(usuario_id))
+        # Van al __dict__ del proxy para que leerlos no dispare la carga
+        self.__dict__.update(id=usuario_id, pk=usuario_id, tipo=tipo, is_authenticated=True, is_anonymous=False)
+
+    def __bool__(self):
+        # IsAuthenticated evalúa `request.user and ...`; sin esto el proxy cargaría la fila
+        return True
+
+
+# Token con el tipo de usuario como claim (lo heredan los access token generados al refrescar)
+class TokenBibliotecaSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['tipo'] = user.tipo
+        # El usuario ya está leído: su primera petición no tiene que consultarlo
+        publicar_estado(user.pk, user.is_active, user.tipo)
+        return token
+
+
+# Al refrescar, el access token nuevo lleva el tipo actual y no el del momento del login
+class TokenRefrescoSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        datos = super().validate(attrs)
+        access = AccessToken(datos['access'])
+        usuarios = Usuario.objects.filter(pk=access[api_settings.USER_ID_CLAIM])
+        access['tipo'] = usuarios.values_list('tipo', flat=True).get()
+        # TokenRefreshSerializer ya rechazó a los usuarios inactivos
+        publicar_estado(access[api_settings.USER_ID_CLAIM], True, access['tipo'])
+        datos['access'] = str(access)
+        return datos
+
+
+# JWTAuthentication sin la consulta del usuario
+class JWTAutenticacionSinConsulta(JWTAuthentication):
+    def get_user(self, validated_token):
+        if 'tipo' not in validated_token:
+            # Tokens emitidos antes de incluir el claim: camino normal con consulta
+            return super().get_user(validated_token)
+        try:
+            usuario_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValueError):
+            return super().get_user(validated_token)
+        controlar_revocacion(usuario_id, validated_token['tipo'])
+        return UsuarioPerezoso(usuario_id, validated_token['tipo'])
@@ -0,0 +1,105 @@
+import re
+from django.db import connection
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+from django.db.models.expressions import RawSQL
+from .importacion import normalizar_isbn
+from .models import ContadorEjemplares
+
+# Columnas cubiertas por el índice FULLTEXT (ver migración 0004_libro_fulltext)
+CAMPOS_TEXTO = ('titulo', 'autor', 'isbn', 'genero')
+
+
+def normalizar_terminos(texto):
+    """Separa el texto en palabras, sin operadores del modo booleano de MySQL."""
+    return [t for t in re.split(r'[^\w]+', texto.lower()) if t]
+
+
+def digitos_isbn(texto):
+    """Devuelve el ISBN sin guiones si el texto es un ISBN-10/13 completo, si no None."""
+    digitos = re.sub(r'[\-\s]', '', texto.strip()).upper()
+    if re.fullmatch(r'\d{9}[\dX]|\d{13}', digitos):
+        return digitos
+    return None
+
+
+def filtrar_libros(queryset, parametros):
+    """Filtros de la búsqueda de libros (?q=, titulo, autor, isbn, genero, ano_publicacion, disponible, sucursal)."""
+    q = parametros.get('q')
+    titulo = parametros.get('titulo')
+    autor = parametros.get('autor')
+    isbn = parametros.get('isbn')
+    genero = parametros.get('genero')
+    ano_publicacion = parametros.get('ano_publicacion')
+    disponible = parametros.get('disponible')
+    sucursal = parametros.get('sucursal')
+    if q:
+        # Texto libre sobre titulo, autor, isbn y genero ordenado por relevancia
+        queryset = buscar_libros(queryset, q)
+    if titulo:
+        queryset = queryset.filter(titulo__icontains=titulo)
+    if autor:
+        queryset = queryset.filter(autor__icontains=autor)
+    if isbn:
+        # Un ISBN completo (10 o 13, con o sin guiones) se compara también en la forma en que se guarda
+        filtro = Q(isbn__icontains=isbn)
+        normalizado = normalizar_isbn(isbn)
+        if normalizado:
+            filtro |= Q(isbn=normalizado)
+        queryset = queryset.filter(filtro)
+    if genero:
+        queryset = queryset.filter(genero__icontains=genero)
+    if ano_publicacion:
+        queryset = queryset.filter(ano_publicacion=ano_publicacion)
+    # Exists sobre los contadores en vez de join + distinct para no alterar los conteos anotados
+    if disponible == 'true':
+        queryset = queryset.filter(Exists(
+            ContadorEjemplares.objects.filter(libro=OuterRef('pk'), estado='disponible', cantidad__gt=0)
+        ))
+    if sucursal:
+        queryset = queryset.filter(Exists(
+            ContadorEjemplares.objects.filter(libro=OuterRef('pk'), sucursal_id=sucursal, cantidad__gt=0)
+        ))
+    return queryset
+
+
+def buscar_libros(queryset, texto):
+    """Filtra y ordena por relevancia usando el backend que corresponde al motor de base de datos."""
+    terminos = normalizar_terminos(texto)
+    if not terminos:
+        return queryset.none()
+    isbn = digitos_isbn(texto)
+    if isbn:
+        # Búsqueda exacta sobre el índice único de isbn: la forma normalizada con la que se guarda (ISBN-13)
+        # y la escrita, para ISBN antiguos que no se pudieron normalizar
+        valores = {texto.strip(), isbn, normalizar_isbn(isbn)} - {None}
+        return queryset.filter(isbn__in=valores).annotate(
+            relevancia=Value(1, output_field=IntegerField())
+        )
+    if connection.vendor == 'mysql':
+        return _buscar_fulltext_mysql(queryset, terminos)
+    return _buscar_generico(queryset, terminos)
+
+
+def _buscar_fulltext_mysql(queryset, terminos):
+    # Todas las palabras obligatorias y con coincidencia por prefijo: +palabra*
+    consulta = ' '.join(f'+{t}*' for t in terminos)
+    relevancia = RawSQL(
+        'MATCH (api_libro.titulo, api_libro.autor, api_libro.isbn, api_libro.genero) '
+        'AGAINST (%s IN BOOLEAN MODE)',
+        (consulta,),
+    )
+    return queryset.annotate(relevancia=relevancia).filter(relevancia__gt=0).order_by('-relevancia', 'id')
+
+
+def _buscar_generico(queryset, terminos):
+    # Cada palabra debe aparecer en algún campo; el título pesa más que el resto
+    filtro = Q()
+    puntajes = []
+    for termino in terminos:
+        filtro &= Q(*(Q(**{f'{campo}__icontains': termino}) for campo in CAMPOS_TEXTO), _connector=Q.OR)
+        puntajes += [
+            Case(When(titulo__istartswith=termino, then=Value(3)), default=Value(0), output_field=IntegerField()),
+            Case(When(titulo__icontains=termino, then=Value(2)), default=Value(0), output_field=IntegerField()),
+            Case(When(autor__icontains=termino, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        ]
+    return queryset.filter(filtro).annotate(relevancia=sum(puntajes[1:], puntajes[0])).order_by('-relevancia', 'id')
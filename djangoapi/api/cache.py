@@ -0,0 +1,100 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+from django.core.cache import caches
+from django.db import connection, transaction
+from rest_framework.response import Response
+
+# Caché de respuestas GET de lectura frecuente.
+# Cada entrada se guarda bajo la versión actual de los grupos de los que depende ('libros', 'libro:7',
+# 'cola:7'...). Invalidar un grupo es subir su versión: no hace falta recorrer claves, así que funciona
+# igual con locmem que con un backend compartido. El TTL y el desalojo LRU son los del backend
+# configurado en CACHES['respuestas'].
+
+ALIAS = 'respuestas'
+# Nombres de las vistas cacheadas, para el informe de aciertos y fallos
+VISTAS = set()
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _versiones(grupos):
+    cache = _cache()
+    claves = [f'version:{grupo}' for grupo in grupos]
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            # Versión inicial única: si el backend desalojó la clave no se reutilizan entradas viejas
+            cache.add(clave, time.time_ns(), timeout=None)
+            versiones[clave] = cache.get(clave)
+    return [versiones[clave] for clave in claves]
+
+
+def version(grupo):
+    """Versión actual de un grupo; cambia con cada invalidación (altas, cambios y bajas)."""
+    return _versiones([grupo])[0]
+
+
+def _incrementar(clave, inicial):
+    cache = _cache()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        if not cache.add(clave, inicial, timeout=None):
+            cache.incr(clave)
+
+
+def invalidar(*grupos):
+    """Sube la versión de los grupos ya y, dentro de una transacción, otra vez al confirmarla:
+    una lectura concurrente que cachee datos previos al commit queda bajo una versión descartada."""
+    def subir():
+        for grupo in grupos:
+            _incrementar(f'version:{grupo}', time.time_ns())
+    subir()
+    if connection.in_atomic_block:
+        transaction.on_commit(subir)
+
+
+def estadisticas():
+    """Aciertos y fallos por vista desde el último reinicio del backend."""
+    claves = [f'estadisticas:{vista}:{resultado}' for vista in sorted(VISTAS) for resultado in ('aciertos', 'fallos')]
+    contadores = _cache().get_many(claves)
+    return {
+        vista: {resultado: contadores.get(f'estadisticas:{vista}:{resultado}', 0) for resultado in ('aciertos', 'fallos')}
+        for vista in sorted(VISTAS)
+    }
+
+
+class RespuestaEnCacheMixin:
+    """Cachea las respuestas GET 200 por vista, ruta, parámetros y tipo de usuario.
+    `grupos_cache` son los grupos de los que depende la respuesta; admiten los kwargs de la URL ('libro:{pk}')."""
+    grupos_cache = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        VISTAS.add(cls.__name__)
+
+    def clave_cache(self, request, grupos):
+        rol = getattr(request.user, 'tipo', None) or 'anonimo'
+        parametros = urlencode(sorted(request.query_params.lists()), doseq=True)
+        partes = [type(self).__name__, request.get_host(), request.path, parametros, rol, *map(str, _versiones(grupos))]
+        return 'respuesta:' + hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        vista = type(self).__name__
+        clave = self.clave_cache(request, [grupo.format(**kwargs) for grupo in self.grupos_cache])
+        datos = _cache().get(clave)
+        if datos is not None:
+            _incrementar(f'estadisticas:{vista}:aciertos', 1)
+            respuesta = Response(datos)
+            respuesta['X-Cache'] = 'HIT'
+            return respuesta
+        _incrementar(f'estadisticas:{vista}:fallos', 1)
+        respuesta = super().get(request, *args, **kwargs)
+        # Las respuestas en streaming y los errores no se guardan
+        if isinstance(respuesta, Response) and respuesta.status_code == 200:
+            _cache().set(clave, respuesta.data)
+        respuesta['X-Cache'] = 'MISS'
+        return respuesta
@@ -0,0 +1,102 @@
+import hashlib
+from calendar import timegm
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+from .cache import version
+from .models import Libro, Reserva, Sucursal
+
+# Peticiones condicionales (ETag / Last-Modified, 304 Not Modified).
+# Los listados completos usan como ETag la versión de su grupo en api.cache, que suben altas, cambios y
+# bajas, sin consultar la base de datos y sin Last-Modified (una baja no mueve ninguna fecha). Los recursos
+# individuales usan su fila (actualizado) y la disponibilidad agregados indexados sobre los libros pedidos,
+# solo como ETag: las reservas en cola no tienen fecha de cambio que pueda ir en Last-Modified.
+
+
+def _sello(*partes):
+    """(etag, última modificación) a partir de conteos y fechas; None si el recurso no existe."""
+    if all(parte is None for parte in partes):
+        return None, None
+    fechas = [parte for parte in partes if hasattr(parte, 'timestamp')]
+    etag = hashlib.md5('|'.join(map(str, partes)).encode()).hexdigest()
+    return etag, max(fechas, default=None)
+
+
+def condicional(sello):
+    """Decorador de clase para el GET de una vista; `sello(request, **kwargs)` devuelve (etag, fecha).
+    El sello se calcula una sola vez por petición aunque Django pida ETag y Last-Modified por separado."""
+    def calcular(request, *args, **kwargs):
+        if not hasattr(request, '_sello_condicional'):
+            request._sello_condicional = sello(request, **kwargs)
+        return request._sello_condicional
+
+    return method_decorator(condition(
+        etag_func=lambda request, *args, **kwargs: calcular(request, *args, **kwargs)[0],
+        last_modified_func=lambda request, *args, **kwargs: calcular(request, *args, **kwargs)[1],
+    ), name='get')
+
+
+async def respuesta_condicional(request, sello, obtener_respuesta, **kwargs):
+    """condicional() para vistas asíncronas: condition() llamaría al sello, que consulta la base de datos,
+    desde el event loop. `obtener_respuesta` es la corrutina de la vista; solo se espera si no hay 304/412."""
+    etag, fecha = await sync_to_async(sello)(request, **kwargs)
+    etag = quote_etag(etag) if etag else None
+    fecha = timegm(fecha.utctimetuple()) if fecha else None
+    respuesta = get_conditional_response(request, etag=etag, last_modified=fecha)
+    if respuesta is None:
+        respuesta = await obtener_respuesta()
+        if fecha and not respuesta.has_header('Last-Modified'):
+            respuesta.headers['Last-Modified'] = http_date(fecha)
+        if etag:
+            respuesta.headers.setdefault('ETag', etag)
+    return respuesta
+
+
+def sello_libros(request, **kwargs):
+    return _sello('libros', version('libros'))
+
+
+def sello_libro(request, pk, **kwargs):
+    fila = (
+        Libro.objects.filter(pk=pk).annotate(contadores_actualizado=Max('contadores__actualizado'))
+        .values_list('actualizado', 'contadores_actualizado').first()
+    )
+    return _sello(*fila) if fila else (None, None)
+
+
+def sello_sucursales(request, **kwargs):
+    return _sello('sucursales', version('sucursales'))
+
+
+def sello_sucursal(request, pk, **kwargs):
+    fila = Sucursal.objects.filter(pk=pk).values_list('actualizado', flat=True).first()
+    return _sello(fila)
+
+
+def _sello_disponibilidad(libro_ids):
+    # La disponibilidad muestra contadores, nombres de sucursal y cuántas reservas hay en cola
+    libros = Libro.objects.filter(pk__in=libro_ids).aggregate(
+        n=Count('id', distinct=True), fecha=Max('contadores__actualizado'),
+        sucursales=Max('contadores__sucursal__actualizado'),
+    )
+    if not libros['n']:
+        return None, None
+    en_cola = Reserva.objects.filter(libro_id__in=libro_ids, estado='en cola').count()
+    etag, _ = _sello(libros['n'], libros['fecha'], libros['sucursales'], en_cola)
+    return etag, None
+
+
+def sello_disponibilidad(request, pk, **kwargs):
+    return _sello_disponibilidad([pk])
+
+
+def sello_disponibilidad_lote(request, **kwargs):
+    # Si ?ids= no es válido no hay sello y la vista responde el error
+    try:
+        ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return None, None
+    return _sello_disponibilidad(ids) if ids else (None, None)
@@ -0,0 +1,68 @@
+from collections import Counter
+from functools import reduce
+from operator import or_
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Now
+from .cache import invalidar
+from .models import ContadorEjemplares, Ejemplar
+
+
+# Mantenimiento de ContadorEjemplares. Cada cambio de ejemplares se traduce en deltas
+# {(libro_id, sucursal_id, estado): n} que se aplican dentro de la transacción del cambio.
+
+# Claves por UPDATE: acota el tamaño de la sentencia en las cargas masivas
+TAMANO_LOTE = 500
+
+def _clave(libro_id, sucursal_id, estado):
+    return Q(libro_id=libro_id, sucursal_id=sucursal_id, estado=estado)
+
+
+def ajustar(deltas):
+    """Aplica los deltas con un solo UPDATE cantidad = cantidad + CASE ... por cada TAMANO_LOTE claves; crea
+    las filas que falten solo para sumas (al restar, la fila ya existe o se está borrando en cascada con su
+    libro o sucursal). También invalida las respuestas cacheadas de los libros afectados."""
+    deltas = {clave: n for clave, n in deltas.items() if n}
+    if deltas:
+        invalidar('libros', *{f'libro:{libro_id}' for libro_id, _, _ in deltas})
+    nuevas = [
+        ContadorEjemplares(libro_id=libro_id, sucursal_id=sucursal_id, estado=estado)
+        for (libro_id, sucursal_id, estado), n in deltas.items() if n > 0
+    ]
+    if nuevas:
+        ContadorEjemplares.objects.bulk_create(nuevas, ignore_conflicts=True)
+    claves = list(deltas)
+    for inicio in range(0, len(claves), TAMANO_LOTE):
+        lote = claves[inicio:inicio + TAMANO_LOTE]
+        ContadorEjemplares.objects.filter(reduce(or_, (_clave(*clave) for clave in lote))).update(
+            cantidad=F('cantidad') + Case(
+                *(When(_clave(*clave), then=Value(deltas[clave])) for clave in lote), default=Value(0)
+            ),
+            actualizado=Now(),
+        )
+
+
+def deltas_de_ejemplares(ejemplares, signo=1):
+    deltas = Counter()
+    for ejemplar in ejemplares:
+        deltas[(ejemplar.libro_id, ejemplar.sucursal_id, ejemplar.estado)] += signo
+    return deltas
+
+
+def deltas_de_movimiento(filas, sucursal_id=None, estado=None):
+    """Deltas de mover filas {libro_id, sucursal_id, estado, cantidad} a otra sucursal y/o estado."""
+    deltas = Counter()
+    for fila in filas:
+        origen = (fila['libro_id'], fila['sucursal_id'], fila['estado'])
+        destino = (fila['libro_id'], sucursal_id or fila['sucursal_id'], estado or fila['estado'])
+        deltas[origen] -= fila['cantidad']
+        deltas[destino] += fila['cantidad']
+    return deltas
+
+
+def conteo_real(queryset=None):
+    """Conteo por (libro, sucursal, estado) calculado desde Ejemplar."""
+    filas = (
+        (queryset if queryset is not None else Ejemplar.objects.all())
+        .values('libro_id', 'sucursal_id', 'estado').annotate(cantidad=Count('id')).order_by()
+    )
+    return {(f['libro_id'], f['sucursal_id'], f['estado']): f['cantidad'] for f in filas}
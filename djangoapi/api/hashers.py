@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+# PBKDF2-SHA256 con las iteraciones de settings.HASH_PBKDF2_ITERACIONES.
+# Usa el mismo algoritmo que el hasher de Django, así que verifica los hashes existentes; si las
+# iteraciones guardadas no coinciden, Django rehace el hash en el siguiente login (must_update).
+class PBKDF2Configurable(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return getattr(settings, 'HASH_PBKDF2_ITERACIONES', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,121 @@
+import csv
+import io
+from collections import Counter
+from django.db import IntegrityError, transaction
+from .contadores import ajustar, deltas_de_ejemplares, deltas_de_movimiento
+from .models import Ejemplar, Libro, Sucursal
+
+# Tamaño de los lotes de INSERT y de las listas IN en las validaciones
+TAMANO_LOTE = 1000
+ESTADOS_VALIDOS = {estado for estado, _ in Ejemplar.ESTADOS}
+
+
+def leer_filas(request):
+    """Filas de la carga masiva: archivo CSV en `archivo` (multipart) o lista JSON en el cuerpo."""
+    archivo = request.FILES.get('archivo')
+    if archivo:
+        return list(csv.DictReader(io.TextIOWrapper(archivo, encoding='utf-8-sig')))
+    datos = request.data
+    if isinstance(datos, dict):
+        datos = datos.get('ejemplares')
+    return datos if isinstance(datos, list) else None
+
+
+def _en_lotes(valores, tamano=TAMANO_LOTE):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+
+def _existentes(queryset, campo, valores):
+    # Consulta por conjuntos: un IN por lote en vez de una consulta por fila
+    existentes = set()
+    for lote in _en_lotes(valores):
+        existentes.update(queryset.filter(**{f'{campo}__in': lote}).values_list(campo, flat=True))
+    return existentes
+
+
+def validar_ejemplares(filas):
+    """Normaliza las filas y devuelve (ejemplares, errores). Errores se indexan por número de fila."""
+    errores = []
+    normalizadas = []
+    vistos = set()
+    for numero, fila in enumerate(filas, start=1):
+        if not isinstance(fila, dict):
+            errores.append({'fila': numero, 'error': 'Formato de fila inválido.'})
+            continue
+        codigo = str(fila.get('codigo_barras') or '').strip()
+        estado = str(fila.get('estado') or 'disponible').strip()
+        try:
+            libro_id = int(fila.get('libro'))
+            sucursal_id = int(fila.get('sucursal'))
+        except (TypeError, ValueError):
+            errores.append({'fila': numero, 'error': 'libro y sucursal deben ser IDs numéricos.'})
+            continue
+        if not codigo or len(codigo) > 30:
+            errores.append({'fila': numero, 'error': 'Código de barras vacío o demasiado largo.'})
+            continue
+        if estado not in ESTADOS_VALIDOS:
+            errores.append({'fila': numero, 'error': f'Estado inválido: {estado}.'})
+            continue
+        if codigo in vistos:
+            errores.append({'fila': numero, 'error': f'Código de barras repetido en la carga: {codigo}.'})
+            continue
+        vistos.add(codigo)
+        normalizadas.append((numero, Ejemplar(
+            libro_id=libro_id, sucursal_id=sucursal_id, codigo_barras=codigo, estado=estado
+        )))
+
+    duplicados = _existentes(Ejemplar.objects.all(), 'codigo_barras', vistos)
+    libros = _existentes(Libro.objects.all(), 'id', {e.libro_id for _, e in normalizadas})
+    sucursales = _existentes(Sucursal.objects.all(), 'id', {e.sucursal_id for _, e in normalizadas})
+    ejemplares = []
+    for numero, ejemplar in normalizadas:
+        if ejemplar.codigo_barras in duplicados:
+            errores.append({'fila': numero, 'error': f'El código de barras {ejemplar.codigo_barras} ya existe.'})
+        elif ejemplar.libro_id not in libros:
+            errores.append({'fila': numero, 'error': f'Libro {ejemplar.libro_id} no encontrado.'})
+        elif ejemplar.sucursal_id not in sucursales:
+            errores.append({'fila': numero, 'error': f'Sucursal {ejemplar.sucursal_id} no encontrada.'})
+        else:
+            ejemplares.append(ejemplar)
+    errores.sort(key=lambda e: e['fila'])
+    return ejemplares, errores
+
+
+class ConflictoCarga(Exception):
+    """Otra operación creó un código de barras o borró un libro o sucursal después de validar."""
+
+
+def crear_ejemplares(ejemplares):
+    try:
+        with transaction.atomic():
+            Ejemplar.objects.bulk_create(ejemplares, batch_size=TAMANO_LOTE)
+            ajustar(deltas_de_ejemplares(ejemplares))
+    except IntegrityError as error:
+        raise ConflictoCarga(str(error)) from error
+    return len(ejemplares)
+
+
+def transferir_ejemplares(codigos, sucursal_id):
+    """Mueve todos los ejemplares de `codigos` a la sucursal con un único UPDATE por lote.
+    Devuelve (transferidos, no_encontrados)."""
+    codigos = list(dict.fromkeys(codigos))
+    transferidos = 0
+    with transaction.atomic():
+        for lote in _en_lotes(codigos):
+            # Bloquea el lote y toma su origen para mover los contadores de sucursal
+            origen = Counter(
+                Ejemplar.objects.select_for_update().filter(codigo_barras__in=lote)
+                .values_list('libro_id', 'sucursal_id', 'estado')
+            )
+            transferidos += Ejemplar.objects.filter(codigo_barras__in=lote).update(sucursal_id=sucursal_id)
+            filas = [
+                {'libro_id': libro_id, 'sucursal_id': origen_id, 'estado': estado, 'cantidad': cantidad}
+                for (libro_id, origen_id, estado), cantidad in origen.items()
+            ]
+            ajustar(deltas_de_movimiento(filas, sucursal_id=int(sucursal_id)))
+    no_encontrados = []
+    if transferidos < len(codigos):
+        no_encontrados = sorted(set(codigos) - _existentes(Ejemplar.objects.all(), 'codigo_barras', codigos))
+    return transferidos, no_encontrados
@@ -0,0 +1,138 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Libro, Sucursal
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def _wsgi(handler, ruta, query):
+    """Una petición GET al handler WSGI; devuelve el status."""
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': _host(), 'SERVER_PORT': '80', 'HTTP_HOST': _host(), 'REMOTE_ADDR': '127.0.0.1',
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0), 'wsgi.multithread': True,
+        'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    estado = []
+    respuesta = handler(environ, lambda status, headers: estado.append(int(status.split()[0])))
+    for _ in respuesta:
+        pass
+    respuesta.close()
+    return estado[0]
+
+
+async def _asgi(handler, ruta, query):
+    """Una petición GET al handler ASGI; devuelve el status."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': ruta, 'raw_path': ruta.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', _host().encode())], 'client': ('127.0.0.1', 0), 'server': (_host(), 80),
+    }
+    recibido = False
+    desconexion = asyncio.Event()
+
+    async def receive():
+        nonlocal recibido
+        if not recibido:
+            recibido = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await desconexion.wait()
+        return {'type': 'http.disconnect'}
+
+    estado = []
+
+    async def send(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            estado.append(mensaje['status'])
+
+    await handler(scope, receive, send)
+    desconexion.set()
+    return estado[0]
+
+
+# Throughput de las lecturas del catálogo con la vista síncrona detrás de WSGI (un hilo por petición, como
+# gunicorn --threads) frente a la vista asíncrona detrás de ASGI (una corrutina por petición, como uvicorn).
+# Los handlers de Django se llaman en el mismo proceso, sin red ni servidor: mide el costo de atender
+# `--concurrencia` clientes a la vez con toda la pila de middleware. Solo lee; usa los datos existentes.
+# No incluye la cola de reservas: la vista síncrona responde desde la caché de respuestas (api.cache) y la
+# asíncrona no, así que no se compararía lo mismo.
+# Contra una base local las consultas tardan microsegundos y ASGI no tiene esperas que aprovechar;
+# la diferencia aparece con la latencia de red de una base remota.
+class Command(BaseCommand):
+    help = 'Benchmark de lecturas del catálogo: vistas síncronas con WSGI frente a vistas asíncronas con ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--concurrencia', type=int, default=200, help='Clientes simultáneos.')
+        parser.add_argument('--hilos', type=int, default=32, help='Hilos del servidor WSGI.')
+        parser.add_argument(
+            '--vista', choices=['disponibilidad', 'lote', 'buscar', 'inventario'], action='append',
+            help='Se puede repetir; por defecto todas.',
+        )
+
+    def handle(self, *args, **opciones):
+        libros = list(Libro.objects.order_by('id').values_list('id', flat=True)[:50])
+        sucursal = Sucursal.objects.order_by('id').values_list('id', flat=True).first()
+        if not libros or sucursal is None:
+            raise CommandError('Se necesitan libros y sucursales en la base de datos.')
+        rutas = {
+            'disponibilidad': (f'/libros/{libros[0]}/disponibilidad/', ''),
+            'lote': ('/libros/disponibilidad/', 'ids=' + ','.join(map(str, libros))),
+            'buscar': ('/libros/buscar/', 'disponible=true'),
+            'inventario': (f'/sucursales/{sucursal}/inventario/', ''),
+        }
+        if settings.DATABASES['default'].get('CONN_MAX_AGE'):
+            self.stdout.write(self.style.WARNING(
+                'CONN_MAX_AGE > 0: con ASGI cada petición abre su conexión en un hilo propio; '
+                'correr con DJANGO_CONN_MAX_AGE=0 como djangoapi.asgi (ver settings).'
+            ))
+        peticiones, concurrencia = opciones['peticiones'], opciones['concurrencia']
+        self.stdout.write(
+            f'{peticiones} peticiones, {concurrencia} clientes simultáneos, {opciones["hilos"]} hilos WSGI'
+        )
+        wsgi, asgi = WSGIHandler(), ASGIHandler()
+        for vista in opciones['vista'] or list(rutas):
+            ruta, query = rutas[vista]
+            with ThreadPoolExecutor(max_workers=opciones['hilos']) as servidor:
+                # Los clientes que exceden los hilos esperan en la cola del pool, como en un servidor de hilos fijos
+                wsgi_en_hilo = lambda: asyncio.get_running_loop().run_in_executor(servidor, _wsgi, wsgi, ruta, query)
+                self.informar(f'{vista} WSGI', asyncio.run(self.medir(wsgi_en_hilo, peticiones, concurrencia)))
+            self.informar(f'{vista} ASGI', asyncio.run(self.medir(
+                lambda: _asgi(asgi, '/async' + ruta, query), peticiones, concurrencia
+            )))
+
+    async def medir(self, peticion, peticiones, concurrencia):
+        """`peticiones` llamadas a `peticion()` con `concurrencia` clientes; latencia desde que el cliente envía."""
+        clientes = asyncio.Semaphore(concurrencia)
+
+        async def cliente():
+            async with clientes:
+                inicio = time.perf_counter()
+                status = await peticion()
+                return status, time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(cliente() for _ in range(peticiones)))
+        return resultados, time.perf_counter() - inicio
+
+    def informar(self, nombre, medicion):
+        resultados, segundos = medicion
+        latencias = sorted(latencia * 1000 for _, latencia in resultados)
+        errores = sum(1 for status, _ in resultados if status >= 400)
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+        self.stdout.write(
+            f'{nombre}: {len(resultados) / segundos:.0f} peticiones/s, p50 {statistics.median(latencias):.1f} ms, '
+            f'p99 {p99:.1f} ms, {errores} errores'
+        )
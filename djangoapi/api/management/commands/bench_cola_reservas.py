@@ -0,0 +1,81 @@
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.models import ColaReserva, Libro, Reserva, Usuario
+from api.reservas import encolar_reserva
+from api.serializers import ReservaSerializer
+
+
+# Throughput de altas de reservas sobre un título con una cola profunda:
+# contador por libro (encolar_reserva) frente al COUNT + INSERT anterior.
+# Inserta datos sintéticos: usar solo contra una base de datos desechable.
+class Command(BaseCommand):
+    help = 'Benchmark de asignación de posiciones en la cola de reservas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profundidad', type=int, default=10000)
+        parser.add_argument('--altas', type=int, default=1000, help='Altas por hilo.')
+        parser.add_argument('--hilos', type=int, default=4)
+        parser.add_argument('--confirmar', action='store_true', help='Necesario para insertar datos sintéticos.')
+
+    def handle(self, *args, **opciones):
+        if not opciones['confirmar']:
+            raise CommandError('Este comando inserta datos sintéticos; usa --confirmar contra una base desechable.')
+        usuario, _ = Usuario.objects.get_or_create(username='bench_reservas')
+        for nombre, alta in (('COUNT + INSERT', self.alta_con_count), ('contador ColaReserva', self.alta_con_contador)):
+            libro = self.preparar_libro(usuario, opciones['profundidad'])
+            segundos = self.ejecutar(alta, libro, usuario, opciones['hilos'], opciones['altas'])
+            total = opciones['hilos'] * opciones['altas']
+            posiciones = list(
+                Reserva.objects.filter(libro=libro, estado='en cola').order_by('posicion_cola')
+                .values_list('posicion_cola', flat=True)
+            )
+            densa = posiciones == list(range(1, len(posiciones) + 1))
+            self.stdout.write(
+                f'{nombre:<22} {total / segundos:>10.0f} altas/s  '
+                f'(cola final {len(posiciones)}, posiciones {"densas y únicas" if densa else "CORRUPTAS"})'
+            )
+
+    def preparar_libro(self, usuario, profundidad):
+        libro = Libro.objects.create(
+            titulo='Título popular', autor='Bench', isbn=f'BENCHCOLA{time.time_ns() % 10**11}', genero='Sintético',
+            ano_publicacion=2000,
+        )
+        Reserva.objects.bulk_create(
+            [Reserva(usuario=usuario, libro=libro, posicion_cola=i) for i in range(1, profundidad + 1)],
+            batch_size=1000,
+        )
+        ColaReserva.objects.create(libro=libro, ultima_posicion=profundidad)
+        return libro
+
+    def ejecutar(self, alta, libro, usuario, hilos, altas):
+        class Peticion:
+            user = usuario
+
+        def trabajar():
+            try:
+                for _ in range(altas):
+                    serializer = ReservaSerializer(data={'libro': libro.pk, 'usuario': usuario.pk},
+                                                   context={'request': Peticion})
+                    serializer.is_valid(raise_exception=True)
+                    alta(serializer, usuario)
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        return time.perf_counter() - inicio
+
+    def alta_con_count(self, serializer, usuario):
+        libro = serializer.validated_data['libro']
+        with transaction.atomic():
+            posicion = Reserva.objects.filter(libro=libro, estado='en cola').count() + 1
+            serializer.save(usuario=usuario, posicion_cola=posicion)
+
+    def alta_con_contador(self, serializer, usuario):
+        encolar_reserva(serializer, usuario)
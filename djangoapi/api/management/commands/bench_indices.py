@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from api.models import Usuario, Sucursal, Libro, Ejemplar, Prestamo, Reserva
+
+
+# Compara planes (EXPLAIN) y latencia de las consultas frecuentes sin y con los índices de 0005_indices_consultas.
+# Inserta datos sintéticos: usar solo contra una base de datos desechable.
+class Command(BaseCommand):
+    help = 'Benchmark de índices sobre un conjunto sintético de préstamos, ejemplares y reservas.'
+
+    lote = 10000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prestamos', type=int, default=2000000)
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--sin-datos', action='store_true', help='Reutiliza los datos ya cargados.')
+        parser.add_argument('--confirmar', action='store_true', help='Necesario para insertar datos sintéticos.')
+
+    def handle(self, *args, **opciones):
+        if not opciones['sin_datos']:
+            if not opciones['confirmar']:
+                raise CommandError('Este comando inserta datos sintéticos; usa --confirmar contra una base desechable.')
+            self.cargar_datos(opciones['prestamos'])
+
+        consultas = self.consultas()
+        modelos = [Ejemplar, Prestamo, Reserva]
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Sin índices'))
+        self.cambiar_indices(modelos, crear=False)
+        try:
+            antes = self.medir(consultas, opciones['repeticiones'])
+        finally:
+            self.cambiar_indices(modelos, crear=True)
+        self.stdout.write(self.style.MIGRATE_HEADING('Con índices'))
+        despues = self.medir(consultas, opciones['repeticiones'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Resumen (mediana en ms)'))
+        for nombre in consultas:
+            self.stdout.write(f'{nombre:<40} {antes[nombre]:>10.2f} {despues[nombre]:>10.2f}')
+
+    def cambiar_indices(self, modelos, crear):
+        with connection.schema_editor() as editor:
+            for modelo in modelos:
+                for indice in modelo._meta.indexes:
+                    if crear:
+                        editor.add_index(modelo, indice)
+                    else:
+                        editor.remove_index(modelo, indice)
+
+    def consultas(self):
+        usuario_id = Usuario.objects.order_by('?').values_list('id', flat=True).first()
+        libro_id = Libro.objects.order_by('?').values_list('id', flat=True).first()
+        sucursal_id = Sucursal.objects.values_list('id', flat=True).first()
+        limite = timezone.now() - timedelta(days=2)
+        return {
+            'prestamos activos de un usuario': lambda: Prestamo.objects.filter(usuario_id=usuario_id, estado='activo'),
+            'prestamos vencidos': lambda: Prestamo.objects.filter(estado='vencido').order_by('fecha_devolucion')[:50],
+            'morosidad por usuario': lambda: (
+                Prestamo.objects.filter(multa__gt=0).values('usuario_id').annotate(total=Sum('multa')).order_by()
+            ),
+            'ejemplares disponibles de un libro': lambda: Ejemplar.objects.filter(libro_id=libro_id, estado='disponible'),
+            'inventario de una sucursal': lambda: Ejemplar.objects.filter(sucursal_id=sucursal_id, estado='prestado')[:50],
+            'cola de reservas de un libro': lambda: (
+                Reserva.objects.filter(libro_id=libro_id, estado='en cola').order_by('posicion_cola')
+            ),
+            'reservas expiradas': lambda: Reserva.objects.filter(estado='en cola', fecha_reserva__lt=limite)[:1000],
+        }
+
+    def medir(self, consultas, repeticiones):
+        resultados = {}
+        for nombre, consulta in consultas.items():
+            self.stdout.write(self.style.SQL_KEYWORD(nombre))
+            self.stdout.write(consulta().explain())
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                list(consulta())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nombre] = statistics.median(tiempos)
+        return resultados
+
+    def cargar_datos(self, total_prestamos):
+        total_usuarios = max(total_prestamos // 100, 10)
+        total_libros = max(total_prestamos // 40, 10)
+        total_ejemplares = total_libros * 2
+        self.stdout.write(f'Cargando {total_prestamos} préstamos sintéticos...')
+
+        sucursales = Sucursal.objects.bulk_create(
+            [Sucursal(nombre=f'Sucursal {i}', direccion='Sintética', telefono='0') for i in range(20)]
+        )
+        self.insertar(Usuario, total_usuarios, lambda i: Usuario(username=f'bench_{i}', password='!'))
+        self.insertar(Libro, total_libros, lambda i: Libro(
+            titulo=f'Libro {i}', autor=f'Autor {i % 5000}', isbn=f'BENCH{i:012d}', genero='Sintético',
+            ano_publicacion=1900 + i % 120,
+        ))
+        usuarios = list(Usuario.objects.filter(username__startswith='bench_').values_list('id', flat=True))
+        libros = list(Libro.objects.filter(isbn__startswith='BENCH').values_list('id', flat=True))
+        self.insertar(Ejemplar, total_ejemplares, lambda i: Ejemplar(
+            libro_id=libros[i % len(libros)], sucursal=sucursales[i % len(sucursales)], codigo_barras=f'BENCH-{i}',
+            estado=random.choice(['disponible', 'disponible', 'prestado', 'mantenimiento']),
+        ))
+        ejemplares = list(Ejemplar.objects.filter(codigo_barras__startswith='BENCH-').values_list('id', flat=True))
+        hoy = timezone.now().date()
+        self.insertar(Prestamo, total_prestamos, lambda i: Prestamo(
+            usuario_id=random.choice(usuarios), ejemplar_id=random.choice(ejemplares),
+            fecha_devolucion=hoy - timedelta(days=random.randint(-14, 365)),
+            estado=random.choices(['devuelto', 'activo', 'vencido'], weights=[90, 7, 3])[0],
+            multa=random.choice([0] * 9 + [1000]),
+        ))
+        self.insertar(Reserva, total_prestamos // 10, lambda i: Reserva(
+            usuario_id=random.choice(usuarios), libro_id=random.choice(libros),
+            estado=random.choices(['en cola', 'cancelada', 'expirada'], weights=[30, 40, 30])[0],
+            posicion_cola=i % 50 + 1,
+        ))
+
+    def insertar(self, modelo, total, fabrica):
+        for inicio in range(0, total, self.lote):
+            modelo.objects.bulk_create([fabrica(i) for i in range(inicio, min(inicio + self.lote, total))])
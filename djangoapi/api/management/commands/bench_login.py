@@ -0,0 +1,68 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Usuario
+from api.usuarios import iniciar_proceso
+
+CONTRASENA = 'bench-login-123'
+
+
+def _verificar(hasher_indice, codificada, segundos):
+    """Verificaciones por segundo de un proceso durante `segundos`."""
+    hasher = get_hashers()[hasher_indice]
+    cuenta = 0
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        hasher.verify(CONTRASENA, codificada)
+        cuenta += 1
+    return cuenta / (time.perf_counter() - inicio)
+
+
+# Logins por segundo y por núcleo de cada hasher de PASSWORD_HASHERS (el costo de un login es casi todo el hash).
+# Con --confirmar mide además authenticate() de punta a punta con un usuario sintético.
+class Command(BaseCommand):
+    help = 'Benchmark de verificación de contraseñas por hasher y de authenticate().'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count())
+        parser.add_argument('--segundos', type=float, default=3)
+        parser.add_argument('--confirmar', action='store_true', help='Necesario para crear el usuario sintético.')
+
+    def handle(self, *args, **opciones):
+        procesos, segundos = opciones['procesos'], opciones['segundos']
+        self.stdout.write(f'{procesos} procesos, {segundos:g}s por hasher')
+        vistos = set()
+        with ProcessPoolExecutor(max_workers=procesos, initializer=iniciar_proceso) as pool:
+            for indice, hasher in enumerate(get_hashers()):
+                if hasher.algorithm in vistos:
+                    continue
+                vistos.add(hasher.algorithm)
+                try:
+                    codificada = hasher.encode(CONTRASENA, hasher.salt())
+                except ValueError as error:
+                    # Argon2 y bcrypt necesitan librerías opcionales
+                    self.stdout.write(f'{hasher.algorithm}: omitido ({error})')
+                    continue
+                tasas = list(pool.map(_verificar, [indice] * procesos, [codificada] * procesos, [segundos] * procesos))
+                total = sum(tasas)
+                self.stdout.write(
+                    f'{type(hasher).__name__} ({hasher.algorithm}): {total:.1f} logins/s, '
+                    f'{total / procesos:.1f} por núcleo'
+                )
+
+        if not opciones['confirmar']:
+            return
+        username = f'bench_login_{time.time_ns() % 10**9}'
+        Usuario.objects.create_user(username=username, password=CONTRASENA)
+        cuenta = 0
+        fin = time.perf_counter() + segundos
+        while time.perf_counter() < fin:
+            if authenticate(username=username, password=CONTRASENA) is None:
+                raise CommandError('authenticate() falló con el usuario sintético.')
+            cuenta += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'authenticate() de punta a punta (1 proceso, hasher preferido): {cuenta / segundos:.1f} logins/s'
+        ))
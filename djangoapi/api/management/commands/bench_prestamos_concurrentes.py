@@ -0,0 +1,76 @@
+import threading
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from api.models import Ejemplar, Libro, Prestamo, Sucursal, Usuario
+from api.prestamos import prestar
+from api.serializers import PrestamoSerializer
+
+
+# Varios hilos intentan prestar el mismo ejemplar a la vez: debe haber exactamente un préstamo por ronda.
+# Inserta datos sintéticos: usar solo contra una base de datos desechable (MySQL, con SELECT ... FOR UPDATE).
+class Command(BaseCommand):
+    help = 'Benchmark de concurrencia de préstamos: comprueba que no se presta dos veces el mismo ejemplar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--rondas', type=int, default=50)
+        parser.add_argument('--confirmar', action='store_true', help='Necesario para insertar datos sintéticos.')
+
+    def handle(self, *args, **opciones):
+        if not opciones['confirmar']:
+            raise CommandError('Este comando inserta datos sintéticos; usa --confirmar contra una base desechable.')
+        if not connection.features.has_select_for_update:
+            self.stdout.write(self.style.WARNING(
+                'Este motor no soporta SELECT ... FOR UPDATE; el resultado no es representativo.'
+            ))
+        sufijo = time.time_ns() % 10**9
+        sucursal = Sucursal.objects.create(nombre='Bench', direccion='Sintética', telefono='0')
+        libro = Libro.objects.create(titulo='Bench', autor='Bench', isbn=f'BENCHPREST{sufijo}', genero='Sintético',
+                                     ano_publicacion=2000)
+        usuarios = [
+            Usuario.objects.create(username=f'bench_prestamo_{sufijo}_{i}') for i in range(opciones['hilos'])
+        ]
+        fecha_devolucion = timezone.localdate() + timedelta(days=7)
+        dobles = 0
+        intentos = 0
+        inicio = time.perf_counter()
+        for ronda in range(opciones['rondas']):
+            ejemplar = Ejemplar.objects.create(libro=libro, sucursal=sucursal, codigo_barras=f'BENCH-{sufijo}-{ronda}')
+            barrera = threading.Barrier(opciones['hilos'])
+
+            def intentar(usuario):
+                try:
+                    serializer = PrestamoSerializer(
+                        data={'usuario': usuario.pk, 'ejemplar': ejemplar.pk, 'fecha_devolucion': fecha_devolucion},
+                        context={'request': None},
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    barrera.wait(timeout=30)
+                    prestar(serializer)
+                except (ValidationError, threading.BrokenBarrierError):
+                    pass
+                finally:
+                    connection.close()
+
+            hilos = [threading.Thread(target=intentar, args=(usuario,)) for usuario in usuarios]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            intentos += len(hilos)
+            prestamos = Prestamo.objects.filter(ejemplar=ejemplar).count()
+            if prestamos != 1:
+                dobles += 1
+                self.stdout.write(self.style.ERROR(f'Ronda {ronda}: {prestamos} préstamos del mismo ejemplar'))
+            Prestamo.objects.filter(ejemplar=ejemplar).update(estado='devuelto')
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            f"{opciones['rondas']} rondas x {opciones['hilos']} hilos: {intentos / segundos:.0f} intentos/s, "
+            f"{dobles} rondas con préstamo doble"
+        )
+        if dobles:
+            raise CommandError('Se prestó el mismo ejemplar más de una vez.')
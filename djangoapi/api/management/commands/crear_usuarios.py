@@ -0,0 +1,46 @@
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.importacion import leer_registros
+from api.usuarios import TAMANO_LOTE, crear_usuarios, iniciar_proceso
+
+
+# Alta masiva de usuarios (inicio de semestre) desde CSV o JSON Lines
+class Command(BaseCommand):
+    help = 'Crea usuarios desde un archivo CSV o JSON Lines hasheando las contraseñas en paralelo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto se deduce de la extensión.')
+        parser.add_argument('--procesos', type=int, help='Procesos para hashear (por defecto, CARGA_USUARIOS_PROCESOS).')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **opciones):
+        ruta = opciones['ruta']
+        formato = opciones['formato'] or ('csv' if ruta.endswith('.csv') else 'jsonl')
+        inicio = time.monotonic()
+
+        def progreso(resultado):
+            segundos = time.monotonic() - inicio
+            self.stdout.write(
+                f"{resultado['leidos']} leídos ({resultado['leidos'] / max(segundos, 1e-6):.0f}/s) - "
+                f"{resultado['creados']} creados, {resultado['existentes']} existentes, "
+                f"{resultado['invalidos']} inválidos"
+            )
+
+        procesos = opciones['procesos'] or settings.CARGA_USUARIOS_PROCESOS
+        try:
+            with open(ruta, encoding='utf-8-sig', newline='') as archivo, ProcessPoolExecutor(
+                max_workers=procesos, initializer=iniciar_proceso
+            ) as pool:
+                resultado = crear_usuarios(leer_registros(archivo, formato), pool, opciones['lote'], progreso)
+        except OSError as error:
+            raise CommandError(f'No se pudo leer {ruta}: {error}')
+        except (ValueError, UnicodeDecodeError, csv.Error) as error:
+            # Los lotes anteriores al error ya quedaron guardados; volver a correr el comando los repasa
+            raise CommandError(f'Archivo inválido: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Alta terminada en {time.monotonic() - inicio:.1f}s: {resultado}"
+        ))
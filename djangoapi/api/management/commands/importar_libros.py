@@ -0,0 +1,39 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.importacion import TAMANO_LOTE, importar_libros, leer_registros
+
+
+# Importa un catálogo de editorial (CSV o JSON Lines) haciendo upsert por ISBN
+class Command(BaseCommand):
+    help = 'Importa libros desde un archivo CSV o JSON Lines con deduplicación por ISBN.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto se deduce de la extensión.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **opciones):
+        ruta = opciones['ruta']
+        formato = opciones['formato'] or ('csv' if ruta.endswith('.csv') else 'jsonl')
+        inicio = time.monotonic()
+
+        def progreso(resultado):
+            segundos = time.monotonic() - inicio
+            self.stdout.write(
+                f"{resultado['leidos']} leídos ({resultado['leidos'] / max(segundos, 1e-6):.0f}/s) - "
+                f"{resultado['creados']} creados, {resultado['actualizados']} actualizados, "
+                f"{resultado['invalidos']} inválidos"
+            )
+
+        try:
+            with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+                resultado = importar_libros(leer_registros(archivo, formato), opciones['lote'], progreso)
+        except OSError as error:
+            raise CommandError(f'No se pudo leer {ruta}: {error}')
+        except (ValueError, UnicodeDecodeError, csv.Error) as error:
+            # Los lotes anteriores al error ya quedaron guardados; volver a correr el comando los repasa
+            raise CommandError(f'Archivo inválido: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación terminada en {time.monotonic() - inicio:.1f}s: {resultado}"
+        ))
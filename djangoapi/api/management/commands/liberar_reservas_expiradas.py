@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from api.reservas import DIAS_EXPIRACION, TAMANO_LOTE, expirar_reservas
+
+
+# Tarea programada (cron): expira reservas antiguas y compacta las colas afectadas
+class Command(BaseCommand):
+    help = 'Expira las reservas que llevan demasiado tiempo en cola y reordena las colas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_EXPIRACION)
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **opciones):
+        inicio = time.monotonic()
+        resultado = expirar_reservas(opciones['dias'], opciones['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['expiradas']} reservas expiradas en {resultado['libros']} libros, "
+            f"{resultado['reordenadas']} posiciones reordenadas ({time.monotonic() - inicio:.2f}s)"
+        ))
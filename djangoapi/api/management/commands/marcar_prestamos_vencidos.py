@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from api.prestamos import TAMANO_LOTE, marcar_vencidos
+
+
+# Tarea diaria (cron): marca préstamos vencidos y actualiza sus multas
+class Command(BaseCommand):
+    help = 'Marca como vencidos los préstamos atrasados y recalcula sus multas. Idempotente por día.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de referencia AAAA-MM-DD (por defecto, hoy).')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **opciones):
+        hoy = None
+        if opciones['fecha']:
+            hoy = parse_date(opciones['fecha'])
+            if not hoy:
+                raise CommandError('La fecha debe tener formato AAAA-MM-DD.')
+        inicio = time.monotonic()
+        resultado = marcar_vencidos(hoy, opciones['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['vencidos']} préstamos marcados como vencidos, "
+            f"{resultado['multas_actualizadas']} multas actualizadas ({time.monotonic() - inicio:.2f}s)"
+        ))
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from api.models import MultaUsuario, Prestamo
+from api.prestamos import TAMANO_LOTE, refrescar_multas
+
+
+# Recalcula MultaUsuario desde la tabla de préstamos (p. ej. tras editar multas con SQL o queryset.update())
+class Command(BaseCommand):
+    help = 'Recalcula las multas acumuladas por usuario que usa el reporte de morosidad.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **opciones):
+        inicio = time.monotonic()
+        usuarios = set(Prestamo.objects.filter(multa__gt=0).values_list('usuario_id', flat=True).distinct())
+        usuarios.update(MultaUsuario.objects.filter(total__gt=0).values_list('usuario_id', flat=True))
+        refrescar_multas(sorted(usuarios), opciones['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(usuarios)} usuarios recalculados ({time.monotonic() - inicio:.2f}s)'
+        ))
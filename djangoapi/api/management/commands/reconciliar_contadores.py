@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.contadores import ajustar, conteo_real
+from api.models import ContadorEjemplares
+
+
+# Recalcula ContadorEjemplares desde Ejemplar e informa las diferencias encontradas
+class Command(BaseCommand):
+    help = 'Reconstruye los contadores de disponibilidad desde la tabla de ejemplares e informa la deriva.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-informe', action='store_true', help='Informa la deriva sin corregirla.')
+
+    def handle(self, *args, **opciones):
+        with transaction.atomic():
+            # Primero los bloqueos y después el conteo: un cambio de ejemplares que ya ajustó su contador
+            # termina antes de contar, y uno posterior espera y suma su delta sobre el valor corregido
+            guardados = list(ContadorEjemplares.objects.select_for_update().values_list(
+                'libro_id', 'sucursal_id', 'estado', 'cantidad'
+            ))
+            real = conteo_real()
+            contadores = {(libro_id, sucursal_id, estado): n for libro_id, sucursal_id, estado, n in guardados}
+            deriva = [
+                (clave, contadores.get(clave, 0), real.get(clave, 0))
+                for clave in sorted(set(real) | set(contadores))
+                if contadores.get(clave, 0) != real.get(clave, 0)
+            ]
+            for (libro_id, sucursal_id, estado), guardado, correcto in deriva:
+                self.stdout.write(
+                    f'libro {libro_id} / sucursal {sucursal_id} / {estado}: contador {guardado}, real {correcto}'
+                )
+            if deriva and not opciones['solo_informe']:
+                # Corrección en el lugar: solo las filas con deriva, sin borrar la tabla
+                ajustar({clave: correcto - guardado for clave, guardado, correcto in deriva})
+        estilo = self.style.WARNING if deriva else self.style.SUCCESS
+        accion = 'sin corregir' if opciones['solo_informe'] else 'corregidas'
+        self.stdout.write(estilo(f'{len(deriva)} diferencias encontradas ({accion}), {len(real)} contadores reales.'))
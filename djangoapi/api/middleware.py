@@ -0,0 +1,159 @@
+import logging
+import time
+import hashlib
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from . import replicas
+
+logger = logging.getLogger(__name__)
+
+
+class PresupuestoConsultasExcedido(Exception):
+    pass
+
+
+# Cuenta las consultas y el tiempo de base de datos de cada petición
+class _Medidor:
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+# Consultas por petición: las informa en Server-Timing y controla el presupuesto de cada vista.
+# El presupuesto es el atributo `presupuesto_consultas` de la vista o PRESUPUESTO_CONSULTAS_POR_DEFECTO,
+# y solo se aplica a GET/HEAD (las regresiones N+1 aparecen en las lecturas). Si se excede, se registra
+# un warning o, con PRESUPUESTO_CONSULTAS_ACCION = 'error' (en los tests), se lanza una excepción.
+# Las consultas hechas mientras se recorre una respuesta en streaming no se cuentan.
+class PresupuestoConsultasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medidor = _Medidor()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            self.medir(pila, medidor)
+            respuesta = self.get_response(request)
+        return self.terminar(request, respuesta, medidor, inicio)
+
+    async def __acall__(self, request):
+        # Con ASGI el ORM corre en el hilo síncrono de la petición (sync_to_async): el medidor se instala
+        # en las conexiones de ese hilo
+        medidor = _Medidor()
+        inicio = time.perf_counter()
+        pila = ExitStack()
+        await sync_to_async(self.medir)(pila, medidor)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        return self.terminar(request, respuesta, medidor, inicio)
+
+    def medir(self, pila, medidor):
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(medidor))
+
+    def terminar(self, request, respuesta, medidor, inicio):
+        total = time.perf_counter() - inicio
+        respuesta['Server-Timing'] = (
+            f'db;dur={medidor.segundos * 1000:.1f};desc="{medidor.consultas} consultas", '
+            f'total;dur={total * 1000:.1f}'
+        )
+        self.controlar_presupuesto(request, medidor.consultas)
+        return respuesta
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        vista = getattr(view_func, 'view_class', view_func)
+        request._presupuesto_consultas = (
+            getattr(vista, '__name__', str(vista)),
+            getattr(vista, 'presupuesto_consultas', getattr(settings, 'PRESUPUESTO_CONSULTAS_POR_DEFECTO', None)),
+        )
+
+    def controlar_presupuesto(self, request, consultas):
+        vista, presupuesto = getattr(request, '_presupuesto_consultas', (None, None))
+        if presupuesto is None or request.method not in ('GET', 'HEAD') or consultas <= presupuesto:
+            return
+        mensaje = f'{request.method} {request.path} ({vista}): {consultas} consultas, presupuesto {presupuesto}'
+        if getattr(settings, 'PRESUPUESTO_CONSULTAS_ACCION', 'log') == 'error':
+            raise PresupuestoConsultasExcedido(mensaje)
+        logger.warning('Presupuesto de consultas excedido: %s', mensaje)
+
+
+# Enruta a una réplica las lecturas de las vistas con `lectura_en_replica = True` (ver api.replicas).
+# La sesión se identifica por la cabecera Authorization (el token JWT), la cookie de sesión o la IP; la marca
+# de "leer de la principal" se guarda en CACHES['compartida'], que en producción debe ser un backend compartido.
+class ReplicasLecturaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        estado, token = replicas.iniciar_peticion()
+        request._replicas_estado = estado
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            replicas.terminar_peticion(token)
+        if self.fijar_principal(estado):
+            caches[replicas.ALIAS_MARCAS].set(self.clave_sesion(request), True, self.segundos_pegajosa())
+        return respuesta
+
+    async def __acall__(self, request):
+        # sync_to_async copia el contexto: el ORM del hilo de la petición ve el mismo estado
+        estado, token = replicas.iniciar_peticion()
+        request._replicas_estado = estado
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            replicas.terminar_peticion(token)
+        if self.fijar_principal(estado):
+            await caches[replicas.ALIAS_MARCAS].aset(self.clave_sesion(request), True, self.segundos_pegajosa())
+        return respuesta
+
+    def segundos_pegajosa(self):
+        return getattr(settings, 'REPLICAS_PEGAJOSA_SEGUNDOS', 5)
+
+    def fijar_principal(self, estado):
+        return estado.escribio and getattr(settings, 'REPLICAS_LECTURA', [])
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        vista = getattr(view_func, 'view_class', view_func)
+        if (
+            getattr(vista, 'lectura_en_replica', False)
+            and request.method in ('GET', 'HEAD')
+            and getattr(settings, 'REPLICAS_LECTURA', [])
+            and not caches[replicas.ALIAS_MARCAS].get(self.clave_sesion(request))
+        ):
+            request._replicas_estado.replica = replicas.elegir_replica()
+
+    def clave_sesion(self, request):
+        sesion = (
+            request.headers.get('Authorization')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        return 'replicas:primaria:' + hashlib.md5(sesion.encode()).hexdigest()
@@ -1,6 +1,9 @@
-# Generated by Django 5.1.7 on 2025-06-09 18:33
+# Generated by Django 5.2.18 on 2026-10-18 08:39
 
+import django.contrib.auth.models
+import django.contrib.auth.validators
 import django.db.models.deletion
+import django.utils.timezone
 from django.conf import settings
 from django.db import migrations, models
 
@@ -10,58 +13,90 @@ class Migration(migrations.Migration):
     initial = True
 
     dependencies = [
-        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
     ]
 
     operations = [
         migrations.CreateModel(
-            name='Asignatura',
+            name='Libro',
             fields=[
                 ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('nombre', models.CharField(max_length=40)),
-                ('cupos', models.IntegerField()),
+                ('titulo', models.CharField(max_length=200)),
+                ('autor', models.CharField(max_length=100)),
+                ('isbn', models.CharField(max_length=20, unique=True)),
+                ('genero', models.CharField(max_length=50)),
+                ('ano_publicacion', models.PositiveIntegerField()),
+                ('descripcion', models.TextField(blank=True)),
             ],
-            options={
-                'db_table': 'asignatura',
-            },
         ),
         migrations.CreateModel(
-            name='Alumno',
+            name='Sucursal',
             fields=[
                 ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('nombre', models.CharField(max_length=40)),
-                ('apellido', models.CharField(max_length=40)),
-                ('fecha_nacimiento', models.DateField()),
-                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('nombre', models.CharField(max_length=50)),
+                ('direccion', models.CharField(max_length=50)),
+                ('telefono', models.CharField(max_length=15)),
+                ('horario_atencion', models.CharField(blank=True, default='', max_length=50)),
             ],
-            options={
-                'db_table': 'alumno',
-            },
         ),
         migrations.CreateModel(
-            name='Profesor',
+            name='Usuario',
             fields=[
                 ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('nombre', models.CharField(max_length=40)),
-                ('apellido', models.CharField(max_length=40)),
-                ('valor_hora', models.IntegerField()),
-                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('tipo', models.CharField(choices=[('regular', 'Usuario Regular'), ('bibliotecario', 'Bibliotecario'), ('admin', 'Administrador')], default='regular', max_length=15)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
             ],
             options={
-                'db_table': 'profesor',
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'abstract': False,
             },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
         ),
         migrations.CreateModel(
-            name='Notas',
+            name='Ejemplar',
             fields=[
                 ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('nota', models.FloatField()),
-                ('alumno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.alumno')),
-                ('asignatura', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.asignatura')),
-                ('profesor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.profesor')),
+                ('codigo_barras', models.CharField(max_length=30, unique=True)),
+                ('estado', models.CharField(choices=[('disponible', 'Disponible'), ('prestado', 'Prestado'), ('mantenimiento', 'En Mantenimiento')], default='disponible', max_length=20)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ejemplares', to='api.libro')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ejemplares', to='api.sucursal')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Prestamo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_prestamo', models.DateField(auto_now_add=True)),
+                ('fecha_devolucion', models.DateField(blank=True, null=True)),
+                ('estado', models.CharField(default='activo', max_length=20)),
+                ('multa', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('ejemplar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos', to='api.ejemplar')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestamos', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_reserva', models.DateTimeField(auto_now_add=True)),
+                ('estado', models.CharField(default='en cola', max_length=20)),
+                ('posicion_cola', models.PositiveIntegerField(default=1)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='api.libro')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to=settings.AUTH_USER_MODEL)),
             ],
-            options={
-                'db_table': 'notas',
-            },
         ),
     ]
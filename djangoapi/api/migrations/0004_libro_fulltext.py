@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+# El índice FULLTEXT solo existe en MySQL; otros motores usan la búsqueda genérica de api.busqueda
+def crear_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX api_libro_fulltext ON api_libro (titulo, autor, isbn, genero)'
+        )
+
+
+def eliminar_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX api_libro_fulltext ON api_libro')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_fulltext, eliminar_indice_fulltext),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_libro_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ejemplar',
+            index=models.Index(fields=['libro', 'estado'], name='ejemplar_libro_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ejemplar',
+            index=models.Index(fields=['sucursal', 'estado'], name='ejemplar_sucursal_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['usuario', 'estado'], name='prestamo_usuario_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['estado', 'fecha_devolucion'], name='prestamo_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['usuario', 'multa'], name='prestamo_usuario_multa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['libro', 'estado', 'posicion_cola'], name='reserva_libro_estado_pos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha_reserva'], name='reserva_estado_fecha_idx'),
+        ),
+    ]
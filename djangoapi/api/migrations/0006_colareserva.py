@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# Inicializa el contador con la posición más alta de cada cola existente
+def inicializar_colas(apps, schema_editor):
+    ColaReserva = apps.get_model('api', 'ColaReserva')
+    Reserva = apps.get_model('api', 'Reserva')
+    filas = Reserva.objects.filter(estado='en cola').values('libro_id').annotate(ultima=Max('posicion_cola')).order_by()
+    ColaReserva.objects.bulk_create(
+        [ColaReserva(libro_id=fila['libro_id'], ultima_posicion=fila['ultima']) for fila in filas],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColaReserva',
+            fields=[
+                ('libro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cola', serialize=False, to='api.libro')),
+                ('ultima_posicion', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(inicializar_colas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Carga inicial de los contadores desde los ejemplares existentes
+def cargar_contadores(apps, schema_editor):
+    ContadorEjemplares = apps.get_model('api', 'ContadorEjemplares')
+    Ejemplar = apps.get_model('api', 'Ejemplar')
+    filas = Ejemplar.objects.values('libro_id', 'sucursal_id', 'estado').annotate(cantidad=Count('id')).order_by()
+    ContadorEjemplares.objects.bulk_create([ContadorEjemplares(**fila) for fila in filas], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_colareserva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorEjemplares',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('disponible', 'Disponible'), ('prestado', 'Prestado'), ('mantenimiento', 'En Mantenimiento')], max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contadores', to='api.libro')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contadores', to='api.sucursal')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('libro', 'sucursal', 'estado'), name='contador_libro_sucursal_estado')],
+            },
+        ),
+        migrations.RunPython(cargar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+import django.db.models.deletion
+from django.conf import settings
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+# Carga inicial de los resúmenes desde los préstamos existentes (la misma cuenta que
+# resumenes.reconstruir, sobre todo el historial y con los modelos de esta migración)
+def cargar_resumenes(apps, schema_editor):
+    Prestamo = apps.get_model('api', 'Prestamo')
+    dimensiones = (
+        (apps.get_model('api', 'ResumenDiarioLibro'), 'libro_id', 'ejemplar__libro_id'),
+        (apps.get_model('api', 'ResumenDiarioUsuario'), 'usuario_id', 'usuario_id'),
+        (apps.get_model('api', 'ResumenDiarioSucursal'), 'sucursal_id', 'ejemplar__sucursal_id'),
+    )
+    vacio = {'prestamos': 0, 'devoluciones': 0, 'multas': 0, 'monto_multas': Decimal(0)}
+    for modelo, campo, origen in dimensiones:
+        resumenes = {}
+        prestados = (
+            Prestamo.objects.values(fecha=F('fecha_prestamo'), clave=F(origen))
+            .annotate(prestamos=Count('id')).order_by()
+        )
+        for fila in prestados:
+            resumenes.setdefault((fila['fecha'], fila['clave']), dict(vacio))['prestamos'] = fila['prestamos']
+        devueltos = (
+            Prestamo.objects.filter(estado='devuelto', fecha_devolucion__isnull=False)
+            .values(fecha=F('fecha_devolucion'), clave=F(origen))
+            .annotate(
+                devoluciones=Count('id'),
+                multas=Count('id', filter=Q(multa__gt=0)),
+                monto_multas=Coalesce(Sum('multa'), Decimal(0)),
+            )
+            .order_by()
+        )
+        for fila in devueltos:
+            resumen = resumenes.setdefault((fila['fecha'], fila['clave']), dict(vacio))
+            resumen.update(devoluciones=fila['devoluciones'], multas=fila['multas'], monto_multas=fila['monto_multas'])
+        modelo.objects.bulk_create(
+            [modelo(fecha=fecha, **{campo: clave}, **valores) for (fecha, clave), valores in resumenes.items()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_contadorejemplares'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioLibro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(db_index=True)),
+                ('prestamos', models.PositiveIntegerField(default=0)),
+                ('devoluciones', models.PositiveIntegerField(default=0)),
+                ('multas', models.PositiveIntegerField(default=0)),
+                ('monto_multas', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioSucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(db_index=True)),
+                ('prestamos', models.PositiveIntegerField(default=0)),
+                ('devoluciones', models.PositiveIntegerField(default=0)),
+                ('multas', models.PositiveIntegerField(default=0)),
+                ('monto_multas', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(db_index=True)),
+                ('prestamos', models.PositiveIntegerField(default=0)),
+                ('devoluciones', models.PositiveIntegerField(default=0)),
+                ('multas', models.PositiveIntegerField(default=0)),
+                ('monto_multas', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['fecha_prestamo'], name='prestamo_fecha_prestamo_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumendiariolibro',
+            name='libro',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='api.libro'),
+        ),
+        migrations.AddField(
+            model_name='resumendiariosucursal',
+            name='sucursal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='api.sucursal'),
+        ),
+        migrations.AddField(
+            model_name='resumendiariousuario',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiariolibro',
+            constraint=models.UniqueConstraint(fields=('libro', 'fecha'), name='resumen_libro_fecha'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiariosucursal',
+            constraint=models.UniqueConstraint(fields=('sucursal', 'fecha'), name='resumen_sucursal_fecha'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiariousuario',
+            constraint=models.UniqueConstraint(fields=('usuario', 'fecha'), name='resumen_usuario_fecha'),
+        ),
+        migrations.RunPython(cargar_resumenes, migrations.RunPython.noop),
+    ]
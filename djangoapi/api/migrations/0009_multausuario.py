@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+# Carga inicial de las multas acumuladas desde los préstamos existentes
+def cargar_multas(apps, schema_editor):
+    MultaUsuario = apps.get_model('api', 'MultaUsuario')
+    Prestamo = apps.get_model('api', 'Prestamo')
+    filas = (
+        Prestamo.objects.filter(multa__gt=0).values('usuario_id')
+        .annotate(total=Sum('multa'), prestamos_con_multa=Count('id')).order_by()
+    )
+    MultaUsuario.objects.bulk_create([MultaUsuario(**fila) for fila in filas], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_resumenes_diarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MultaUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='multa_total', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('prestamos_con_multa', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['total'], name='multa_usuario_total_idx')],
+            },
+        ),
+        migrations.RunPython(cargar_multas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+import re
+from django.db import migrations
+
+
+# Copia de importacion.normalizar_isbn al momento de esta migración: no debe seguir los cambios del código
+def normalizar_isbn(valor):
+    """ISBN sin guiones ni espacios y convertido a ISBN-13; None si no es válido."""
+    isbn = re.sub(r'[\s\-]', '', str(valor or '')).upper()
+    if re.fullmatch(r'\d{9}[\dX]', isbn):
+        suma = sum((10 - i) * (10 if c == 'X' else int(c)) for i, c in enumerate(isbn))
+        if suma % 11:
+            return None
+        isbn = '978' + isbn[:9]
+        isbn += str((10 - sum((3 if i % 2 else 1) * int(c) for i, c in enumerate(isbn)) % 10) % 10)
+        return isbn
+    if re.fullmatch(r'\d{13}', isbn):
+        if sum((3 if i % 2 else 1) * int(c) for i, c in enumerate(isbn)) % 10:
+            return None
+        return isbn
+    return None
+
+
+# ISBN existentes a la forma normalizada (ISBN-13 sin guiones) con la que comparan la importación y
+# LibroSerializer. Los que no son válidos, o cuya forma normalizada ya tiene otro libro, quedan como están
+def normalizar_isbns(apps, schema_editor):
+    Libro = apps.get_model('api', 'Libro')
+    cambios = {}
+    for libro_id, isbn in Libro.objects.values_list('id', 'isbn').iterator(chunk_size=2000):
+        normalizado = normalizar_isbn(isbn)
+        if normalizado and normalizado != isbn:
+            cambios[libro_id] = normalizado
+    ocupados = set()
+    ids = list(cambios)
+    for inicio in range(0, len(ids), 2000):
+        valores = [cambios[libro_id] for libro_id in ids[inicio:inicio + 2000]]
+        ocupados.update(Libro.objects.filter(isbn__in=valores).values_list('isbn', flat=True))
+    for libro_id, isbn in cambios.items():
+        if isbn not in ocupados:
+            Libro.objects.filter(pk=libro_id).update(isbn=isbn)
+            ocupados.add(isbn)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_fechas_actualizacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_isbns, migrations.RunPython.noop),
+    ]
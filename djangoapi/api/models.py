@@ -1,6 +1,7 @@
 from django.db import models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
-from django.utils import timezone
 
 # Tipos de usuario
 class Usuario(AbstractUser):
@@ -21,10 +22,23 @@ class Sucursal(models.Model):
     direccion = models.CharField(max_length=50) 
     telefono = models.CharField(max_length=15) 
     horario_atencion = models.CharField(max_length=50, blank=True, default="") 
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)  # ETag / Last-Modified
 
     def __str__(self):
         return self.nombre
 
+# Consultas del catálogo
+class LibroQuerySet(models.QuerySet):
+    def con_conteo_ejemplares(self):
+        """Anota total y disponibles en la misma consulta (evita N+1 en LibroSerializer).
+        Lee de ContadorEjemplares: a lo sumo una fila por sucursal y estado en vez de una por ejemplar."""
+        return self.annotate(
+            total_ejemplares=Coalesce(Sum('contadores__cantidad'), 0),
+            ejemplares_disponibles=Coalesce(
+                Sum('contadores__cantidad', filter=Q(contadores__estado='disponible')), 0
+            ),
+        )
+
 # Libro en el catálogo
 class Libro(models.Model):
     titulo = models.CharField(max_length=200) 
@@ -33,10 +47,68 @@ class Libro(models.Model):
     genero = models.CharField(max_length=50) 
     ano_publicacion = models.PositiveIntegerField() 
     descripcion = models.TextField(blank=True)
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)  # ETag / Last-Modified
+
+    objects = LibroQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.titulo} - {self.autor}"
 
+    @staticmethod
+    def resumen_disponibilidad(libro_ids):
+        """Disponibilidad de varios libros: una lectura de ContadorEjemplares y un GROUP BY para las reservas."""
+        return Libro.armar_disponibilidad(libro_ids, *Libro.consultas_disponibilidad(libro_ids))
+
+    @staticmethod
+    def consultas_disponibilidad(libro_ids):
+        """Las dos consultas (independientes) de resumen_disponibilidad: contadores y reservas en cola."""
+        contadores = (
+            ContadorEjemplares.objects.filter(libro_id__in=libro_ids, cantidad__gt=0)
+            .values('libro_id', 'sucursal_id', 'sucursal__nombre', 'estado', 'cantidad')
+            .order_by('libro_id', 'sucursal_id')
+        )
+        reservas = (
+            Reserva.objects.filter(libro_id__in=libro_ids, estado='en cola')
+            .values('libro_id')
+            .annotate(cantidad=Count('id'))
+            .order_by()
+        )
+        return contadores, reservas
+
+    @staticmethod
+    def armar_disponibilidad(libro_ids, contadores, reservas):
+        resumen = {
+            libro_id: {
+                "total_ejemplares": 0,
+                "disponibles": 0,
+                "prestados": 0,
+                "mantenimiento": 0,
+                "por_sucursal": {},
+                "reservas_pendientes": 0,
+            }
+            for libro_id in libro_ids
+        }
+        claves = {'disponible': 'disponibles', 'prestado': 'prestados', 'mantenimiento': 'mantenimiento'}
+        for fila in contadores:
+            datos = resumen[fila['libro_id']]
+            datos["total_ejemplares"] += fila['cantidad']
+            clave = claves.get(fila['estado'])
+            nombre_sucursal = fila['sucursal__nombre']
+            if nombre_sucursal not in datos["por_sucursal"]:
+                datos["por_sucursal"][nombre_sucursal] = {
+                    "sucursal": nombre_sucursal, "disponibles": 0, "prestados": 0, "mantenimiento": 0
+                }
+            if clave:
+                datos[clave] += fila['cantidad']
+                datos["por_sucursal"][nombre_sucursal][clave] += fila['cantidad']
+
+        for fila in reservas:
+            resumen[fila['libro_id']]["reservas_pendientes"] = fila['cantidad']
+
+        for datos in resumen.values():
+            datos["por_sucursal"] = list(datos["por_sucursal"].values())
+        return resumen
+
 # Ejemplar fisico de un libro
 class Ejemplar(models.Model):
     ESTADOS = (
@@ -49,11 +121,48 @@ class Ejemplar(models.Model):
     codigo_barras = models.CharField(max_length=30, unique=True) 
     estado = models.CharField(max_length=20, choices=ESTADOS, default='disponible')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['libro', 'estado'], name='ejemplar_libro_estado_idx'),
+            models.Index(fields=['sucursal', 'estado'], name='ejemplar_sucursal_estado_idx'),
+        ]
+
     def __str__(self):
         return f"{self.libro.titulo} ({self.codigo_barras}) - {self.sucursal.nombre}"
 
+# Contador desnormalizado de ejemplares por libro, sucursal y estado (ver api.contadores)
+class ContadorEjemplares(models.Model):
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='contadores')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='contadores')
+    estado = models.CharField(max_length=20, choices=Ejemplar.ESTADOS)
+    cantidad = models.IntegerField(default=0)
+    # Fecha del último cambio de ejemplares del libro en esta sucursal y estado (ETag del catálogo)
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['libro', 'sucursal', 'estado'], name='contador_libro_sucursal_estado'),
+        ]
+
+    def __str__(self):
+        return f"{self.libro_id} / {self.sucursal_id} / {self.estado}: {self.cantidad}"
+
+# Consultas de préstamos
+class PrestamoQuerySet(models.QuerySet):
+    def resumen_por_usuario(self, usuario_ids):
+        """Préstamos activos y multas pendientes de varios usuarios en un solo GROUP BY."""
+        filas = (
+            self.filter(usuario_id__in=usuario_ids, estado__in=Prestamo.ESTADOS_ABIERTOS)
+            .values('usuario_id')
+            .annotate(activos=Count('id'), multas=Sum('multa'))
+        )
+        return {fila['usuario_id']: (fila['activos'], fila['multas']) for fila in filas}
+
 # Préstamo de un ejemplar a usuario
 class Prestamo(models.Model):
+    # Préstamos que siguen fuera de la biblioteca (un vencido sigue contando como activo)
+    ESTADOS_ABIERTOS = ('activo', 'vencido')
+
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='prestamos')
     ejemplar = models.ForeignKey(Ejemplar, on_delete=models.CASCADE, related_name='prestamos') 
     fecha_prestamo = models.DateField(auto_now_add=True) 
@@ -61,9 +170,39 @@ class Prestamo(models.Model):
     estado = models.CharField(max_length=20, default='activo')
     multa = models.DecimalField(max_digits=6, decimal_places=2, default=0) 
 
+    objects = PrestamoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Préstamos activos / vencidos de un usuario (límite de 3, historial, multas pendientes)
+            models.Index(fields=['usuario', 'estado'], name='prestamo_usuario_estado_idx'),
+            # Listados por estado y barrido de vencidos por fecha
+            models.Index(fields=['estado', 'fecha_devolucion'], name='prestamo_estado_fecha_idx'),
+            # Reporte de morosidad: índice cubriente para SUM(multa) agrupado por usuario
+            models.Index(fields=['usuario', 'multa'], name='prestamo_usuario_multa_idx'),
+            # Reconstrucción de los resúmenes diarios por fecha de préstamo
+            models.Index(fields=['fecha_prestamo'], name='prestamo_fecha_prestamo_idx'),
+        ]
+
     def __str__(self):
         return f"{self.usuario.username} - {self.ejemplar.libro.titulo}"
 
+# Multas acumuladas por usuario (todas sus multas, préstamos abiertos y devueltos) para el reporte
+# de morosidad; se recalcula desde Prestamo cada vez que cambia una multa (ver api.prestamos y api.signals)
+class MultaUsuario(models.Model):
+    usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True, related_name='multa_total')
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    prestamos_con_multa = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Ranking y umbral: ORDER BY total DESC / WHERE total >= x recorren solo el índice
+            models.Index(fields=['total'], name='multa_usuario_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.total} en {self.prestamos_con_multa} préstamos"
+
 # Reserva de un libro por usuario
 class Reserva(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='reservas') 
@@ -72,13 +211,68 @@ class Reserva(models.Model):
     estado = models.CharField(max_length=20, default='en cola')  
     posicion_cola = models.PositiveIntegerField(default=1) 
 
+    class Meta:
+        indexes = [
+            # Cola de un libro y avance de posiciones
+            models.Index(fields=['libro', 'estado', 'posicion_cola'], name='reserva_libro_estado_pos_idx'),
+            # Reservas expiradas (liberar_reservas_expiradas)
+            models.Index(fields=['estado', 'fecha_reserva'], name='reserva_estado_fecha_idx'),
+        ]
+
     def __str__(self):
         return f"{self.usuario.username} reserva {self.libro.titulo} (Posición: {self.posicion_cola})"
 
     @staticmethod
     def liberar_reservas_expiradas():
-        """Libera reservas que llevan más de 2 días en cola."""
-        expiradas = Reserva.objects.filter(estado='en cola', fecha_reserva__lt=timezone.now()-timezone.timedelta(days=2))
-        for reserva in expiradas:
-            reserva.estado = 'expirada'
-            reserva.save()
\ No newline at end of file
+        """Libera reservas que llevan más de 2 días en cola (ver api.reservas.expirar_reservas)."""
+        from .reservas import expirar_reservas
+        return expirar_reservas()
+
+# Cola de reservas de un libro: su fila es el lock de la cola y guarda la última posición asignada
+class ColaReserva(models.Model):
+    libro = models.OneToOneField(Libro, on_delete=models.CASCADE, primary_key=True, related_name='cola')
+    ultima_posicion = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Cola de {self.libro_id} (última posición: {self.ultima_posicion})"
+
+# Resumen diario de préstamos para los reportes; se actualiza al prestar y devolver (ver api.resumenes)
+class ResumenDiario(models.Model):
+    fecha = models.DateField(db_index=True)
+    prestamos = models.PositiveIntegerField(default=0)
+    devoluciones = models.PositiveIntegerField(default=0)
+    multas = models.PositiveIntegerField(default=0)  # devoluciones con multa
+    monto_multas = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+# Resumen diario por libro
+class ResumenDiarioLibro(ResumenDiario):
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='resumenes_diarios')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['libro', 'fecha'], name='resumen_libro_fecha')]
+
+    def __str__(self):
+        return f"{self.fecha} / libro {self.libro_id}: {self.prestamos} préstamos"
+
+# Resumen diario por usuario
+class ResumenDiarioUsuario(ResumenDiario):
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='resumenes_diarios')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['usuario', 'fecha'], name='resumen_usuario_fecha')]
+
+    def __str__(self):
+        return f"{self.fecha} / usuario {self.usuario_id}: {self.prestamos} préstamos"
+
+# Resumen diario por sucursal (la del ejemplar en el momento del préstamo)
+class ResumenDiarioSucursal(ResumenDiario):
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='resumenes_diarios')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['sucursal', 'fecha'], name='resumen_sucursal_fecha')]
+
+    def __str__(self):
+        return f"{self.fecha} / sucursal {self.sucursal_id}: {self.prestamos} préstamos"
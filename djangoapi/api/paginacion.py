@@ -0,0 +1,98 @@
+import json
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+def orden_con_pk(orden, modelo):
+    """El orden como tupla, terminado en la clave primaria para que sea total."""
+    orden = (orden,) if isinstance(orden, str) else tuple(orden)
+    pk = modelo._meta.pk.attname
+    if orden[-1].lstrip('-') not in ('pk', pk):
+        orden += ('-' + pk if orden[0].startswith('-') else pk,)
+    return orden
+
+
+def filtro_posicion(orden, valores, reverse=False):
+    """Filas estrictamente después de `valores` (uno por campo de `orden`): (a > x) OR (a = x AND b > y) OR ..."""
+    condiciones = []
+    for i, campo_orden in enumerate(orden):
+        campo = campo_orden.lstrip('-')
+        lookup = 'lt' if campo_orden.startswith('-') != reverse else 'gt'
+        iguales = {c.lstrip('-'): v for c, v in zip(orden[:i], valores)}
+        condiciones.append(Q(**iguales, **{f'{campo}__{lookup}': valores[i]}))
+    return reduce(or_, condiciones)
+
+
+# Paginación por cursor (keyset): cada página cuesta O(tamaño de página) sin importar la profundidad.
+# DRF posiciona el cursor solo con el primer campo del orden y desempata con un offset (tope 1000), así que
+# con muchos empates (relevancia, posicion_cola, total de multas) repetiría páginas. Aquí la posición lleva
+# todos los campos del orden, que termina en la clave primaria, y se filtra por la tupla completa.
+class PaginacionCursor(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        # Cada vista declara su orden con `orden_cursor`; si no termina en la clave primaria se agrega
+        self.ordering = getattr(view, 'orden_cursor', self.ordering)
+        return orden_con_pk(super().get_ordering(request, queryset, view), queryset.model)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            queryset = queryset.filter(filtro_posicion(self.ordering, self.leer_posicion(current_position), reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if has_following_position else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+        self.display_page_controls = self.has_previous or self.has_next
+        return self.page
+
+    def leer_posicion(self, posicion):
+        try:
+            valores = json.loads(posicion)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(valores, list) or len(valores) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return valores
+
+    def _get_position_from_instance(self, instance, ordering):
+        valores = []
+        for orden in ordering:
+            campo = orden.lstrip('-')
+            valor = instance[campo] if isinstance(instance, dict) else getattr(instance, campo)
+            valores.append(valor if isinstance(valor, (int, float)) else str(valor))
+        return json.dumps(valores)
+
+    def es_primera_pagina(self, request):
+        return not request.query_params.get(self.cursor_query_param)
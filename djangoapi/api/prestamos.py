@@ -0,0 +1,145 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import Case, Count, Sum, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .contadores import ajustar
+from .models import Ejemplar, MultaUsuario, Prestamo, Usuario
+from .resumenes import registrar_devolucion, registrar_prestamo
+
+MAX_PRESTAMOS_ABIERTOS = 3
+MULTA_POR_DIA = 1000
+# Prestamo.multa es DecimalField(max_digits=6, decimal_places=2)
+MULTA_MAXIMA = Decimal('9999.99')
+TAMANO_LOTE = 1000
+
+
+def calcular_multa(fecha_devolucion, hoy):
+    """Multa por los días de atraso respecto a la fecha estipulada, limitada al máximo de la columna."""
+    if not fecha_devolucion or hoy <= fecha_devolucion:
+        return Decimal(0)
+    return min(Decimal((hoy - fecha_devolucion).days * MULTA_POR_DIA), MULTA_MAXIMA)
+
+
+def multa_esperada(hoy):
+    """Expresión con la multa de un préstamo vencido a la fecha `hoy`. Solo las fechas de los últimos días
+    quedan por debajo del máximo, así que el CASE tiene a lo sumo MULTA_MAXIMA / MULTA_POR_DIA ramas."""
+    dias_hasta_el_maximo = int(MULTA_MAXIMA // MULTA_POR_DIA) + 1
+    fechas = [hoy - timedelta(days=dias) for dias in range(1, dias_hasta_el_maximo)]
+    return Case(
+        *(When(fecha_devolucion=fecha, then=Value(calcular_multa(fecha, hoy))) for fecha in fechas),
+        default=Value(MULTA_MAXIMA), output_field=Prestamo._meta.get_field('multa'),
+    )
+
+
+def marcar_vencidos(hoy=None, lote=TAMANO_LOTE):
+    """Pasa a 'vencido' los préstamos activos atrasados y recalcula la multa de todos los vencidos.
+
+    Todo son UPDATE por conjuntos en lotes de ids: primero el cambio de estado y después la multa, solo
+    de los préstamos cuya multa cambia. La multa se calcula desde la fecha, no se acumula, así que ejecutar
+    varias veces el mismo día no cambia nada. Al final se refresca MultaUsuario solo para los usuarios
+    cuyas multas cambiaron.
+    """
+    hoy = hoy or timezone.localdate()
+    resultado = {'vencidos': 0, 'multas_actualizadas': 0}
+    while True:
+        ids = list(
+            Prestamo.objects.filter(estado='activo', fecha_devolucion__lt=hoy)
+            .order_by('id').values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            break
+        resultado['vencidos'] += Prestamo.objects.filter(id__in=ids, estado='activo').update(estado='vencido')
+
+    multa = multa_esperada(hoy)
+    cambian = Prestamo.objects.filter(estado='vencido', fecha_devolucion__lt=hoy).exclude(multa=multa)
+    usuarios = set()
+    ultimo_id = 0
+    while True:
+        filas = list(cambian.filter(id__gt=ultimo_id).order_by('id').values_list('id', 'usuario_id')[:lote])
+        if not filas:
+            break
+        ultimo_id = filas[-1][0]
+        usuarios.update(usuario_id for _, usuario_id in filas)
+        resultado['multas_actualizadas'] += Prestamo.objects.filter(id__in=[id_ for id_, _ in filas]).update(
+            multa=multa
+        )
+    refrescar_multas(sorted(usuarios), lote)
+    return resultado
+
+
+def refrescar_multas(usuario_ids, lote=TAMANO_LOTE):
+    """Recalcula MultaUsuario de estos usuarios con un SUM agrupado por lote (cubierto por el índice
+    usuario + multa de Prestamo) y lo guarda con un upsert."""
+    # MySQL (ON DUPLICATE KEY UPDATE) no acepta indicar la columna del conflicto
+    unique_fields = ['usuario'] if connection.features.supports_update_conflicts_with_target else None
+    for inicio in range(0, len(usuario_ids), lote):
+        ids = usuario_ids[inicio:inicio + lote]
+        filas = (
+            Prestamo.objects.filter(usuario_id__in=ids, multa__gt=0)
+            .values('usuario_id')
+            .annotate(total=Sum('multa'), cantidad=Count('id'))
+            .order_by()
+        )
+        totales = {fila['usuario_id']: (fila['total'], fila['cantidad']) for fila in filas}
+        multas = []
+        for usuario_id in ids:
+            total, cantidad = totales.get(usuario_id, (0, 0))
+            multas.append(MultaUsuario(usuario_id=usuario_id, total=total, prestamos_con_multa=cantidad))
+        MultaUsuario.objects.bulk_create(
+            multas, update_conflicts=True, unique_fields=unique_fields,
+            update_fields=['total', 'prestamos_con_multa'],
+        )
+
+
+def prestar(serializer):
+    """Crea el préstamo y marca el ejemplar como prestado en una sola transacción.
+
+    El ejemplar y el usuario se bloquean con SELECT ... FOR UPDATE: dos peticiones no pueden prestar
+    el mismo ejemplar ni superar juntas el límite de préstamos del usuario.
+    """
+    ejemplar_id = serializer.validated_data['ejemplar'].pk
+    usuario_id = serializer.validated_data['usuario'].pk
+    with transaction.atomic():
+        ejemplar = (
+            Ejemplar.objects.select_for_update().only('id', 'estado', 'libro_id', 'sucursal_id').get(pk=ejemplar_id)
+        )
+        if ejemplar.estado != 'disponible':
+            raise ValidationError('El ejemplar no está disponible.')
+        Usuario.objects.select_for_update().filter(pk=usuario_id).values_list('pk', flat=True).get()
+        abiertos = Prestamo.objects.filter(usuario_id=usuario_id, estado__in=Prestamo.ESTADOS_ABIERTOS).count()
+        if abiertos >= MAX_PRESTAMOS_ABIERTOS:
+            raise ValidationError('No puedes tener más de 3 préstamos activos.')
+        prestamo = serializer.save(estado='activo', multa=0)
+        Ejemplar.objects.filter(pk=ejemplar_id).update(estado='prestado')
+        ajustar({
+            (ejemplar.libro_id, ejemplar.sucursal_id, 'disponible'): -1,
+            (ejemplar.libro_id, ejemplar.sucursal_id, 'prestado'): 1,
+        })
+        registrar_prestamo(prestamo, ejemplar.libro_id, ejemplar.sucursal_id)
+    return prestamo
+
+
+def devolver(prestamo):
+    """Cierra el préstamo con su multa y deja el ejemplar disponible en una sola transacción."""
+    with transaction.atomic():
+        prestamo = Prestamo.objects.select_for_update().get(pk=prestamo.pk)
+        if prestamo.estado not in Prestamo.ESTADOS_ABIERTOS:
+            raise ValidationError('El préstamo ya fue devuelto.')
+        hoy = timezone.localdate()
+        # Cálculo de multa (1000 por dia de retraso)
+        prestamo.multa = calcular_multa(prestamo.fecha_devolucion, hoy)
+        prestamo.estado = 'devuelto'
+        prestamo.fecha_devolucion = hoy
+        prestamo.save(update_fields=['estado', 'fecha_devolucion', 'multa'])
+        libro_id, sucursal_id, estado = (
+            Ejemplar.objects.select_for_update().filter(pk=prestamo.ejemplar_id)
+            .values_list('libro_id', 'sucursal_id', 'estado').get()
+        )
+        if estado == 'prestado':
+            Ejemplar.objects.filter(pk=prestamo.ejemplar_id).update(estado='disponible')
+            ajustar({(libro_id, sucursal_id, 'prestado'): -1, (libro_id, sucursal_id, 'disponible'): 1})
+        # La multa del save() ya refrescó MultaUsuario (api.signals)
+        registrar_devolucion(prestamo, libro_id, sucursal_id)
+    return prestamo
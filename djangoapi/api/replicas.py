@@ -0,0 +1,60 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+
+# Réplicas de lectura.
+# Las vistas con `lectura_en_replica = True` leen en GET/HEAD de una de REPLICAS_LECTURA; todo lo demás
+# (escrituras, SELECT ... FOR UPDATE, vistas sin marcar) va a la base principal. Después de una escritura
+# el resto de la petición vuelve a la principal, y también las peticiones de la misma sesión durante
+# REPLICAS_PEGAJOSA_SEGUNDOS, para que quien acaba de escribir lea lo que escribió. Esa marca va en
+# CACHES['compartida'] porque la siguiente petición puede caer en otro proceso.
+
+ALIAS_MARCAS = 'compartida'
+_peticion = ContextVar('replicas_peticion', default=None)
+
+
+# Estado de enrutamiento de la petición en curso (lo crea ReplicasLecturaMiddleware)
+class EstadoPeticion:
+    def __init__(self):
+        self.replica = None
+        self.escribio = False
+
+
+def iniciar_peticion():
+    estado = EstadoPeticion()
+    return estado, _peticion.set(estado)
+
+
+def terminar_peticion(token):
+    _peticion.reset(token)
+
+
+def elegir_replica():
+    replicas = getattr(settings, 'REPLICAS_LECTURA', [])
+    return random.choice(replicas) if replicas else None
+
+
+class EnrutadorReplicas:
+    def db_for_read(self, model, **hints):
+        estado = _peticion.get()
+        if estado and estado.replica and not estado.escribio:
+            return estado.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        estado = _peticion.get()
+        if estado:
+            estado.escribio = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {'default', *getattr(settings, 'REPLICAS_LECTURA', [])}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por la replicación, no por migrate
+        if db in getattr(settings, 'REPLICAS_LECTURA', []):
+            return False
+        return None
@@ -0,0 +1,105 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from .cache import invalidar
+from .models import ColaReserva, Reserva
+
+# Días que una reserva puede permanecer en cola
+DIAS_EXPIRACION = 2
+TAMANO_LOTE = 1000
+
+
+# Todas las operaciones sobre la cola de un libro toman primero el lock de su fila en ColaReserva,
+# así las altas y cancelaciones concurrentes del mismo título se serializan. Quien bloquea una cola
+# va a modificarla (a menudo con UPDATE por conjuntos, sin señales), así que aquí se invalida su caché.
+def _bloquear_cola(libro_id):
+    invalidar(f'cola:{libro_id}')
+    ColaReserva.objects.get_or_create(libro_id=libro_id)
+    return ColaReserva.objects.select_for_update().get(libro_id=libro_id)
+
+
+def _bloquear_colas(libro_ids):
+    # Siempre en orden de pk para que dos procesos no se bloqueen mutuamente
+    invalidar(*(f'cola:{libro_id}' for libro_id in libro_ids))
+    ColaReserva.objects.bulk_create([ColaReserva(libro_id=i) for i in libro_ids], ignore_conflicts=True)
+    return list(ColaReserva.objects.select_for_update().filter(libro_id__in=libro_ids).order_by('pk'))
+
+
+def encolar_reserva(serializer, usuario):
+    """Guarda la reserva al final de la cola del libro en O(1): la posición sale del contador de la cola."""
+    libro = serializer.validated_data['libro']
+    with transaction.atomic():
+        cola = _bloquear_cola(libro.pk)
+        posicion = cola.ultima_posicion + 1
+        ColaReserva.objects.filter(pk=cola.pk).update(ultima_posicion=F('ultima_posicion') + 1)
+        return serializer.save(usuario=usuario, posicion_cola=posicion)
+
+
+def cancelar_reserva(reserva):
+    """Cancela la reserva y adelanta con un único UPDATE a quienes estaban detrás en la cola."""
+    with transaction.atomic():
+        cola = _bloquear_cola(reserva.libro_id)
+        # Releer bajo el lock: otra petición pudo cancelarla o moverla
+        reserva.refresh_from_db(fields=['estado', 'posicion_cola'])
+        if reserva.estado != 'en cola':
+            return reserva
+        reserva.estado = 'cancelada'
+        reserva.save(update_fields=['estado'])
+        Reserva.objects.filter(
+            libro_id=reserva.libro_id, estado='en cola', posicion_cola__gt=reserva.posicion_cola
+        ).update(posicion_cola=F('posicion_cola') - 1)
+        ColaReserva.objects.filter(pk=cola.pk, ultima_posicion__gt=0).update(
+            ultima_posicion=F('ultima_posicion') - 1
+        )
+    return reserva
+
+
+def compactar_colas(libro_ids):
+    """Renumera 1..n las reservas en cola de cada libro con ROW_NUMBER() y ajusta su contador.
+    Debe llamarse con las colas bloqueadas. Devuelve cuántas reservas cambiaron de posición."""
+    filas = (
+        Reserva.objects.filter(libro_id__in=libro_ids, estado='en cola')
+        .annotate(nueva_posicion=Window(
+            RowNumber(), partition_by=[F('libro_id')], order_by=[F('posicion_cola'), F('id')]
+        ))
+        .values_list('id', 'libro_id', 'posicion_cola', 'nueva_posicion')
+    )
+    cambios = []
+    ultimas = dict.fromkeys(libro_ids, 0)
+    for reserva_id, libro_id, posicion, nueva_posicion in filas:
+        ultimas[libro_id] = max(ultimas[libro_id], nueva_posicion)
+        if posicion != nueva_posicion:
+            cambios.append(Reserva(id=reserva_id, posicion_cola=nueva_posicion))
+    Reserva.objects.bulk_update(cambios, ['posicion_cola'], batch_size=TAMANO_LOTE)
+    for libro_id, ultima in ultimas.items():
+        ColaReserva.objects.filter(libro_id=libro_id).exclude(ultima_posicion=ultima).update(ultima_posicion=ultima)
+    return len(cambios)
+
+
+def expirar_reservas(dias=DIAS_EXPIRACION, lote=TAMANO_LOTE):
+    """Marca como expiradas las reservas en cola más antiguas que `dias`, en lotes de `lote`,
+    y compacta las colas afectadas. Puede correr junto a la API: usa los mismos locks de cola."""
+    limite = timezone.now() - timedelta(days=dias)
+    resultado = {'expiradas': 0, 'libros': 0, 'reordenadas': 0}
+    afectados = set()
+    ultimo_id = 0
+    while True:
+        candidatas = list(
+            Reserva.objects.filter(estado='en cola', fecha_reserva__lt=limite, id__gt=ultimo_id)
+            .order_by('id').values_list('id', 'libro_id')[:lote]
+        )
+        if not candidatas:
+            resultado['libros'] = len(afectados)
+            return resultado
+        ultimo_id = candidatas[-1][0]
+        libro_ids = sorted({libro_id for _, libro_id in candidatas})
+        with transaction.atomic():
+            _bloquear_colas(libro_ids)
+            # El estado se vuelve a comprobar en el UPDATE: pudieron cancelarse mientras tanto
+            resultado['expiradas'] += Reserva.objects.filter(
+                id__in=[reserva_id for reserva_id, _ in candidatas], estado='en cola'
+            ).update(estado='expirada')
+            resultado['reordenadas'] += compactar_colas(libro_ids)
+        afectados.update(libro_ids)
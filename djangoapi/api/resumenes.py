@@ -0,0 +1,96 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import Prestamo, ResumenDiarioLibro, ResumenDiarioUsuario, ResumenDiarioSucursal
+
+TAMANO_LOTE = 1000
+# Días que se recalculan por transacción en reconstruir()
+DIAS_POR_VENTANA = 31
+
+# Cada resumen con su campo y el campo equivalente de Prestamo para recalcularlo
+DIMENSIONES = (
+    (ResumenDiarioLibro, 'libro_id', 'ejemplar__libro_id'),
+    (ResumenDiarioUsuario, 'usuario_id', 'usuario_id'),
+    (ResumenDiarioSucursal, 'sucursal_id', 'ejemplar__sucursal_id'),
+)
+
+
+def _sumar(modelo, fecha, incrementos, **clave):
+    """UPDATE campo = campo + n sobre la fila del día; la fila se crea solo la primera vez."""
+    filas = modelo.objects.filter(fecha=fecha, **clave)
+    cambios = {campo: F(campo) + n for campo, n in incrementos.items()}
+    if not filas.update(**cambios):
+        modelo.objects.bulk_create([modelo(fecha=fecha, **clave)], ignore_conflicts=True)
+        filas.update(**cambios)
+
+
+def _registrar(fecha, incrementos, libro_id, usuario_id, sucursal_id):
+    claves = {'libro_id': libro_id, 'usuario_id': usuario_id, 'sucursal_id': sucursal_id}
+    for modelo, campo, _ in DIMENSIONES:
+        _sumar(modelo, fecha, incrementos, **{campo: claves[campo]})
+
+
+def registrar_prestamo(prestamo, libro_id, sucursal_id):
+    """Suma el préstamo a los resúmenes de su fecha. Llamar dentro de la transacción de prestar()."""
+    _registrar(prestamo.fecha_prestamo, {'prestamos': 1}, libro_id, prestamo.usuario_id, sucursal_id)
+
+
+def registrar_devolucion(prestamo, libro_id, sucursal_id):
+    """Suma la devolución (y su multa, si la hay) a los resúmenes del día en que se devolvió."""
+    incrementos = {'devoluciones': 1}
+    if prestamo.multa > 0:
+        incrementos.update(multas=1, monto_multas=prestamo.multa)
+    _registrar(prestamo.fecha_devolucion, incrementos, libro_id, prestamo.usuario_id, sucursal_id)
+
+
+def _calcular(origen, inicio, fin):
+    """Resúmenes de [inicio, fin] calculados desde Prestamo: {(fecha, clave): campos}."""
+    resumenes = {}
+    vacio = {'prestamos': 0, 'devoluciones': 0, 'multas': 0, 'monto_multas': Decimal(0)}
+    prestados = (
+        Prestamo.objects.filter(fecha_prestamo__range=(inicio, fin))
+        .values(fecha=F('fecha_prestamo'), clave=F(origen))
+        .annotate(prestamos=Count('id'))
+        .order_by()
+    )
+    for fila in prestados:
+        resumenes.setdefault((fila['fecha'], fila['clave']), dict(vacio))['prestamos'] = fila['prestamos']
+    devueltos = (
+        Prestamo.objects.filter(estado='devuelto', fecha_devolucion__range=(inicio, fin))
+        .values(fecha=F('fecha_devolucion'), clave=F(origen))
+        .annotate(
+            devoluciones=Count('id'),
+            multas=Count('id', filter=Q(multa__gt=0)),
+            monto_multas=Coalesce(Sum('multa'), Decimal(0)),
+        )
+        .order_by()
+    )
+    for fila in devueltos:
+        resumen = resumenes.setdefault((fila['fecha'], fila['clave']), dict(vacio))
+        resumen.update(devoluciones=fila['devoluciones'], multas=fila['multas'], monto_multas=fila['monto_multas'])
+    return resumenes
+
+
+def reconstruir(desde, hasta, dias=DIAS_POR_VENTANA):
+    """Recalcula los resúmenes de [desde, hasta] desde Prestamo, una transacción por ventana de `dias`.
+
+    Las sucursales se toman de la ubicación actual de cada ejemplar: los traslados posteriores
+    al préstamo no quedan en el historial. Devuelve cuántas filas de resumen se escribieron.
+    """
+    escritas = 0
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=dias - 1), hasta)
+        with transaction.atomic():
+            for modelo, campo, origen in DIMENSIONES:
+                modelo.objects.filter(fecha__range=(inicio, fin)).delete()
+                filas = [
+                    modelo(fecha=fecha, **{campo: clave}, **valores)
+                    for (fecha, clave), valores in _calcular(origen, inicio, fin).items()
+                ]
+                modelo.objects.bulk_create(filas, batch_size=TAMANO_LOTE)
+                escritas += len(filas)
+        inicio = fin + timedelta(days=1)
+    return escritas
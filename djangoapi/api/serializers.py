@@ -1,8 +1,17 @@
 from rest_framework import serializers
-from .models import Libro, Sucursal, Prestamo, Reserva, Ejemplar, Usuario
+from .models import Libro, Sucursal, Prestamo, Reserva, Ejemplar, Usuario, MultaUsuario
+from .importacion import normalizar_isbn
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
-from django.db.models import Sum
+
+# Calcula los contadores de préstamos de todos los usuarios de una vez
+class UsuarioListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        usuarios = list(data.all() if hasattr(data, 'all') else data)
+        resumen = Prestamo.objects.resumen_por_usuario([u.pk for u in usuarios])
+        for usuario in usuarios:
+            usuario._resumen_prestamos = resumen.get(usuario.pk, (0, None))
+        return super().to_representation(usuarios)
 
 # Serializador Usuario
 class UsuarioSerializer(serializers.ModelSerializer):
@@ -18,6 +27,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
             'id', 'username', 'password', 'email', 'nombre', 'apellido', 'tipo',
             'prestamos_activos', 'multas_pendientes'
         ]
+        list_serializer_class = UsuarioListSerializer
 
     def create(self, validated_data):
         password = validated_data.pop('password')
@@ -32,12 +42,18 @@ class UsuarioSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
+    def _resumen_prestamos(self, obj):
+        # Reutiliza lo calculado por UsuarioListSerializer; si no, una sola consulta para ambos campos
+        if not hasattr(obj, '_resumen_prestamos'):
+            obj._resumen_prestamos = Prestamo.objects.resumen_por_usuario([obj.pk]).get(obj.pk, (0, None))
+        return obj._resumen_prestamos
+
     def get_prestamos_activos(self, obj):
-        return Prestamo.objects.filter(usuario=obj, estado='activo').count()
+        return self._resumen_prestamos(obj)[0]
 
     def get_multas_pendientes(self, obj):
         # Suma multas de prestamos activos del usuario y devuelve como entero
-        total = Prestamo.objects.filter(usuario=obj, estado='activo').aggregate(total=Sum('multa'))['total']
+        total = self._resumen_prestamos(obj)[1]
         return int(total) if total else 0
 
 # Serializador Libro
@@ -49,18 +65,33 @@ class LibroSerializer(serializers.ModelSerializer):
         model = Libro
         fields = '__all__'
 
+    # Usa las anotaciones de Libro.objects.con_conteo_ejemplares() si existen
     def get_total_ejemplares(self, obj):
+        if hasattr(obj, 'total_ejemplares'):
+            return obj.total_ejemplares
         return obj.ejemplares.count()
 
     def get_ejemplares_disponibles(self, obj):
+        if hasattr(obj, 'ejemplares_disponibles'):
+            return obj.ejemplares_disponibles
         return obj.ejemplares.filter(estado='disponible').count()
+
+    # ISBN guardado normalizado (ISBN-13 sin guiones), igual que en la importación; si no es válido, tal cual
+    def validate_isbn(self, valor):
+        isbn = normalizar_isbn(valor) or valor
+        otros = Libro.objects.filter(isbn=isbn)
+        if self.instance:
+            otros = otros.exclude(pk=self.instance.pk)
+        if isbn != valor and otros.exists():
+            raise ValidationError('Ya existe un libro con este ISBN.')
+        return isbn
     
     def validate(self, data):
         # No puede eliminar libro si tiene prestamos activos
         if self.instance:
             prestamos_activos = Prestamo.objects.filter(
                 ejemplar__libro=self.instance,
-                estado='activo'
+                estado__in=Prestamo.ESTADOS_ABIERTOS
             )
             request = self.context.get('request')
             if request and request.method == 'DELETE' and prestamos_activos.exists():
@@ -88,9 +119,10 @@ class PrestamoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def validate(self, data):
-        usuario = self.context['request'].user
+        # El préstamo es del usuario indicado (lo registra un bibliotecario); prestar() repite el control con lock
+        usuario = data.get('usuario') or self.context['request'].user
         # Max 3 prestamos activos
-        if Prestamo.objects.filter(usuario=usuario, estado='activo').count() >= 3:
+        if Prestamo.objects.filter(usuario=usuario, estado__in=Prestamo.ESTADOS_ABIERTOS).count() >= 3:
             raise ValidationError('No puedes tener más de 3 préstamos activos.')
         # Max prestamo 14 días
         if data.get('fecha_devolucion'):
@@ -108,6 +140,16 @@ class ReservaSerializer(serializers.ModelSerializer):
     def validate(self, data):
         usuario = self.context['request'].user
         # No puede reservar si el usuario tiene multas
-        if Prestamo.objects.filter(usuario=usuario, multa__gt=0, estado='activo').exists():
+        if Prestamo.objects.filter(usuario=usuario, multa__gt=0, estado__in=Prestamo.ESTADOS_ABIERTOS).exists():
             raise ValidationError('No puedes reservar libros si tienes multas pendientes.')
-        return data
\ No newline at end of file
+        return data
+
+# Fila del reporte de morosidad
+class MorosidadSerializer(serializers.ModelSerializer):
+    usuario_id = serializers.IntegerField(read_only=True)
+    usuario__username = serializers.CharField(source='usuario.username', read_only=True)
+    total_multa = serializers.DecimalField(source='total', max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = MultaUsuario
+        fields = ['usuario_id', 'usuario__username', 'total_multa', 'prestamos_con_multa']
@@ -0,0 +1,109 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from .autenticacion import olvidar_usuario, publicar_estado
+from .cache import invalidar
+from .contadores import ajustar
+from .models import Ejemplar, Libro, Prestamo, Reserva, Sucursal, Usuario
+from .prestamos import refrescar_multas
+
+
+# ContadorEjemplares para los cambios hechos con save()/delete() (admin, transferencia individual).
+# Los cambios por queryset (update, bulk_create) ajustan los contadores explícitamente.
+
+def _clave(ejemplar):
+    return (ejemplar.libro_id, ejemplar.sucursal_id, ejemplar.estado)
+
+
+@receiver(post_init, sender=Ejemplar)
+def recordar_clave_original(sender, instance, **kwargs):
+    # Solo si los campos ya están cargados: leerlos aquí no debe disparar consultas de campos diferidos
+    campos = vars(instance)
+    if instance.pk and all(c in campos for c in ('libro_id', 'sucursal_id', 'estado')):
+        instance._clave_contador = _clave(instance)
+
+
+@receiver(pre_save, sender=Ejemplar)
+def cargar_clave_original(sender, instance, **kwargs):
+    if instance.pk and not hasattr(instance, '_clave_contador'):
+        original = Ejemplar.objects.filter(pk=instance.pk).values_list('libro_id', 'sucursal_id', 'estado').first()
+        if original:
+            instance._clave_contador = original
+
+
+@receiver(post_save, sender=Ejemplar)
+def actualizar_contador(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, '_clave_contador', None)
+    actual = _clave(instance)
+    if anterior != actual:
+        deltas = {actual: 1}
+        if anterior:
+            deltas[anterior] = -1
+        ajustar(deltas)
+    instance._clave_contador = actual
+
+
+@receiver(post_delete, sender=Ejemplar)
+def descontar_contador(sender, instance, **kwargs):
+    ajustar({getattr(instance, '_clave_contador', _clave(instance)): -1})
+
+
+# MultaUsuario para las multas cambiadas con save()/delete() (devolución, admin). Los cambios por queryset
+# (marcar_vencidos) refrescan explícitamente; recalcular_multas corrige los hechos por fuera del ORM.
+
+@receiver(post_init, sender=Prestamo)
+def recordar_multa_original(sender, instance, **kwargs):
+    campos = vars(instance)
+    if instance.pk and all(c in campos for c in ('usuario_id', 'multa')):
+        instance._multa_original = (instance.usuario_id, instance.multa)
+
+
+@receiver(post_save, sender=Prestamo)
+def refrescar_multa_guardada(sender, instance, created, **kwargs):
+    anterior = (instance.usuario_id, 0) if created else getattr(instance, '_multa_original', None)
+    actual = (instance.usuario_id, instance.multa)
+    if anterior != actual:
+        refrescar_multas(sorted({actual[0], anterior[0]} if anterior else {actual[0]}))
+    instance._multa_original = actual
+
+
+@receiver(post_delete, sender=Prestamo)
+def refrescar_multa_eliminada(sender, instance, origin=None, **kwargs):
+    # Al borrar el usuario su MultaUsuario se va en la misma cascada: refrescarla la volvería a crear
+    if instance.multa and not isinstance(origin, Usuario) and getattr(origin, 'model', None) is not Usuario:
+        refrescar_multas([instance.usuario_id])
+
+
+# Caché de respuestas (api.cache): cada modelo invalida los grupos de las respuestas que lo muestran.
+# Los cambios por queryset invalidan explícitamente (contadores.ajustar, importar_libros, colas de reservas).
+
+@receiver([post_save, post_delete], sender=Libro)
+def invalidar_libro(sender, instance, **kwargs):
+    invalidar('libros', f'libro:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=Ejemplar)
+def invalidar_ejemplar(sender, instance, **kwargs):
+    invalidar('libros', f'libro:{instance.libro_id}')
+
+
+@receiver([post_save, post_delete], sender=Sucursal)
+def invalidar_sucursal(sender, instance, **kwargs):
+    invalidar('sucursales', f'sucursal:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=Reserva)
+def invalidar_reserva(sender, instance, **kwargs):
+    invalidar(f'cola:{instance.libro_id}')
+
+
+# Filas de Usuario cacheadas por api.autenticacion en este proceso y estado para revocar sus tokens
+@receiver(post_save, sender=Usuario)
+def usuario_guardado(sender, instance, **kwargs):
+    olvidar_usuario(instance.pk)
+    publicar_estado(instance.pk, instance.is_active, instance.tipo)
+
+
+@receiver(post_delete, sender=Usuario)
+def usuario_eliminado(sender, instance, **kwargs):
+    olvidar_usuario(instance.pk)
+    publicar_estado(instance.pk, False, None)
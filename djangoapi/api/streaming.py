@@ -0,0 +1,69 @@
+import csv
+from rest_framework.utils.encoders import JSONEncoder
+from .paginacion import filtro_posicion, orden_con_pk
+
+# Tamaño de bloque para recorrer querysets grandes por keyset
+TAMANO_BLOQUE = 2000
+
+
+def en_bloques(queryset, orden, tamano=TAMANO_BLOQUE):
+    """Recorre el queryset en `orden` con páginas de `tamano` objetos posicionadas en el último de la
+    anterior: memoria constante también en MySQL, donde iterator() trae todo el resultado al cliente, y
+    los prefetch_related se resuelven por bloque."""
+    orden = orden_con_pk(orden, queryset.model)
+    queryset = queryset.order_by(*orden)
+    pagina = queryset
+    while True:
+        bloque = list(pagina[:tamano])
+        if bloque:
+            yield bloque
+        if len(bloque) < tamano:
+            return
+        ultimo = bloque[-1]
+        pagina = queryset.filter(filtro_posicion(orden, [getattr(ultimo, c.lstrip('-')) for c in orden]))
+
+
+def json_en_streaming(queryset, orden, serializar, tamano=TAMANO_BLOQUE):
+    """Genera un arreglo JSON por partes; `serializar` recibe una lista de objetos y devuelve sus datos."""
+    encoder = JSONEncoder(ensure_ascii=False)
+    yield '['
+    primero = True
+    for bloque in en_bloques(queryset, orden, tamano):
+        for fila in serializar(bloque):
+            yield ('' if primero else ',') + encoder.encode(fila)
+            primero = False
+    yield ']'
+
+
+def filas_por_keyset(queryset, campos, tamano=TAMANO_BLOQUE):
+    """Recorre el queryset en orden de id con páginas `id > último`; memoria constante también en MySQL,
+    donde iterator() no usa cursores del lado del servidor."""
+    ultimo_id = None
+    while True:
+        pagina = queryset.order_by('id')
+        if ultimo_id is not None:
+            pagina = pagina.filter(id__gt=ultimo_id)
+        filas = list(pagina.values(*campos)[:tamano])
+        if not filas:
+            return
+        yield from filas
+        ultimo_id = filas[-1]['id']
+
+
+def ndjson_en_streaming(filas):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for fila in filas:
+        yield encoder.encode(fila) + '\n'
+
+
+# Buffer mínimo para que csv.writer devuelva cada línea en vez de escribirla
+class _Eco:
+    def write(self, valor):
+        return valor
+
+
+def csv_en_streaming(filas, campos):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(campos)
+    for fila in filas:
+        yield escritor.writerow([fila[campo] for campo in campos])
@@ -0,0 +1,34 @@
+import logging
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+_iniciado = False
+
+
+def _ejecutar_periodicamente(intervalo, tarea):
+    evento = threading.Event()
+    while not evento.wait(intervalo):
+        close_old_connections()
+        try:
+            tarea()
+        except Exception:
+            logger.exception('Falló la tarea programada %s', tarea.__name__)
+        finally:
+            close_old_connections()
+
+
+def iniciar_programador():
+    """Programador en proceso opcional; en producción es preferible cron con los comandos de gestión.
+    Se activa con BARRIDO_VENCIDOS_INTERVALO (segundos) en settings y lo llaman djangoapi.wsgi y
+    djangoapi.asgi: un hilo por proceso del servidor (el barrido es idempotente)."""
+    global _iniciado
+    intervalo = getattr(settings, 'BARRIDO_VENCIDOS_INTERVALO', None)
+    if _iniciado or not intervalo:
+        return
+    from .prestamos import marcar_vencidos
+    _iniciado = True
+    threading.Thread(
+        target=_ejecutar_periodicamente, args=(intervalo, marcar_vencidos), name='barrido-vencidos', daemon=True
+    ).start()
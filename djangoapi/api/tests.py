@@ -1,3 +1,1036 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.apps import apps
+from django.contrib.auth import authenticate
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import (
+    Usuario, Sucursal, Libro, Ejemplar, Prestamo, Reserva, ColaReserva, ContadorEjemplares,
+    ResumenDiarioLibro, ResumenDiarioUsuario, MultaUsuario,
+)
+from .autenticacion import TokenBibliotecaSerializer
+from .importacion import importar_libros, normalizar_isbn
+from .inventario import ConflictoCarga, crear_ejemplares, transferir_ejemplares, validar_ejemplares
+from .middleware import PresupuestoConsultasExcedido, ReplicasLecturaMiddleware
+from .prestamos import marcar_vencidos
+from .replicas import EnrutadorReplicas, iniciar_peticion, terminar_peticion
+from .reservas import cancelar_reserva, encolar_reserva
+from .serializers import ReservaSerializer, UsuarioSerializer
+from .streaming import en_bloques
+from .usuarios import TAMANO_BLOQUE_HASH, crear_usuarios, hashear_contrasenas
+from .views import UsuarioCargaMasivaVistaAPI
 
-# Create your tests here.
+
+# Datos base compartidos por los tests de la API. Exceder el presupuesto de consultas de una vista falla
+# el test en vez de solo registrarse
+class DatosBibliotecaMixin:
+    @classmethod
+    def setUpClass(cls):
+        presupuesto = override_settings(PRESUPUESTO_CONSULTAS_ACCION='error')
+        presupuesto.enable()
+        cls.addClassCleanup(presupuesto.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='lector', password='clave-segura-123')
+        cls.bibliotecario = Usuario.objects.create_user(
+            username='bibliotecario', password='clave-segura-123', tipo='bibliotecario'
+        )
+        cls.sucursal = Sucursal.objects.create(nombre='Central', direccion='Calle 1', telefono='123')
+        cls.libros = []
+        for i in range(10):
+            libro = Libro.objects.create(
+                titulo=f'Libro {i}', autor='Autor', isbn=f'978000000{i:04d}', genero='Novela', ano_publicacion=2000
+            )
+            Ejemplar.objects.create(libro=libro, sucursal=cls.sucursal, codigo_barras=f'CB-{i}-A')
+            Ejemplar.objects.create(libro=libro, sucursal=cls.sucursal, codigo_barras=f'CB-{i}-B', estado='prestado')
+            cls.libros.append(libro)
+
+    def setUp(self):
+        # La caché de respuestas sobrevive al rollback de cada test
+        caches['respuestas'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+
+# Regresión N+1: los listados del catálogo no deben crecer con la cantidad de libros
+class CatalogoConsultasTests(DatosBibliotecaMixin, TestCase):
+    def test_listado_libros_consultas_constantes(self):
+        # Solo el listado: el sello ETag es la versión del grupo en la caché
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/libros/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data), 10)
+        self.assertEqual(respuesta.data[0]['total_ejemplares'], 2)
+        self.assertEqual(respuesta.data[0]['ejemplares_disponibles'], 1)
+
+    def test_buscar_libros_consultas_constantes(self):
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/libros/buscar/', {'disponible': 'true', 'sucursal': self.sucursal.id})
+        self.assertEqual(len(respuesta.data['results']), 10)
+        self.assertEqual(respuesta.data['results'][0]['total_ejemplares'], 2)
+        self.assertEqual(respuesta.data['results'][0]['ejemplares_disponibles'], 1)
+
+    def test_inventario_sucursal_consultas_constantes(self):
+        with self.assertNumQueries(2):
+            respuesta = self.client.get(f'/sucursales/{self.sucursal.id}/inventario/')
+        self.assertEqual(len(respuesta.data['results']), 20)
+        self.assertEqual(respuesta.data['results'][0]['libro']['total_ejemplares'], 2)
+
+
+# Los contadores de préstamos de UsuarioSerializer se calculan en bloque
+class UsuarioContadoresTests(DatosBibliotecaMixin, TestCase):
+    def test_serializar_varios_usuarios_una_consulta(self):
+        ejemplar = Ejemplar.objects.filter(estado='prestado').first()
+        Prestamo.objects.create(usuario=self.usuario, ejemplar=ejemplar, multa=1500)
+        Prestamo.objects.create(usuario=self.usuario, ejemplar=ejemplar, estado='devuelto', multa=300)
+        usuarios = list(Usuario.objects.order_by('id'))
+        with self.assertNumQueries(1):
+            datos = UsuarioSerializer(usuarios, many=True).data
+        self.assertEqual(datos[0]['prestamos_activos'], 1)
+        self.assertEqual(datos[0]['multas_pendientes'], 1500)
+        self.assertEqual(datos[1]['prestamos_activos'], 0)
+        self.assertEqual(datos[1]['multas_pendientes'], 0)
+
+
+# Disponibilidad agregada por sucursal y estado
+class DisponibilidadTests(DatosBibliotecaMixin, TestCase):
+    def test_disponibilidad_libro(self):
+        libro = self.libros[0]
+        otra = Sucursal.objects.create(nombre='Norte', direccion='Calle 2', telefono='456')
+        Ejemplar.objects.create(libro=libro, sucursal=otra, codigo_barras='CB-N-1', estado='mantenimiento')
+        # 2 consultas del sello ETag + 3 del resumen
+        with self.assertNumQueries(5):
+            respuesta = self.client.get(f'/libros/{libro.id}/disponibilidad/')
+        self.assertEqual(respuesta.data, {
+            "total_ejemplares": 3,
+            "disponibles": 1,
+            "prestados": 1,
+            "mantenimiento": 1,
+            "por_sucursal": [
+                {"sucursal": "Central", "disponibles": 1, "prestados": 1, "mantenimiento": 0},
+                {"sucursal": "Norte", "disponibles": 0, "prestados": 0, "mantenimiento": 1},
+            ],
+            "reservas_pendientes": 0,
+        })
+
+    def test_disponibilidad_lote(self):
+        ids = ','.join(str(libro.id) for libro in self.libros)
+        with self.assertNumQueries(5):
+            respuesta = self.client.get('/libros/disponibilidad/', {'ids': ids})
+        self.assertEqual(len(respuesta.data), 10)
+        self.assertEqual(respuesta.data[0]['libro'], self.libros[0].id)
+        self.assertEqual(respuesta.data[0]['disponibles'], 1)
+        self.assertEqual(self.client.get('/libros/disponibilidad/', {'ids': 'x'}).status_code, 400)
+
+
+# Búsqueda de texto libre con q=
+class BusquedaTextoTests(DatosBibliotecaMixin, TestCase):
+    def test_busqueda_q_ordena_por_relevancia(self):
+        Libro.objects.create(titulo='Cien años de soledad', autor='García Márquez', isbn='9780307474728',
+                             genero='Novela', ano_publicacion=1967)
+        Libro.objects.create(titulo='Vivir para contarla', autor='García Márquez', isbn='9781400034925',
+                             genero='Memorias', ano_publicacion=2002)
+        respuesta = self.client.get('/libros/buscar/', {'q': 'garc soledad'})
+        self.assertEqual([libro['titulo'] for libro in respuesta.data['results']], ['Cien años de soledad'])
+        respuesta = self.client.get('/libros/buscar/', {'q': 'márquez'})
+        self.assertEqual(len(respuesta.data['results']), 2)
+        respuesta = self.client.get('/libros/buscar/', {'q': '978-0307474728'})
+        self.assertEqual(respuesta.data['results'][0]['isbn'], '9780307474728')
+
+    def test_isbn_10_encuentra_el_libro_guardado_como_isbn_13(self):
+        self.client.force_authenticate(self.bibliotecario)
+        self.client.post('/libros/', {
+            'titulo': 'Viejo', 'autor': 'X', 'isbn': '0-306-40615-2', 'genero': 'Ensayo', 'ano_publicacion': 1990
+        })
+        for parametros in ({'q': '0306406152'}, {'q': '0-306-40615-2'}, {'isbn': '0-306-40615-2'}):
+            with self.subTest(**parametros):
+                respuesta = self.client.get('/libros/buscar/', parametros)
+                self.assertEqual([libro['isbn'] for libro in respuesta.data['results']], ['9780306406157'])
+
+
+# Paginación por cursor en ListaAPIViewConMensajeVacio
+class PaginacionCursorTests(DatosBibliotecaMixin, TestCase):
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos = []
+        url, params = '/libros/buscar/', {'page_size': 3}
+        while url:
+            respuesta = self.client.get(url, params)
+            vistos += [libro['id'] for libro in respuesta.data['results']]
+            url, params = respuesta.data['next'], None
+        self.assertEqual(vistos, [libro.id for libro in self.libros])
+
+    def test_empates_en_el_orden_no_repiten_paginas(self):
+        # Más empates que el tope de offset de DRF (1000): la posición lleva (posicion_cola, id)
+        Reserva.objects.bulk_create(
+            Reserva(libro=self.libros[0], usuario=self.usuario, estado='cancelada', posicion_cola=1)
+            for _ in range(1600)
+        )
+        vistos, paginas = [], 0
+        url, params = f'/reservas/cola/{self.libros[0].id}/', {'page_size': 500}
+        while url and paginas < 10:
+            respuesta = self.client.get(url, params)
+            vistos += [reserva['id'] for reserva in respuesta.data['results']]
+            url, params, paginas = respuesta.data['next'], None, paginas + 1
+        self.assertEqual(paginas, 4)
+        self.assertEqual(sorted(vistos), list(Reserva.objects.order_by('id').values_list('id', flat=True)))
+        anterior = self.client.get(respuesta.data['previous'])
+        self.assertEqual([r['id'] for r in anterior.data['results']], vistos[1000:1500])
+
+    def test_historial_y_reservas_en_orden_de_fecha(self):
+        # Ids en orden inverso a las fechas: el cursor debe seguir la fecha, no el id
+        hoy = timezone.now()
+        ejemplar = Ejemplar.objects.get(codigo_barras='CB-0-A')
+        for dias in range(5):
+            prestamo = Prestamo.objects.create(usuario=self.usuario, ejemplar=ejemplar, estado='devuelto')
+            Prestamo.objects.filter(pk=prestamo.pk).update(fecha_prestamo=hoy.date() - timedelta(days=dias))
+            reserva = Reserva.objects.create(usuario=self.usuario, libro=self.libros[0], estado='cancelada')
+            Reserva.objects.filter(pk=reserva.pk).update(fecha_reserva=hoy - timedelta(days=dias))
+        for url, campo in (
+            ('/usuarios/historial-prestamos/', 'fecha_prestamo'), ('/usuarios/mis-reservas/', 'fecha_reserva')
+        ):
+            with self.subTest(url=url):
+                fechas, params = [], {'page_size': 2}
+                while url:
+                    respuesta = self.client.get(url, params)
+                    fechas += [fila[campo] for fila in respuesta.data['results']]
+                    url, params = respuesta.data['next'], None
+                self.assertEqual(len(fechas), 5)
+                self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+    def test_mensaje_vacio_se_mantiene(self):
+        respuesta = self.client.get('/libros/buscar/', {'titulo': 'no existe'})
+        self.assertEqual(respuesta.data, {'Alerta': 'No existen datos.'})
+
+    def test_modo_streaming(self):
+        respuesta = self.client.get('/libros/buscar/', {'stream': 'true'})
+        self.assertTrue(respuesta.streaming)
+        datos = json.loads(b''.join(respuesta.streaming_content))
+        self.assertEqual([libro['id'] for libro in datos], [libro.id for libro in self.libros])
+        self.assertEqual(datos[0]['total_ejemplares'], 2)
+
+    def test_streaming_recorre_por_keyset(self):
+        Reserva.objects.bulk_create(
+            Reserva(libro=self.libros[0], usuario=self.usuario, estado='cancelada', posicion_cola=1) for _ in range(7)
+        )
+        queryset = Reserva.objects.filter(libro=self.libros[0])
+        esperado = list(queryset.order_by('posicion_cola', 'id').values_list('id', flat=True))
+        # Un SELECT ... LIMIT 3 por bloque, posicionado en (posicion_cola, id) del último (y uno vacío si el
+        # último bloque salió lleno)
+        with self.assertNumQueries(len(esperado) // 3 + 1):
+            bloques = list(en_bloques(queryset, ('posicion_cola',), tamano=3))
+        self.assertEqual([reserva.id for bloque in bloques for reserva in bloque], esperado)
+
+
+# Exportaciones NDJSON / CSV
+class ExportacionTests(DatosBibliotecaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.bibliotecario)
+
+    def test_exportar_ejemplares_ndjson_incremental(self):
+        respuesta = self.client.get('/exportar/ejemplares/')
+        filas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).splitlines()]
+        self.assertEqual(len(filas), 20)
+        self.assertEqual(filas[0]['libro__titulo'], 'Libro 0')
+        respuesta = self.client.get('/exportar/ejemplares/', {'since': filas[9]['id']})
+        self.assertEqual(len(b''.join(respuesta.streaming_content).splitlines()), 10)
+
+    def test_exportar_csv(self):
+        respuesta = self.client.get('/exportar/ejemplares/', {'formato': 'csv'})
+        lineas = b''.join(respuesta.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[0].split(',')[:3], ['id', 'codigo_barras', 'estado'])
+        self.assertEqual(len(lineas), 21)
+
+    def test_since_invalido(self):
+        for since in ('2024-02-30', 'ayer'):
+            self.assertEqual(self.client.get('/exportar/prestamos/', {'since': since}).status_code, 400)
+        self.assertEqual(self.client.get('/exportar/prestamos/', {'since': '2024-02-28'}).status_code, 200)
+
+    def test_exportar_requiere_bibliotecario(self):
+        self.client.force_authenticate(self.usuario)
+        self.assertEqual(self.client.get('/exportar/prestamos/').status_code, 403)
+
+
+# Carga y transferencia masiva de ejemplares
+class InventarioMasivoTests(DatosBibliotecaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = Usuario.objects.create_user(username='admin', password='clave-segura-123', tipo='admin')
+        self.client.force_authenticate(self.admin)
+
+    def test_carga_masiva_json(self):
+        filas = [
+            {'libro': self.libros[i % 10].id, 'sucursal': self.sucursal.id, 'codigo_barras': f'NUEVO-{i}'}
+            for i in range(200)
+        ]
+        # 3 validaciones por conjuntos + INSERT en lote + contadores (INSERT de las claves nuevas y un UPDATE
+        # con CASE para todas), más SAVEPOINT/RELEASE de la transacción: no depende de filas ni de libros
+        with self.assertNumQueries(8):
+            respuesta = self.client.post('/ejemplares/carga-masiva/', filas, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data, {'creados': 200})
+        self.assertEqual(
+            ContadorEjemplares.objects.get(libro=self.libros[3], sucursal=self.sucursal, estado='disponible').cantidad,
+            Ejemplar.objects.filter(libro=self.libros[3], estado='disponible').count(),
+        )
+
+    def test_carga_masiva_rechaza_duplicados(self):
+        filas = [
+            {'libro': self.libros[0].id, 'sucursal': self.sucursal.id, 'codigo_barras': 'CB-0-A'},
+            {'libro': self.libros[0].id, 'sucursal': self.sucursal.id, 'codigo_barras': 'X-1'},
+            {'libro': self.libros[0].id, 'sucursal': self.sucursal.id, 'codigo_barras': 'X-1'},
+        ]
+        respuesta = self.client.post('/ejemplares/carga-masiva/', filas, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['fila'] for e in respuesta.data['errores']], [1, 3])
+        self.assertFalse(Ejemplar.objects.filter(codigo_barras='X-1').exists())
+
+    def test_carga_masiva_estado_no_texto(self):
+        filas = [{'libro': self.libros[0].id, 'sucursal': self.sucursal.id, 'codigo_barras': 'X-1', 'estado': 5}]
+        respuesta = self.client.post('/ejemplares/carga-masiva/', filas, format='json')
+        self.assertEqual(respuesta.data, {'errores': [{'fila': 1, 'error': 'Estado inválido: 5.'}]})
+
+    def test_insercion_concurrente_es_un_conflicto(self):
+        filas = [
+            {'libro': self.libros[0].id, 'sucursal': self.sucursal.id, 'codigo_barras': codigo}
+            for codigo in ('X-1', 'X-2')
+        ]
+        ejemplares, errores = validar_ejemplares(filas)
+        self.assertEqual(errores, [])
+        # Otra petición crea el mismo código entre la validación y el INSERT
+        Ejemplar.objects.create(libro=self.libros[1], sucursal=self.sucursal, codigo_barras='X-2')
+        with self.assertRaises(ConflictoCarga):
+            crear_ejemplares(ejemplares)
+        self.assertFalse(Ejemplar.objects.filter(codigo_barras='X-1').exists())
+
+    def test_transferir_masivo(self):
+        norte = Sucursal.objects.create(nombre='Norte', direccion='Calle 2', telefono='456')
+        respuesta = self.client.post('/ejemplares/transferir-masivo/', {
+            'codigos_barras': ['CB-0-A', 'CB-1-A', 'NO-EXISTE'], 'sucursal_id': norte.id
+        }, format='json')
+        self.assertEqual(respuesta.data, {'transferidos': 2, 'no_encontrados': ['NO-EXISTE']})
+        self.assertEqual(Ejemplar.objects.filter(sucursal=norte).count(), 2)
+        for sucursal_id in ('norte', 1.5, True, [norte.id]):
+            with self.subTest(sucursal_id=sucursal_id):
+                respuesta = self.client.post('/ejemplares/transferir-masivo/', {
+                    'codigos_barras': ['CB-2-A'], 'sucursal_id': sucursal_id
+                }, format='json')
+                self.assertEqual(respuesta.status_code, 400)
+
+
+# Importación de catálogo con upsert por ISBN
+class ImportacionLibrosTests(DatosBibliotecaMixin, TestCase):
+    def test_normalizar_isbn(self):
+        self.assertEqual(normalizar_isbn('0-306-40615-2'), '9780306406157')
+        self.assertEqual(normalizar_isbn('978-0-306-40615-7'), '9780306406157')
+        self.assertIsNone(normalizar_isbn('978-0-306-40615-8'))
+
+    def test_importar_csv_con_upsert(self):
+        Libro.objects.create(titulo='Viejo', autor='X', isbn='9780306406157', genero='', ano_publicacion=1990)
+        contenido = (
+            'isbn,titulo,autor,genero,ano_publicacion\n'
+            '0-306-40615-2,Nuevo título,Autor A,Ensayo,1999\n'
+            '9780307474728,Cien años de soledad,García Márquez,Novela,1967\n'
+            'malo,Sin ISBN,Autor,Novela,2000\n'
+        ).encode()
+        self.client.force_authenticate(self.bibliotecario)
+        respuesta = self.client.post('/libros/importar/', {
+            'archivo': SimpleUploadedFile('catalogo.csv', contenido, content_type='text/csv')
+        })
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(
+            respuesta.data, {'leidos': 3, 'creados': 1, 'actualizados': 1, 'duplicados': 0, 'invalidos': 1}
+        )
+        self.assertEqual(Libro.objects.get(isbn='9780306406157').titulo, 'Nuevo título')
+
+    def test_importar_jsonl_con_valores_no_texto_y_duplicados(self):
+        self.client.force_authenticate(self.bibliotecario)
+        # Alta por la API con guiones: se guarda normalizado y la importación lo encuentra
+        self.client.post('/libros/', {
+            'titulo': 'Viejo', 'autor': 'X', 'isbn': '0-306-40615-2', 'genero': 'Ensayo', 'ano_publicacion': 1990
+        })
+        lineas = [
+            {'isbn': 9780307474728, 'titulo': 100, 'autor': 'Autor A', 'ano_publicacion': '1967'},
+            [1, 2],
+            'texto',
+            {'isbn': '978-0-306-40615-7', 'titulo': 'Primero', 'autor': 'Autor B', 'ano_publicacion': 2001},
+            {'isbn': '0306406152', 'titulo': 'Último', 'autor': 'Autor C', 'ano_publicacion': 2002},
+        ]
+        contenido = '\n'.join(json.dumps(linea) for linea in lineas)
+        # Una línea JSON rota cuenta como inválida, no corta la carga
+        contenido = ('{"isbn": "978\n' + contenido).encode()
+        respuesta = self.client.post('/libros/importar/', {
+            'archivo': SimpleUploadedFile('catalogo.jsonl', contenido, content_type='application/x-ndjson')
+        })
+        self.assertEqual(
+            respuesta.data, {'leidos': 6, 'creados': 1, 'actualizados': 1, 'duplicados': 1, 'invalidos': 3}
+        )
+        self.assertEqual(Libro.objects.get(isbn='9780306406157').titulo, 'Último')
+        self.assertEqual(Libro.objects.get(isbn='9780307474728').titulo, '100')
+
+    def test_archivo_ilegible_no_deja_lotes_guardados(self):
+        self.client.force_authenticate(self.bibliotecario)
+        total = Libro.objects.count()
+        contenido = (
+            'isbn,titulo,autor,genero,ano_publicacion\n'
+            '9780307474728,Cien años de soledad,García Márquez,Novela,1967\n'
+            + f'9780306406157,Relleno,Autor,Ensayo,1999,{"x" * 10000}\n'
+        ).encode() + b'\xff\n'
+        # Lotes de un registro: el primero ya se guardó cuando falla la decodificación
+        importar = mock.patch('api.views.importar_libros', lambda registros: importar_libros(registros, 1))
+        with importar:
+            respuesta = self.client.post('/libros/importar/', {
+                'archivo': SimpleUploadedFile('catalogo.csv', contenido, content_type='text/csv')
+            })
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Libro.objects.count(), total)
+
+
+# Cola de reservas: las posiciones deben quedar densas (1..n) y sin repetir
+class ColaReservasTests(DatosBibliotecaMixin, TestCase):
+    def test_cancelar_adelanta_la_cola(self):
+        self.client.force_authenticate(self.bibliotecario)
+        libro = self.libros[0]
+        datos = {'libro': libro.id, 'usuario': self.usuario.id}
+        ids = [self.client.post('/reservas/', datos).data['id'] for _ in range(5)]
+        self.client.patch(f'/reservas/{ids[1]}/cancelar/')
+        self.client.patch(f'/reservas/{ids[1]}/cancelar/')
+        self.assertEqual(posiciones_en_cola(libro), [1, 2, 3, 4])
+
+    def test_expirar_reservas_compacta_la_cola(self):
+        libro = self.libros[0]
+        reservas = [
+            Reserva.objects.create(usuario=self.usuario, libro=libro, posicion_cola=i) for i in range(1, 6)
+        ]
+        hace_tres_dias = timezone.now() - timedelta(days=3)
+        Reserva.objects.filter(pk__in=[reservas[0].pk, reservas[2].pk]).update(fecha_reserva=hace_tres_dias)
+        call_command('liberar_reservas_expiradas', stdout=io.StringIO())
+        self.assertEqual(Reserva.objects.filter(estado='expirada').count(), 2)
+        self.assertEqual(
+            list(Reserva.objects.filter(estado='en cola').order_by('id').values_list('posicion_cola', flat=True)),
+            [1, 2, 3],
+        )
+        self.assertEqual(ColaReserva.objects.get(libro=libro).ultima_posicion, 3)
+
+
+def posiciones_en_cola(libro):
+    return sorted(Reserva.objects.filter(libro=libro, estado='en cola').values_list('posicion_cola', flat=True))
+
+
+# Concurrencia real: requiere SELECT ... FOR UPDATE (MySQL en producción)
+@skipUnlessDBFeature('has_select_for_update')
+class ColaReservasConcurrenciaTests(TransactionTestCase):
+    hilos = 8
+    operaciones = 25
+
+    def test_altas_y_cancelaciones_concurrentes(self):
+        usuario = Usuario.objects.create_user(username='lector', password='clave-segura-123')
+        libro = Libro.objects.create(titulo='Popular', autor='Autor', isbn='9780000000001', genero='Novela',
+                                     ano_publicacion=2000)
+        errores = []
+
+        class Peticion:
+            user = usuario
+
+        def trabajar():
+            try:
+                for _ in range(self.operaciones):
+                    en_cola = list(Reserva.objects.filter(libro=libro, estado='en cola').values_list('id', flat=True))
+                    if en_cola and random.random() < 0.4:
+                        cancelar_reserva(Reserva.objects.get(pk=random.choice(en_cola)))
+                    else:
+                        serializer = ReservaSerializer(
+                            data={'libro': libro.id, 'usuario': usuario.id}, context={'request': Peticion}
+                        )
+                        serializer.is_valid(raise_exception=True)
+                        encolar_reserva(serializer, usuario)
+            except Exception as error:
+                errores.append(error)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajar) for _ in range(self.hilos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        posiciones = posiciones_en_cola(libro)
+        self.assertEqual(posiciones, list(range(1, len(posiciones) + 1)))
+
+
+# Barrido de préstamos vencidos
+class PrestamosVencidosTests(DatosBibliotecaMixin, TestCase):
+    def test_marcar_vencidos_idempotente(self):
+        ejemplar = Ejemplar.objects.filter(estado='prestado').first()
+        hoy = timezone.localdate()
+        atrasado = Prestamo.objects.create(
+            usuario=self.usuario, ejemplar=ejemplar, fecha_devolucion=hoy - timedelta(days=3)
+        )
+        al_dia = Prestamo.objects.create(
+            usuario=self.usuario, ejemplar=ejemplar, fecha_devolucion=hoy + timedelta(days=3)
+        )
+        self.assertEqual(marcar_vencidos(hoy), {'vencidos': 1, 'multas_actualizadas': 1})
+        self.assertEqual(marcar_vencidos(hoy), {'vencidos': 0, 'multas_actualizadas': 0})
+        atrasado.refresh_from_db()
+        al_dia.refresh_from_db()
+        self.assertEqual((atrasado.estado, atrasado.multa), ('vencido', 3000))
+        self.assertEqual((al_dia.estado, al_dia.multa), ('activo', 0))
+        # Al día siguiente la multa se recalcula, sin acumularse dos veces
+        marcar_vencidos(hoy + timedelta(days=1))
+        atrasado.refresh_from_db()
+        self.assertEqual(atrasado.multa, 4000)
+        respuesta = self.client.get('/prestamos/vencidos/')
+        self.assertEqual([p['id'] for p in respuesta.data['results']], [atrasado.id])
+
+    def test_multas_por_lotes_con_tope(self):
+        ejemplar = Ejemplar.objects.filter(estado='prestado').first()
+        hoy = timezone.localdate()
+        prestamos = [
+            Prestamo.objects.create(
+                usuario=self.usuario, ejemplar=ejemplar, fecha_devolucion=hoy - timedelta(days=dias)
+            )
+            for dias in (2, 9, 10, 40, 400)
+        ]
+        self.assertEqual(marcar_vencidos(hoy, lote=2), {'vencidos': 5, 'multas_actualizadas': 5})
+        self.assertEqual(
+            [Prestamo.objects.get(pk=prestamo.pk).multa for prestamo in prestamos],
+            [2000, 9000, Decimal('9999.99'), Decimal('9999.99'), Decimal('9999.99')],
+        )
+        self.assertEqual(MultaUsuario.objects.get(usuario=self.usuario).total, Decimal('40999.97'))
+        self.assertEqual(marcar_vencidos(hoy, lote=2)['multas_actualizadas'], 0)
+
+    def test_prestar_y_devolver_actualizan_el_ejemplar(self):
+        self.client.force_authenticate(self.bibliotecario)
+        ejemplar = Ejemplar.objects.filter(estado='disponible').first()
+        datos = {'usuario': self.usuario.id, 'ejemplar': ejemplar.id,
+                 'fecha_devolucion': timezone.localdate() + timedelta(days=7)}
+        respuesta = self.client.post('/prestamos/', datos)
+        self.assertEqual(respuesta.status_code, 201)
+        ejemplar.refresh_from_db()
+        self.assertEqual(ejemplar.estado, 'prestado')
+        # El mismo ejemplar no se puede prestar dos veces
+        self.assertEqual(self.client.post('/prestamos/', datos).status_code, 400)
+        self.client.patch(f"/prestamos/{respuesta.data['id']}/devolver/")
+        ejemplar.refresh_from_db()
+        self.assertEqual(ejemplar.estado, 'disponible')
+        self.assertEqual(self.client.patch(f"/prestamos/{respuesta.data['id']}/devolver/").status_code, 400)
+
+
+# Contadores de disponibilidad por libro, sucursal y estado
+class ContadoresEjemplaresTests(DatosBibliotecaMixin, TestCase):
+    def contadores(self, libro):
+        return {
+            (c.sucursal_id, c.estado): c.cantidad
+            for c in ContadorEjemplares.objects.filter(libro=libro) if c.cantidad
+        }
+
+    def test_contadores_siguen_a_los_ejemplares(self):
+        libro = self.libros[0]
+        norte = Sucursal.objects.create(nombre='Norte', direccion='Calle 2', telefono='456')
+        self.assertEqual(
+            self.contadores(libro), {(self.sucursal.id, 'disponible'): 1, (self.sucursal.id, 'prestado'): 1}
+        )
+        ejemplar = Ejemplar.objects.get(codigo_barras='CB-0-A')
+        ejemplar.sucursal = norte
+        ejemplar.estado = 'mantenimiento'
+        ejemplar.save()
+        self.assertEqual(
+            self.contadores(libro), {(norte.id, 'mantenimiento'): 1, (self.sucursal.id, 'prestado'): 1}
+        )
+        transferir_ejemplares(['CB-0-B'], norte.id)
+        Ejemplar.objects.filter(codigo_barras='CB-0-A').delete()
+        self.assertEqual(self.contadores(libro), {(norte.id, 'prestado'): 1})
+
+    def test_reconciliar_corrige_la_deriva(self):
+        ContadorEjemplares.objects.filter(libro=self.libros[0], estado='disponible').update(cantidad=7)
+        sin_deriva = ContadorEjemplares.objects.get(libro=self.libros[1], estado='disponible')
+        salida = io.StringIO()
+        call_command('reconciliar_contadores', stdout=salida)
+        self.assertIn('1 diferencias encontradas', salida.getvalue())
+        self.assertEqual(self.contadores(self.libros[0])[(self.sucursal.id, 'disponible')], 1)
+        # Corrige en el lugar: las filas sin deriva no se recrean ni cambian su fecha
+        self.assertEqual(
+            ContadorEjemplares.objects.get(pk=sin_deriva.pk).actualizado, sin_deriva.actualizado
+        )
+
+
+# Reportes sobre los resúmenes diarios
+class ReportesResumenTests(DatosBibliotecaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.bibliotecario)
+        hoy = timezone.localdate()
+        for libro in self.libros[:2]:
+            ejemplar = Ejemplar.objects.get(libro=libro, estado='disponible')
+            self.client.post('/prestamos/', {
+                'usuario': self.usuario.id, 'ejemplar': ejemplar.id, 'fecha_devolucion': hoy + timedelta(days=7)
+            })
+        # El primero se devuelve con dos días de atraso
+        atrasado = Prestamo.objects.get(ejemplar__libro=self.libros[0])
+        Prestamo.objects.filter(pk=atrasado.pk).update(fecha_devolucion=hoy - timedelta(days=2))
+        self.client.patch(f'/prestamos/{atrasado.id}/devolver/')
+
+    def reportes(self, parametros=''):
+        return [
+            self.client.get(f'/reportes/{nombre}/{parametros}').data
+            for nombre in ('populares', 'morosidad', 'estadisticas-sucursal')
+        ]
+
+    def test_reportes_se_actualizan_al_prestar_y_devolver(self):
+        with self.assertNumQueries(1):
+            self.client.get('/reportes/populares/')
+        populares, morosidad, sucursales = self.reportes()
+        self.assertEqual(
+            populares,
+            [{'ejemplar__libro__titulo': 'Libro 0', 'total': 1}, {'ejemplar__libro__titulo': 'Libro 1', 'total': 1}],
+        )
+        self.assertEqual(
+            [(f['usuario__username'], f['total_multa']) for f in morosidad['results']], [('lector', '2000.00')]
+        )
+        self.assertEqual(sucursales, [{'ejemplar__sucursal__nombre': 'Central', 'total': 2}])
+        manana = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.client.get(f'/reportes/populares/?desde={manana}').data, {'Alerta': 'No existen datos.'})
+        self.assertEqual(self.client.get('/reportes/populares/?hasta=2024-13-01').status_code, 400)
+
+    def test_sin_fechas_se_usa_la_ventana_por_defecto(self):
+        hace_dos_anos = timezone.localdate() - timedelta(days=730)
+        ResumenDiarioLibro.objects.create(libro=self.libros[5], fecha=hace_dos_anos, prestamos=50)
+        titulos = [fila['ejemplar__libro__titulo'] for fila in self.client.get('/reportes/populares/').data]
+        self.assertEqual(titulos, ['Libro 0', 'Libro 1'])
+        respuesta = self.client.get('/reportes/populares/', {'desde': hace_dos_anos.isoformat()})
+        self.assertEqual(respuesta.data[0], {'ejemplar__libro__titulo': 'Libro 5', 'total': 50})
+
+    def test_reconstruir_resumenes_coincide_con_el_incremental(self):
+        antes = self.reportes()
+        ResumenDiarioLibro.objects.all().delete()
+        ResumenDiarioUsuario.objects.update(prestamos=99)
+        call_command('reconstruir_resumenes', stdout=io.StringIO())
+        self.assertEqual(self.reportes(), antes)
+
+
+# Reporte de morosidad sobre MultaUsuario
+class MorosidadTests(DatosBibliotecaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.bibliotecario)
+        ejemplar = Ejemplar.objects.filter(estado='prestado').first()
+        hoy = timezone.localdate()
+        self.morosos = []
+        for i, dias in enumerate([1, 5, 3]):
+            usuario = Usuario.objects.create_user(username=f'moroso{i}', password='clave-segura-123')
+            # Dos préstamos atrasados por usuario: el reporte debe sumar, no contar
+            for _ in range(2):
+                Prestamo.objects.create(usuario=usuario, ejemplar=ejemplar, fecha_devolucion=hoy - timedelta(days=dias))
+            self.morosos.append(usuario)
+        marcar_vencidos(hoy)
+
+    def test_totales_ranking_y_umbral(self):
+        self.assertEqual(MultaUsuario.objects.get(usuario=self.morosos[1]).total, 10000)
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/reportes/morosidad/?top=2')
+        self.assertEqual(
+            [(f['usuario__username'], f['total_multa']) for f in respuesta.data],
+            [('moroso1', '10000.00'), ('moroso2', '6000.00')],
+        )
+        respuesta = self.client.get('/reportes/morosidad/?umbral=5000&page_size=1')
+        self.assertEqual([f['usuario__username'] for f in respuesta.data['results']], ['moroso1'])
+        siguiente = self.client.get(respuesta.data['next'])
+        self.assertEqual([f['usuario__username'] for f in siguiente.data['results']], ['moroso2'])
+        self.assertEqual(self.client.get('/reportes/morosidad/?top=0').status_code, 400)
+        self.assertEqual(self.client.get('/reportes/morosidad/?umbral=mucho').status_code, 400)
+
+    def test_totales_empatados_se_paginan_completos(self):
+        # Multas topadas: muchos usuarios con el mismo total; el cursor desempata por usuario_id
+        usuarios = Usuario.objects.bulk_create(Usuario(username=f'tope{i}') for i in range(1300))
+        MultaUsuario.objects.bulk_create(
+            MultaUsuario(usuario=usuario, total=Decimal('9999.99'), prestamos_con_multa=1) for usuario in usuarios
+        )
+        vistos, paginas = [], 0
+        url, params = '/reportes/morosidad/', {'umbral': '9999.99', 'page_size': 100}
+        while url and paginas < 20:
+            respuesta = self.client.get(url, params)
+            vistos += [fila['usuario_id'] for fila in respuesta.data['results']]
+            url, params, paginas = respuesta.data['next'], None, paginas + 1
+        # moroso1 (10000) va primero
+        self.assertEqual(paginas, 14)
+        self.assertEqual(vistos, [self.morosos[1].id] + sorted((usuario.id for usuario in usuarios), reverse=True))
+
+    def test_devolver_y_recalcular_mantienen_el_total(self):
+        prestamo = Prestamo.objects.filter(usuario=self.morosos[0]).first()
+        self.client.patch(f'/prestamos/{prestamo.id}/devolver/')
+        self.assertEqual(MultaUsuario.objects.get(usuario=self.morosos[0]).total, 2000)
+        MultaUsuario.objects.update(total=0)
+        call_command('recalcular_multas', stdout=io.StringIO())
+        self.assertEqual(
+            dict(MultaUsuario.objects.values_list('usuario__username', 'total')),
+            {'moroso0': 2000, 'moroso1': 10000, 'moroso2': 6000},
+        )
+
+    def test_save_y_delete_de_prestamos_refrescan_el_total(self):
+        # Edición de una multa (admin) y borrado de un préstamo sin pasar por el comando
+        prestamo = Prestamo.objects.filter(usuario=self.morosos[1]).first()
+        prestamo.multa = 0
+        prestamo.save()
+        self.assertEqual(MultaUsuario.objects.get(usuario=self.morosos[1]).total, 5000)
+        Prestamo.objects.filter(usuario=self.morosos[1]).exclude(pk=prestamo.pk).get().delete()
+        self.assertEqual(MultaUsuario.objects.get(usuario=self.morosos[1]).total, 0)
+        # Un préstamo nuevo sin multa no recalcula nada
+        ejemplar = Ejemplar.objects.filter(estado='disponible').first()
+        with self.assertNumQueries(1):
+            Prestamo.objects.create(usuario=self.morosos[2], ejemplar=ejemplar)
+        # Al borrar el usuario, su MultaUsuario se borra en cascada y no se vuelve a crear
+        self.morosos[2].delete()
+        self.assertFalse(MultaUsuario.objects.filter(usuario_id=self.morosos[2].id).exists())
+
+
+# Caché de respuestas con invalidación por señales
+class CacheRespuestasTests(DatosBibliotecaMixin, TestCase):
+    def test_acierto_e_invalidacion_del_catalogo(self):
+        libro = self.libros[0]
+        self.assertEqual(self.client.get(f'/libros/{libro.id}/')['X-Cache'], 'MISS')
+        # Solo la consulta del sello ETag
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(f'/libros/{libro.id}/')
+        self.assertEqual((respuesta['X-Cache'], respuesta.data['total_ejemplares']), ('HIT', 2))
+        # Otro tipo de usuario tiene su propia entrada
+        self.client.force_authenticate(self.bibliotecario)
+        self.assertEqual(self.client.get(f'/libros/{libro.id}/')['X-Cache'], 'MISS')
+        # Un ejemplar nuevo invalida el detalle de su libro, pero no el de los demás
+        self.client.get(f'/libros/{self.libros[1].id}/')
+        Ejemplar.objects.create(libro=libro, sucursal=self.sucursal, codigo_barras='CB-0-C')
+        respuesta = self.client.get(f'/libros/{libro.id}/')
+        self.assertEqual((respuesta['X-Cache'], respuesta.data['total_ejemplares']), ('MISS', 3))
+        self.assertEqual(self.client.get(f'/libros/{self.libros[1].id}/')['X-Cache'], 'HIT')
+
+    def test_cola_de_reservas_y_estadisticas(self):
+        libro = self.libros[0]
+        self.client.force_authenticate(self.bibliotecario)
+        self.client.get(f'/reservas/cola/{libro.id}/')
+        self.client.post('/reservas/', {'libro': libro.id, 'usuario': self.usuario.id})
+        respuesta = self.client.get(f'/reservas/cola/{libro.id}/')
+        self.assertEqual((respuesta['X-Cache'], len(respuesta.data['results'])), ('MISS', 1))
+        self.client.get(f'/reservas/cola/{libro.id}/')
+        admin = Usuario.objects.create_user(username='admin', password='clave-segura-123', tipo='admin')
+        self.client.force_authenticate(admin)
+        estadisticas = self.client.get('/cache/estadisticas/').data
+        self.assertEqual(estadisticas['ReservaColaVistaAPI'], {'aciertos': 1, 'fallos': 2})
+
+
+# Peticiones condicionales con ETag / Last-Modified
+class PeticionesCondicionalesTests(DatosBibliotecaMixin, TestCase):
+    def test_304_hasta_que_cambian_los_datos(self):
+        respuesta = self.client.get('/libros/')
+        etag = respuesta['ETag']
+        # Sin Last-Modified en el listado: una baja no cambia ninguna fecha
+        self.assertNotIn('Last-Modified', respuesta)
+        # Acierto de la caché de respuestas y 304 sin consultas
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/libros/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get('/libros/')['X-Cache'], 'HIT')
+        # Un cambio de ejemplares cambia el sello del listado y del detalle
+        Ejemplar.objects.filter(codigo_barras='CB-0-A').delete()
+        respuesta = self.client.get('/libros/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        # Borrar un libro también
+        etag = respuesta['ETag']
+        self.libros[9].delete()
+        respuesta = self.client.get(
+            '/libros/', HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+        )
+        self.assertEqual((respuesta.status_code, len(respuesta.data)), (200, 9))
+
+    def test_detalle_sucursal_y_disponibilidad(self):
+        url = f'/sucursales/{self.sucursal.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.sucursal.telefono = '999'
+        self.sucursal.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        url = f'/libros/{self.libros[0].id}/disponibilidad/'
+        respuesta = self.client.get(url)
+        etag = respuesta['ETag']
+        # Una reserva no mueve ninguna fecha: sin Last-Modified, If-Modified-Since no da un 304 viejo
+        self.assertNotIn('Last-Modified', respuesta)
+        Reserva.objects.create(usuario=self.usuario, libro=self.libros[0])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        respuesta = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.client.get('/libros/999/', HTTP_IF_NONE_MATCH='"x"').status_code, 404)
+
+
+# JWT con el tipo como claim: los permisos no consultan Usuario
+class AutenticacionJWTTests(DatosBibliotecaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        caches['usuarios'].clear()
+        caches['compartida'].clear()
+        self.client = APIClient()
+
+    def login(self, username):
+        respuesta = self.client.post('/auth/login/', {'username': username, 'password': 'clave-segura-123'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {respuesta.data['access']}")
+        return respuesta.data
+
+    def test_permisos_sin_consultar_el_usuario(self):
+        tokens = self.login('bibliotecario')
+        self.assertEqual(AccessToken(tokens['access'])['tipo'], 'bibliotecario')
+        # Solo el sello ETag y la lectura de la sucursal
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(f'/sucursales/{self.sucursal.id}/').status_code, 200)
+        # El perfil necesita la fila: se carga una vez y queda en la caché del proceso
+        # (la otra consulta es el resumen de préstamos del serializador)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/usuarios/perfil/').data['username'], 'bibliotecario')
+        with self.assertNumQueries(1):
+            self.client.get('/usuarios/perfil/')
+
+    def test_usuario_desactivado_o_degradado_pierde_el_acceso(self):
+        self.login('bibliotecario')
+        self.assertEqual(self.client.get('/reportes/populares/').status_code, 200)
+        self.bibliotecario.tipo = 'regular'
+        self.bibliotecario.save()
+        self.assertEqual(self.client.get('/reportes/populares/').status_code, 401)
+        self.login('lector')
+        self.assertEqual(self.client.get('/libros/').status_code, 200)
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertEqual(self.client.get('/libros/').status_code, 401)
+
+    def test_marca_perdida_no_reabre_el_acceso(self):
+        self.login('lector')
+        self.usuario.is_active = False
+        self.usuario.save()
+        # Marca desalojada (o la petición llega a otro proceso): se relee el estado de la base de datos
+        caches['compartida'].clear()
+        self.assertEqual(self.client.get('/libros/').status_code, 401)
+        # La marca releída queda para las peticiones siguientes
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/libros/').status_code, 401)
+
+    def test_refrescar_toma_el_tipo_actual(self):
+        tokens = self.login('lector')
+        self.assertEqual(self.client.get('/reportes/populares/').status_code, 403)
+        Usuario.objects.filter(pk=self.usuario.pk).update(tipo='bibliotecario')
+        access = self.client.post('/auth/refresh/', {'refresh': tokens['refresh']}).data['access']
+        self.assertEqual(AccessToken(access)['tipo'], 'bibliotecario')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertNotEqual(self.client.get('/reportes/populares/').status_code, 403)
+
+
+# Alta masiva de usuarios y hasher configurable
+@override_settings(HASH_PBKDF2_ITERACIONES=1000)
+class UsuariosMasivosTests(DatosBibliotecaMixin, TestCase):
+    def test_carga_masiva_csv(self):
+        admin = Usuario.objects.create_user(username='admin', password='clave-segura-123', tipo='admin')
+        self.client.force_authenticate(admin)
+        contenido = (
+            'username,password,email,nombre,apellido,tipo\n'
+            'ana,clave-ana-123,ana@uni.edu,Ana,Ruiz,regular\n'
+            'beto,clave-beto-123,,Beto,,bibliotecario\n'
+            'lector,otra-clave-123,,,,regular\n'
+            'sin clave,,,,,regular\n'
+            'carla,clave-carla-123,,,,superheroe\n'
+        )
+        archivo = SimpleUploadedFile('usuarios.csv', contenido.encode(), content_type='text/csv')
+        respuesta = self.client.post('/usuarios/carga-masiva/', {'archivo': archivo}, format='multipart')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data, {'leidos': 5, 'creados': 2, 'existentes': 1, 'invalidos': 2})
+        self.assertEqual(authenticate(username='beto', password='clave-beto-123').tipo, 'bibliotecario')
+        # El usuario existente conserva su contraseña
+        self.assertIsNotNone(authenticate(username='lector', password='clave-segura-123'))
+
+    def test_carga_masiva_con_demasiadas_filas_se_rechaza(self):
+        admin = Usuario.objects.create_user(username='admin', password='clave-segura-123', tipo='admin')
+        self.client.force_authenticate(admin)
+        total = Usuario.objects.count()
+        contenido = ''.join(
+            json.dumps({'username': f'alumno{i}', 'password': f'clave-{i}'}) + '\n'
+            for i in range(UsuarioCargaMasivaVistaAPI.max_filas + 1)
+        )
+        archivo = SimpleUploadedFile('usuarios.jsonl', contenido.encode(), content_type='application/x-ndjson')
+        respuesta = self.client.post('/usuarios/carga-masiva/', {'archivo': archivo}, format='multipart')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('crear_usuarios', respuesta.data['error'])
+        self.assertEqual(Usuario.objects.count(), total)
+
+    def test_comando_hashea_en_el_pool(self):
+        # Más contraseñas que TAMANO_BLOQUE_HASH: se reparten en bloques entre los procesos
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as archivo:
+            for i in range(TAMANO_BLOQUE_HASH * 2 + 1):
+                archivo.write(json.dumps({'username': f'alumno{i}', 'password': 1000 + i}) + '\n')
+        self.addCleanup(os.remove, archivo.name)
+        salida = io.StringIO()
+        call_command('crear_usuarios', archivo.name, procesos=2, stdout=salida)
+        self.assertIn("'creados': 101", salida.getvalue())
+        self.assertIsNotNone(authenticate(username='alumno100', password='1100'))
+
+    def test_conflicto_concurrente_no_cuenta_como_creado(self):
+        registros = [{'username': 'ana', 'password': 'clave-ana-123'}, {'username': 'beto', 'password': 'clave'}]
+
+        def hashear_mientras_otro_crea(contrasenas, pool):
+            # Otra carga crea 'ana' entre la consulta de existentes y el INSERT
+            Usuario.objects.create_user(username='ana', password='otra-clave-123')
+            return hashear_contrasenas(contrasenas, pool)
+
+        with mock.patch('api.usuarios.hashear_contrasenas', hashear_mientras_otro_crea):
+            resultado = crear_usuarios(registros)
+        self.assertEqual(resultado, {'leidos': 2, 'creados': 1, 'existentes': 1, 'invalidos': 0})
+        self.assertIsNotNone(authenticate(username='ana', password='otra-clave-123'))
+
+    def test_login_rehace_el_hash_al_cambiar_las_iteraciones(self):
+        Usuario.objects.create_user(username='ana', password='clave-ana-123')
+        with override_settings(HASH_PBKDF2_ITERACIONES=2000):
+            authenticate(username='ana', password='clave-ana-123')
+        self.assertTrue(Usuario.objects.get(username='ana').password.startswith('pbkdf2_sha256$2000$'))
+
+
+# Consultas por petición: Server-Timing y presupuesto por vista
+class PresupuestoConsultasTests(DatosBibliotecaMixin, TestCase):
+    def test_server_timing(self):
+        respuesta = self.client.get('/libros/buscar/')
+        self.assertRegex(respuesta['Server-Timing'], r'^db;dur=[\d.]+;desc="1 consultas", total;dur=[\d.]+$')
+
+    def test_exceder_el_presupuesto_falla(self):
+        with override_settings(PRESUPUESTO_CONSULTAS_POR_DEFECTO=0):
+            with self.assertRaises(PresupuestoConsultasExcedido):
+                self.client.get('/prestamos/')
+        # Las escrituras no tienen presupuesto
+        with override_settings(PRESUPUESTO_CONSULTAS_POR_DEFECTO=0):
+            self.client.force_authenticate(self.bibliotecario)
+            respuesta = self.client.post('/reservas/', {'libro': self.libros[0].id, 'usuario': self.usuario.id})
+        self.assertEqual(respuesta.status_code, 201)
+
+
+# Réplicas de lectura con dos SQLite locales: la base de los tests como principal y un archivo temporal
+# como réplica, con datos distintos para saber de dónde leyó cada petición
+@override_settings(REPLICAS_LECTURA=['replica'])
+class ReplicasLecturaTests(DatosBibliotecaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # 'replica' no va en `databases` de la clase: el runner crearía una base de test para ese alias
+        cls.directorio = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica': {
+                'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.directorio.name, 'replica.db'),
+            },
+        })['replica']
+        with connections['replica'].schema_editor() as editor:
+            for modelo in apps.get_models():
+                editor.create_model(modelo)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directorio.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        # Marcas de "leer de la principal" de tests anteriores
+        caches['compartida'].clear()
+        Libro.objects.using('replica').create(
+            titulo='Solo en la réplica', autor='Autor', isbn='9789999999999', genero='Novela', ano_publicacion=2000
+        )
+
+    def clave_marca(self):
+        # Sin Authorization ni sesión la marca es por IP, la misma del cliente de test
+        return ReplicasLecturaMiddleware(lambda request: None).clave_sesion(RequestFactory().get('/'))
+
+    def titulos_buscados(self):
+        return [libro['titulo'] for libro in self.client.get('/libros/buscar/').data['results']]
+
+    def test_lecturas_marcadas_van_a_la_replica(self):
+        self.assertEqual(self.titulos_buscados(), ['Solo en la réplica'])
+        # Vistas sin marcar (catálogo con caché, préstamos, cola de reservas) leen de la principal
+        self.assertEqual(len(self.client.get('/libros/').data), 10)
+
+    def test_despues_de_escribir_se_lee_de_la_principal(self):
+        self.client.force_authenticate(self.bibliotecario)
+        respuesta = self.client.post('/reservas/', {'libro': self.libros[0].id, 'usuario': self.usuario.id})
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(len(self.titulos_buscados()), 10)
+        self.assertTrue(caches['compartida'].get(self.clave_marca()))
+        # Vencida la marca vuelve a la réplica
+        caches['compartida'].clear()
+        self.assertEqual(self.titulos_buscados(), ['Solo en la réplica'])
+
+    def test_escritura_en_la_peticion_vuelve_a_la_principal(self):
+        enrutador = EnrutadorReplicas()
+        estado, token = iniciar_peticion()
+        try:
+            estado.replica = 'replica'
+            self.assertEqual(enrutador.db_for_read(Libro), 'replica')
+            self.assertIsNone(enrutador.db_for_write(Libro))
+            self.assertIsNone(enrutador.db_for_read(Libro))
+        finally:
+            terminar_peticion(token)
+        self.assertIsNone(enrutador.db_for_read(Libro))
+
+    def test_migrate_no_toca_las_replicas(self):
+        enrutador = EnrutadorReplicas()
+        self.assertIs(enrutador.allow_migrate('replica', 'api', 'libro'), False)
+        self.assertIsNone(enrutador.allow_migrate('default', 'api', 'libro'))
+
+
+# Vistas asíncronas (api.vistas_asincronas): mismas respuestas que las síncronas
+class VistasAsincronasTests(DatosBibliotecaMixin, TestCase):
+    def test_mismas_respuestas_que_las_vistas_sincronas(self):
+        Reserva.objects.create(libro=self.libros[0], usuario=self.usuario, estado='en cola', posicion_cola=1)
+        rutas = [
+            '/libros/buscar/?disponible=true',
+            f'/libros/{self.libros[0].id}/disponibilidad/',
+            f'/libros/disponibilidad/?ids={self.libros[0].id},{self.libros[1].id},999999',
+            f'/sucursales/{self.sucursal.id}/inventario/',
+            f'/reservas/cola/{self.libros[0].id}/',
+            f'/reservas/cola/{self.libros[1].id}/',
+            '/libros/disponibilidad/?ids=x',
+            '/libros/999999/disponibilidad/',
+        ]
+        for ruta in rutas:
+            with self.subTest(ruta=ruta):
+                sincrona = self.client.get(ruta)
+                asincrona = self.client.get('/async' + ruta)
+                self.assertEqual(asincrona.status_code, sincrona.status_code)
+                datos, esperados = asincrona.json(), sincrona.json()
+                if 'results' in esperados:
+                    # Los enlaces de paginación llevan la ruta de cada vista
+                    datos, esperados = datos['results'], esperados['results']
+                self.assertEqual(datos, esperados)
+
+    def test_listado_con_token_y_etag(self):
+        cliente = APIClient()
+        self.assertEqual(cliente.get('/async/libros/').status_code, 401)
+        token = TokenBibliotecaSerializer.get_token(self.usuario).access_token
+        cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        respuesta = cliente.get('/async/libros/')
+        self.assertEqual(len(respuesta.json()), 10)
+        self.assertEqual(cliente.get('/async/libros/', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+    async def test_consultas_en_asgi(self):
+        # Pila de middleware asíncrona: el presupuesto cuenta las consultas del hilo de la petición
+        respuesta = await self.async_client.get(f'/async/libros/{self.libros[0].id}/disponibilidad/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('desc="5 consultas"', respuesta['Server-Timing'])
+        self.assertEqual(respuesta.json()['total_ejemplares'], 2)
@@ -0,0 +1,92 @@
+import django
+from itertools import islice
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from .importacion import texto
+from .models import Usuario
+
+TAMANO_LOTE = 1000
+# Contraseñas por tarea del pool: suficientes para amortizar el envío entre procesos
+TAMANO_BLOQUE_HASH = 50
+TIPOS = {tipo for tipo, _ in Usuario.TIPOS}
+
+
+def iniciar_proceso():
+    # Con el método spawn el proceso hijo arranca sin Django configurado
+    django.setup()
+
+
+def _hashear(contrasenas):
+    return [make_password(contrasena) for contrasena in contrasenas]
+
+
+def hashear_contrasenas(contrasenas, pool=None):
+    """Hashea con el hasher preferido de PASSWORD_HASHERS, en el pool de procesos si se indica.
+    Devuelve los hashes en el orden de entrada."""
+    if pool is None or len(contrasenas) <= TAMANO_BLOQUE_HASH:
+        return _hashear(contrasenas)
+    bloques = [contrasenas[i:i + TAMANO_BLOQUE_HASH] for i in range(0, len(contrasenas), TAMANO_BLOQUE_HASH)]
+    return [hash_ for hashes in pool.map(_hashear, bloques) for hash_ in hashes]
+
+
+def _usuario_desde_registro(registro):
+    if not isinstance(registro, dict):
+        return None
+    username = texto(registro, 'username')
+    contrasena = str(registro.get('password') or '')
+    tipo = texto(registro, 'tipo') or 'regular'
+    if not username or not contrasena or tipo not in TIPOS:
+        return None
+    try:
+        Usuario._meta.get_field('username').run_validators(username)
+    except ValidationError:
+        return None
+    usuario = Usuario(
+        username=username, tipo=tipo, email=texto(registro, 'email'),
+        first_name=texto(registro, 'nombre')[:150], last_name=texto(registro, 'apellido')[:150],
+    )
+    return usuario, contrasena
+
+
+def crear_usuarios(registros, pool=None, tamano_lote=TAMANO_LOTE, progreso=None):
+    """Alta masiva: hashea las contraseñas de cada lote (en `pool`, un ProcessPoolExecutor creado con
+    `initializer=iniciar_proceso`, si se indica) e inserta con bulk_create. Los usernames que ya existen se
+    omiten (no se cambia su contraseña). Los procesos del pool solo hashean, no usan la base de datos.
+
+    Devuelve un dict con leidos, creados, existentes e invalidos; `progreso` lo recibe tras cada lote.
+    """
+    resultado = {'leidos': 0, 'creados': 0, 'existentes': 0, 'invalidos': 0}
+    registros = iter(registros)
+    while True:
+        lote = list(islice(registros, tamano_lote))
+        if not lote:
+            return resultado
+        nuevos = {}
+        for registro in lote:
+            fila = _usuario_desde_registro(registro)
+            if fila is None:
+                resultado['invalidos'] += 1
+            else:
+                # Duplicados dentro del lote: gana el último
+                nuevos[fila[0].username] = fila
+        existentes = set(Usuario.objects.filter(username__in=list(nuevos)).values_list('username', flat=True))
+        filas = [fila for username, fila in nuevos.items() if username not in existentes]
+        hashes = hashear_contrasenas([contrasena for _, contrasena in filas], pool)
+        usuarios = []
+        for (usuario, _), hash_ in zip(filas, hashes):
+            usuario.password = hash_
+            usuarios.append(usuario)
+        # ignore_conflicts: otro proceso pudo crear el mismo username entre la consulta y el INSERT. Esas filas
+        # se descartan sin aviso; las creadas aquí son las que quedaron con nuestro hash (lleva sal propia)
+        Usuario.objects.bulk_create(usuarios, ignore_conflicts=True)
+        hashes = {usuario.username: usuario.password for usuario in usuarios}
+        creados = sum(
+            1 for username, password in
+            Usuario.objects.filter(username__in=list(hashes)).values_list('username', 'password')
+            if hashes[username] == password
+        )
+        resultado['leidos'] += len(lote)
+        resultado['existentes'] += len(nuevos) - creados
+        resultado['creados'] += creados
+        if progreso:
+            progreso(resultado)
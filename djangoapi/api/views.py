@@ -1,12 +1,42 @@
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
 from rest_framework import generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import BasePermission
-from .models import Libro, Sucursal, Prestamo, Reserva, Ejemplar
-from .serializers import LibroSerializer, SucursalSerializer, PrestamoSerializer, ReservaSerializer, EjemplarSerializer, UsuarioSerializer
-from django.db.models import Count
+from .models import (
+    Libro, Sucursal, Prestamo, Reserva, Ejemplar,
+    ResumenDiarioLibro, ResumenDiarioSucursal, MultaUsuario,
+)
+from .serializers import (
+    LibroSerializer, SucursalSerializer, PrestamoSerializer, ReservaSerializer, EjemplarSerializer, UsuarioSerializer,
+    MorosidadSerializer,
+)
+from .busqueda import filtrar_libros
+from .inventario import (
+    leer_filas, validar_ejemplares, crear_ejemplares, transferir_ejemplares, ConflictoCarga,
+)
+from .importacion import importar_libros, leer_registros
+from .usuarios import crear_usuarios
+from .reservas import encolar_reserva, cancelar_reserva
+from .prestamos import prestar, devolver
+from .paginacion import PaginacionCursor
+from .cache import RespuestaEnCacheMixin, estadisticas
+from .condicional import (
+    condicional, sello_libros, sello_libro, sello_sucursales, sello_sucursal,
+    sello_disponibilidad, sello_disponibilidad_lote,
+)
+from .streaming import json_en_streaming, filas_por_keyset, ndjson_en_streaming, csv_en_streaming
+from django.http import StreamingHttpResponse
+from django.db.models import Prefetch, Sum
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.core.exceptions import ImproperlyConfigured
 
 # Solo permite acceso a usuarios tipo admin
 class EsAdmin(BasePermission):
@@ -18,16 +48,37 @@ class EsBibliotecarioOAdmin(BasePermission):
     def has_permission(self, request, view):
         return request.user.is_authenticated and request.user.tipo in ['bibliotecario', 'admin']
 
-# Mensaje personalizado si no hay datos
+# Mensaje personalizado si no hay datos, con paginación por cursor
+# ?stream=true devuelve todo el resultado como JSON generado por bloques
 class ListaAPIViewConMensajeVacio(generics.ListAPIView):
     mensaje_vacio = {'Alerta': 'No existen datos.'}
+    pagination_class = PaginacionCursor
+    orden_cursor = '-id'
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
-        if not queryset:
+        if request.query_params.get('stream') == 'true':
+            return self.list_streaming(queryset)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            # Sin paginación: sondeo LIMIT 1 en vez de cargar el queryset completo
+            if not queryset.exists():
+                return Response(self.mensaje_vacio)
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+        # El vacío se decide con la misma consulta de la página
+        if not page and self.paginator.es_primera_pagina(request):
             return Response(self.mensaje_vacio)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def list_streaming(self, queryset):
+        if not queryset.exists():
+            return Response(self.mensaje_vacio)
+        contenido = json_en_streaming(
+            queryset, self.orden_cursor, lambda bloque: self.get_serializer(bloque, many=True).data
+        )
+        return StreamingHttpResponse(contenido, content_type='application/json')
     
 # Registrar usuarios (admin)
 class VistaRegistro(generics.CreateAPIView):
@@ -35,6 +86,33 @@ class VistaRegistro(generics.CreateAPIView):
     serializer_class = UsuarioSerializer
     permission_classes = [EsAdmin]
 
+# Alta masiva de usuarios (archivo CSV o JSON Lines en `archivo`: username, password, email, nombre, apellido, tipo)
+# Hashea en el proceso de la petición; para cargas grandes, el comando crear_usuarios usa un pool de procesos
+class UsuarioCargaMasivaVistaAPI(APIView):
+    permission_classes = [EsAdmin]
+    # Las contraseñas se hashean en el hilo de la petición: las cargas mayores van por el comando crear_usuarios
+    max_filas = 100
+
+    def post(self, request, *args, **kwargs):
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'error': 'Debes adjuntar los usuarios en el campo archivo.'}, status=400)
+        formato = request.data.get('formato') or ('csv' if archivo.name.endswith('.csv') else 'jsonl')
+        if formato not in ('csv', 'jsonl'):
+            return Response({'error': 'Formato no soportado. Usa csv o jsonl.'}, status=400)
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+        # Se lee todo antes de escribir: un archivo ilegible o demasiado grande no deja usuarios a medias
+        try:
+            registros = list(islice(leer_registros(texto, formato), self.max_filas + 1))
+        except (ValueError, UnicodeDecodeError, csv.Error) as error:
+            return Response({'error': f'Archivo inválido: {error}'}, status=400)
+        if len(registros) > self.max_filas:
+            return Response({
+                'error': f'Hasta {self.max_filas} usuarios por petición; '
+                         'para cargas mayores usa el comando manage.py crear_usuarios.'
+            }, status=400)
+        return Response(crear_usuarios(registros), status=201)
+
 # Ver y actualizar el perfil de Usuario
 class UsuarioPerfilVistaAPI(generics.RetrieveUpdateAPIView):
     serializer_class = UsuarioSerializer
@@ -59,6 +137,7 @@ class UsuarioPerfilVistaAPI(generics.RetrieveUpdateAPIView):
 class UsuarioHistorialPrestamosVistaAPI(ListaAPIViewConMensajeVacio):
     serializer_class = PrestamoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    orden_cursor = ('-fecha_prestamo', '-id')
 
     def get_queryset(self):
         usuario = self.request.user
@@ -73,6 +152,7 @@ class UsuarioHistorialPrestamosVistaAPI(ListaAPIViewConMensajeVacio):
 class UsuarioMisReservasVistaAPI(ListaAPIViewConMensajeVacio):
     serializer_class = ReservaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    orden_cursor = ('-fecha_reserva', '-id')
 
     def get_queryset(self):
         usuario = self.request.user
@@ -84,8 +164,11 @@ class UsuarioMisReservasVistaAPI(ListaAPIViewConMensajeVacio):
         return Reserva.objects.filter(usuario=usuario).order_by('-fecha_reserva')
     
 # listar y crear libros
-class LibroListaCrearVistaAPI(generics.ListCreateAPIView):
-    queryset = Libro.objects.all()
+@condicional(sello_libros)
+class LibroListaCrearVistaAPI(RespuestaEnCacheMixin, generics.ListCreateAPIView):
+    presupuesto_consultas = 1  # listado (el sello ETag sale de api.cache)
+    grupos_cache = ('libros',)
+    queryset = Libro.objects.con_conteo_ejemplares()
     serializer_class = LibroSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -94,9 +177,32 @@ class LibroListaCrearVistaAPI(generics.ListCreateAPIView):
             return [EsBibliotecarioOAdmin()]
         return [permissions.IsAuthenticated()]
 
+# Importar un catálogo (archivo CSV o JSON Lines en `archivo`)
+class LibroImportarVistaAPI(APIView):
+    permission_classes = [EsBibliotecarioOAdmin]
+
+    def post(self, request, *args, **kwargs):
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'error': 'Debes adjuntar el catálogo en el campo archivo.'}, status=400)
+        formato = request.data.get('formato') or ('csv' if archivo.name.endswith('.csv') else 'jsonl')
+        if formato not in ('csv', 'jsonl'):
+            return Response({'error': 'Formato no soportado. Usa csv o jsonl.'}, status=400)
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+        # Todo o nada: un archivo que no se puede decodificar a mitad de camino no deja lotes a medias
+        try:
+            with transaction.atomic():
+                resultado = importar_libros(leer_registros(texto, formato))
+        except (ValueError, UnicodeDecodeError, csv.Error) as error:
+            return Response({'error': f'Archivo inválido: {error}'}, status=400)
+        return Response(resultado, status=201)
+
 # Listar, actualizar o eliminar un libro
-class LibroObtenerActualizarEliminarVistaAPI(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Libro.objects.all()
+@condicional(sello_libro)
+class LibroObtenerActualizarEliminarVistaAPI(RespuestaEnCacheMixin, generics.RetrieveUpdateDestroyAPIView):
+    presupuesto_consultas = 2  # sello ETag + libro
+    grupos_cache = ('libro:{pk}',)
+    queryset = Libro.objects.con_conteo_ejemplares()
     serializer_class = LibroSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -109,83 +215,59 @@ class LibroObtenerActualizarEliminarVistaAPI(generics.RetrieveUpdateDestroyAPIVi
 
 # Buscar libros por filtros
 class LibroBuscarVistaAPI(ListaAPIViewConMensajeVacio):
+    presupuesto_consultas = 1
+    lectura_en_replica = True
     serializer_class = LibroSerializer
 
+    @property
+    def orden_cursor(self):
+        # Con q= se pagina por relevancia; si no, por id
+        if self.request.query_params.get('q'):
+            return ('-relevancia', 'id')
+        return 'id'
+
     def get_queryset(self):
-        queryset = Libro.objects.all()
-        titulo = self.request.query_params.get('titulo')
-        autor = self.request.query_params.get('autor')
-        isbn = self.request.query_params.get('isbn')
-        genero = self.request.query_params.get('genero')
-        ano_publicacion = self.request.query_params.get('ano_publicacion')
-        disponible = self.request.query_params.get('disponible')
-        sucursal = self.request.query_params.get('sucursal')
-        # Filtro
-        if titulo:
-            queryset = queryset.filter(titulo__icontains=titulo)
-        if autor:
-            queryset = queryset.filter(autor__icontains=autor)
-        if isbn:
-            queryset = queryset.filter(isbn__icontains=isbn)
-        if genero:
-            queryset = queryset.filter(genero__icontains=genero)
-        if ano_publicacion:
-            queryset = queryset.filter(ano_publicacion=ano_publicacion)
-        if disponible == 'true':
-            queryset = queryset.filter(ejemplares__estado='disponible').distinct()
-        if sucursal:
-            queryset = queryset.filter(ejemplares__sucursal__id=sucursal).distinct()
-        return queryset
+        return filtrar_libros(Libro.objects.all(), self.request.query_params).con_conteo_ejemplares()
 
 # Consultar la disponibilidad de ejemplares de un libro
+@condicional(sello_disponibilidad)
 class LibroDisponibilidadVistaAPI(generics.RetrieveAPIView):
-    queryset = Libro.objects.all()
+    presupuesto_consultas = 5  # sello ETag (2) + libro + contadores + reservas
+    lectura_en_replica = True
+    queryset = Libro.objects.only('id')
     serializer_class = LibroSerializer
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        ejemplares = instance.ejemplares.all()
-        total = ejemplares.count()
-        disponibles = ejemplares.filter(estado='disponible').count()
-        prestados = ejemplares.filter(estado='prestado').count()
-        mantenimiento = ejemplares.filter(estado='mantenimiento').count()
-
-        # Por sucursales
-        sucursales = {}
-        for ejemplar in ejemplares:
-            nombre_sucursal = ejemplar.sucursal.nombre
-            if nombre_sucursal not in sucursales:
-                sucursales[nombre_sucursal] = {"disponibles": 0, "prestados": 0, "mantenimiento": 0}
-            if ejemplar.estado == "disponible":
-                sucursales[nombre_sucursal]["disponibles"] += 1
-            elif ejemplar.estado == "prestado":
-                sucursales[nombre_sucursal]["prestados"] += 1
-            elif ejemplar.estado == "mantenimiento":
-                sucursales[nombre_sucursal]["mantenimiento"] += 1
-            else:
-                pass
-
-        por_sucursal = [
-            {
-                "sucursal": nombre,
-                "disponibles": datos["disponibles"],
-                "prestados": datos["prestados"],
-                "mantenimiento": datos["mantenimiento"]
-            }
-            for nombre, datos in sucursales.items()
-        ]
-
-        # Reservas pendientes
-        reservas_pendientes = instance.reservas.filter(estado='en cola').count()
-
-        return Response({
-            "total_ejemplares": total,
-            "disponibles": disponibles,
-            "prestados": prestados,
-            "mantenimiento": mantenimiento,
-            "por_sucursal": por_sucursal,
-            "reservas_pendientes": reservas_pendientes
-        })
+        return Response(Libro.resumen_disponibilidad([instance.pk])[instance.pk])
+
+# Consultar la disponibilidad de varios libros (?ids=1,2,3)
+@condicional(sello_disponibilidad_lote)
+class LibroDisponibilidadLoteVistaAPI(APIView):
+    presupuesto_consultas = 5  # sello ETag (2) + libros + contadores + reservas
+    lectura_en_replica = True
+    max_libros = 200
+
+    @classmethod
+    def leer_ids(cls, parametros):
+        """(ids, None) o (None, mensaje de error) a partir de ?ids=."""
+        try:
+            ids = [int(i) for i in parametros.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return None, 'El parámetro ids debe ser una lista de enteros separados por coma.'
+        if not ids:
+            return None, 'Debes proporcionar al menos un ID de libro.'
+        if len(ids) > cls.max_libros:
+            return None, f'No se pueden consultar más de {cls.max_libros} libros a la vez.'
+        return ids, None
+
+    def get(self, request, *args, **kwargs):
+        ids, error = self.leer_ids(request.query_params)
+        if error:
+            return Response({'error': error}, status=400)
+        existentes = list(Libro.objects.filter(pk__in=ids).values_list('id', flat=True))
+        resumen = Libro.resumen_disponibilidad(existentes)
+        return Response([{"libro": libro_id, **resumen[libro_id]} for libro_id in sorted(existentes)])
 
 # Listar y crear préstamos
 class PrestamoListaCrearVistaAPI(ListaAPIViewConMensajeVacio, generics.CreateAPIView):
@@ -204,6 +286,10 @@ class PrestamoListaCrearVistaAPI(ListaAPIViewConMensajeVacio, generics.CreateAPI
             return Prestamo.objects.all()
         return Prestamo.objects.filter(usuario=usuario)
 
+    def perform_create(self, serializer):
+        # Préstamo y estado del ejemplar en una transacción con locks
+        prestar(serializer)
+
 # Ver Préstamos
 class PrestamoObtenerVistaAPI(generics.RetrieveAPIView):
     queryset = Prestamo.objects.all()
@@ -221,21 +307,7 @@ class PrestamoDevolverVistaAPI(generics.UpdateAPIView):
         return [permissions.IsAuthenticated()]
 
     def update(self, request, *args, **kwargs):
-        instance = self.get_object()
-        fecha_real_devolucion = timezone.now().date()
-        fecha_entrega_estipulada = instance.fecha_devolucion
-
-        instance.estado = 'devuelto'
-        instance.fecha_devolucion = fecha_real_devolucion
-
-        # Cálculo de multa
-        if fecha_real_devolucion > fecha_entrega_estipulada:
-            dias_retraso = (fecha_real_devolucion - fecha_entrega_estipulada).days
-            instance.multa = dias_retraso * 1000  # 1000 por dia de retraso
-        else:
-            instance.multa = 0
-
-        instance.save()
+        instance = devolver(self.get_object())
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -271,10 +343,8 @@ class ReservaListaCrearVistaAPI(ListaAPIViewConMensajeVacio, generics.CreateAPIV
         return [permissions.IsAuthenticated()]
 
     def perform_create(self, serializer):
-        libro = serializer.validated_data['libro']
         # Calcular posicion en cola
-        posicion = Reserva.objects.filter(libro=libro, estado='en cola').count() + 1
-        serializer.save(usuario=self.request.user, posicion_cola=posicion)
+        encolar_reserva(serializer, self.request.user)
 
 # Eliminar una reserva
 class ReservaEliminarVistaAPI(generics.DestroyAPIView):
@@ -300,28 +370,27 @@ class ReservaCancelarVistaAPI(generics.UpdateAPIView):
     #cola
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
-        libro = instance.libro
-        posicion_cancelada = instance.posicion_cola
-        instance.estado = 'cancelada'
-        instance.save()
-        # Avanzar la cola
-        reservas = Reserva.objects.filter(libro=libro, estado='en cola', posicion_cola__gt=posicion_cancelada)
-        for reserva in reservas:
-            reserva.posicion_cola -= 1
-            reserva.save()
+        # Cancelar y avanzar la cola
+        cancelar_reserva(instance)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
 # Ver la cola de reservas de un libro
-class ReservaColaVistaAPI(ListaAPIViewConMensajeVacio):
+class ReservaColaVistaAPI(RespuestaEnCacheMixin, ListaAPIViewConMensajeVacio):
+    presupuesto_consultas = 1
+    grupos_cache = ('cola:{libro_id}',)
     serializer_class = ReservaSerializer
+    orden_cursor = ('posicion_cola', 'id')
 
     def get_queryset(self):
         libro_id = self.kwargs['libro_id']
         return Reserva.objects.filter(libro_id=libro_id).order_by('posicion_cola')
 
 # Listar y crear sucursales
-class SucursalListaCrearVistaAPI(generics.ListCreateAPIView):
+@condicional(sello_sucursales)
+class SucursalListaCrearVistaAPI(RespuestaEnCacheMixin, generics.ListCreateAPIView):
+    presupuesto_consultas = 1  # listado (el sello ETag sale de api.cache)
+    grupos_cache = ('sucursales',)
     queryset = Sucursal.objects.all()
     serializer_class = SucursalSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -332,21 +401,29 @@ class SucursalListaCrearVistaAPI(generics.ListCreateAPIView):
         return [permissions.IsAuthenticated()]
 
 # Obtener una sucursal
-class SucursalObtenerVistaAPI(generics.RetrieveAPIView):
+@condicional(sello_sucursal)
+class SucursalObtenerVistaAPI(RespuestaEnCacheMixin, generics.RetrieveAPIView):
+    presupuesto_consultas = 2  # sello ETag + sucursal
+    grupos_cache = ('sucursal:{pk}',)
     queryset = Sucursal.objects.all()
     serializer_class = SucursalSerializer
 
 # Ver el inventario de una sucursal
 class SucursalInventarioVistaAPI(ListaAPIViewConMensajeVacio):
+    presupuesto_consultas = 2  # ejemplares + libros con sus contadores
+    lectura_en_replica = True
     serializer_class = EjemplarSerializer
+    orden_cursor = 'id'
 
     def get_queryset(self):
         sucursal_id = self.kwargs['pk']
-        return Ejemplar.objects.filter(sucursal_id=sucursal_id)
+        return Ejemplar.objects.filter(sucursal_id=sucursal_id).prefetch_related(
+            Prefetch('libro', queryset=Libro.objects.con_conteo_ejemplares())
+        )
 
 # Transferir un ejemplar
 class EjemplarTransferirVistaAPI(generics.UpdateAPIView):
-    queryset = Ejemplar.objects.all()
+    queryset = Ejemplar.objects.prefetch_related(Prefetch('libro', queryset=Libro.objects.con_conteo_ejemplares()))
     serializer_class = EjemplarSerializer
     permission_classes = [EsAdmin]
 
@@ -360,68 +437,238 @@ class EjemplarTransferirVistaAPI(generics.UpdateAPIView):
         nueva_sucursal_id = request.data.get('sucursal_id')
         if not nueva_sucursal_id:
             return Response({'error': 'Debes proporcionar el ID de la nueva sucursal.'}, status=400)
-        try:
-            nueva_sucursal = Sucursal.objects.get(pk=nueva_sucursal_id)
-        except Sucursal.DoesNotExist:
+        if not Sucursal.objects.filter(pk=nueva_sucursal_id).exists():
             return Response({'error': 'Sucursal no encontrada.'}, status=404)
-        instance.sucursal = nueva_sucursal
-        instance.save()
+        instance.sucursal_id = nueva_sucursal_id
+        instance.save(update_fields=['sucursal'])
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
-# Reporte de libros más populares
-class ReporteLibrosPopularesVistaAPI(ListaAPIViewConMensajeVacio):
+# Carga masiva de ejemplares (JSON o CSV con columnas libro, sucursal, codigo_barras, estado)
+class EjemplarCargaMasivaVistaAPI(APIView):
     permission_classes = [EsBibliotecarioOAdmin]
-    serializer_class = PrestamoSerializer
 
-    def get_queryset(self):
-        # Más prestados
-        datos = (
-            Prestamo.objects.values('ejemplar__libro__titulo')
-            .annotate(total=Count('id'))
-            .order_by('-total')[:5]
-        )
-        return datos
+    def post(self, request, *args, **kwargs):
+        filas = leer_filas(request)
+        if not filas:
+            return Response({'error': 'Debes enviar una lista de ejemplares o un archivo CSV.'}, status=400)
+        ejemplares, errores = validar_ejemplares(filas)
+        if errores:
+            # Todo o nada: no se inserta ningún ejemplar si alguna fila es inválida
+            return Response({'errores': errores}, status=400)
+        try:
+            creados = crear_ejemplares(ejemplares)
+        except ConflictoCarga:
+            # Un código de barras o una referencia cambió entre la validación y el INSERT; no se insertó nada
+            return Response(
+                {'error': 'Otra operación modificó los ejemplares durante la carga. Vuelve a intentarlo.'},
+                status=409,
+            )
+        return Response({'creados': creados}, status=201)
+
+# Transferir varios ejemplares a una sucursal
+class EjemplarTransferirMasivoVistaAPI(APIView):
+    permission_classes = [EsAdmin]
 
-    def list(self, request, *args, **kwargs):
-        queryset = list(self.get_queryset())
-        if not queryset:
+    def post(self, request, *args, **kwargs):
+        codigos = request.data.get('codigos_barras')
+        nueva_sucursal_id = request.data.get('sucursal_id')
+        if not nueva_sucursal_id:
+            return Response({'error': 'Debes proporcionar el ID de la nueva sucursal.'}, status=400)
+        if not isinstance(codigos, list) or not codigos:
+            return Response({'error': 'Debes proporcionar una lista de códigos de barras.'}, status=400)
+        # Por str(): rechaza también 1.5 y true, que int() convertiría en silencio
+        try:
+            nueva_sucursal_id = int(str(nueva_sucursal_id))
+        except ValueError:
+            return Response({'error': 'El ID de la sucursal debe ser un número entero.'}, status=400)
+        if not Sucursal.objects.filter(pk=nueva_sucursal_id).exists():
+            return Response({'error': 'Sucursal no encontrada.'}, status=404)
+        transferidos, no_encontrados = transferir_ejemplares([str(c) for c in codigos], nueva_sucursal_id)
+        return Response({'transferidos': transferidos, 'no_encontrados': no_encontrados})
+
+# Base de los reportes: leen los resúmenes diarios (api.resumenes), no la tabla de préstamos,
+# así su costo depende de los días y claves del rango y no del historial. ?desde= y ?hasta= (AAAA-MM-DD);
+# sin ellos, los últimos `dias_por_defecto` días hasta hoy. Cada reporte fija `modelo` y define reporte()
+class ReporteResumenVistaAPI(APIView):
+    lectura_en_replica = True
+    permission_classes = [EsBibliotecarioOAdmin]
+    mensaje_vacio = {'Alerta': 'No existen datos.'}
+    dias_por_defecto = 365
+    modelo = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.modelo is None or not callable(getattr(cls, 'reporte', None)):
+            raise ImproperlyConfigured(f'{cls.__name__} debe definir `modelo` y reporte(resumenes).')
+
+    def rango_de_fechas(self, request):
+        """(desde, hasta) del reporte, o None si alguno no es una fecha válida."""
+        fechas = {}
+        for parametro in ('desde', 'hasta'):
+            valor = request.query_params.get(parametro)
+            if valor:
+                try:
+                    fechas[parametro] = parse_date(valor)
+                except ValueError:
+                    fechas[parametro] = None
+                if not fechas[parametro]:
+                    return None
+        hasta = fechas.get('hasta') or timezone.localdate()
+        desde = fechas.get('desde') or hasta - timedelta(days=self.dias_por_defecto)
+        return desde, hasta
+
+    def get(self, request, *args, **kwargs):
+        rango = self.rango_de_fechas(request)
+        if rango is None:
+            return Response({'error': 'Los parámetros desde y hasta deben ser fechas AAAA-MM-DD.'}, status=400)
+        datos = self.reporte(self.modelo.objects.filter(fecha__range=rango))
+        if not datos:
             return Response(self.mensaje_vacio)
-        return Response(queryset)
+        return Response(datos)
 
-# Reporte de usuarios con multas
+# Reporte de libros más populares
+class ReporteLibrosPopularesVistaAPI(ReporteResumenVistaAPI):
+    presupuesto_consultas = 1
+    modelo = ResumenDiarioLibro
+
+    def reporte(self, resumenes):
+        # Más prestados
+        filas = (
+            resumenes.values('libro_id', 'libro__titulo')
+            .annotate(total=Sum('prestamos'))
+            .filter(total__gt=0)
+            .order_by('-total', 'libro_id')[:5]
+        )
+        return [{'ejemplar__libro__titulo': fila['libro__titulo'], 'total': fila['total']} for fila in filas]
+
+# Reporte de morosidad: usuarios por multa acumulada (MultaUsuario), de mayor a menor.
+# ?umbral= multa mínima; ?top=N devuelve los N primeros sin paginar, si no, paginación por cursor
 class ReporteMorosidadVistaAPI(ListaAPIViewConMensajeVacio):
+    presupuesto_consultas = 1
+    lectura_en_replica = True
     permission_classes = [EsBibliotecarioOAdmin]
-    serializer_class = PrestamoSerializer
+    serializer_class = MorosidadSerializer
+    # Mismo sentido en ambos campos: se recorre el índice de total hacia atrás, sin ordenar.
+    # Los totales empatan mucho (multas en pasos de 1000, tope 9999.99): el cursor guarda el par completo
+    orden_cursor = ('-total', '-usuario_id')
+    max_top = 1000
+    umbral = Decimal(0)
 
     def get_queryset(self):
-        datos = (
-            Prestamo.objects.filter(multa__gt=0)
-            .values('usuario__username')
-            .annotate(total_multa=Count('multa'))
+        return (
+            MultaUsuario.objects.filter(total__gt=0, total__gte=self.umbral)
+            .select_related('usuario').only('total', 'prestamos_con_multa', 'usuario__username')
         )
-        return datos
+
+    def parametros(self, request):
+        """(umbral, top) de la consulta, o None si no son válidos."""
+        try:
+            umbral = Decimal(request.query_params.get('umbral', '0'))
+            top = int(request.query_params['top']) if 'top' in request.query_params else None
+        except (InvalidOperation, ValueError):
+            return None
+        if not umbral.is_finite() or (top is not None and not 0 < top <= self.max_top):
+            return None
+        return umbral, top
 
     def list(self, request, *args, **kwargs):
-        queryset = list(self.get_queryset())
-        if not queryset:
+        parametros = self.parametros(request)
+        if parametros is None:
+            return Response(
+                {'error': f'umbral debe ser un número y top un entero entre 1 y {self.max_top}.'}, status=400
+            )
+        self.umbral, top = parametros
+        if top is None:
+            return super().list(request, *args, **kwargs)
+        filas = list(self.get_queryset().order_by(*self.orden_cursor)[:top])
+        if not filas:
             return Response(self.mensaje_vacio)
-        return Response(queryset)
+        return Response(self.get_serializer(filas, many=True).data)
 
 # Reporte de estadísticas por sucursal
-class ReporteEstadisticasSucursalVistaAPI(ListaAPIViewConMensajeVacio):
+class ReporteEstadisticasSucursalVistaAPI(ReporteResumenVistaAPI):
+    presupuesto_consultas = 1
+    modelo = ResumenDiarioSucursal
+
+    def reporte(self, resumenes):
+        filas = (
+            resumenes.values('sucursal_id', 'sucursal__nombre')
+            .annotate(total=Sum('prestamos'))
+            .filter(total__gt=0)
+            .order_by('sucursal_id')
+        )
+        return [{'ejemplar__sucursal__nombre': fila['sucursal__nombre'], 'total': fila['total']} for fila in filas]
+
+# Exportación masiva en NDJSON o CSV (?formato=ndjson|csv, ?since=<id> o ?since=<AAAA-MM-DD>)
+class ExportacionVistaAPI(APIView):
     permission_classes = [EsBibliotecarioOAdmin]
-    serializer_class = PrestamoSerializer
+    queryset = None
+    campos = ()
+    campo_fecha = None
+    nombre_archivo = 'exportacion'
+
+    def get(self, request, *args, **kwargs):
+        formato = request.query_params.get('formato', 'ndjson')
+        if formato not in ('ndjson', 'csv'):
+            return Response({'error': 'Formato no soportado. Usa ndjson o csv.'}, status=400)
+        queryset = self.queryset.all()
+        since = request.query_params.get('since')
+        if since:
+            # Exportación incremental: por id o, si el modelo tiene fecha, por fecha
+            try:
+                fecha = parse_date(since) if self.campo_fecha else None
+            except ValueError:
+                # Bien formada pero inexistente (2024-02-30)
+                fecha = None
+            if since.isdigit():
+                queryset = queryset.filter(id__gt=int(since))
+            elif fecha:
+                queryset = queryset.filter(**{f'{self.campo_fecha}__gte': fecha})
+            else:
+                return Response({'error': 'El parámetro since debe ser un id o una fecha AAAA-MM-DD.'}, status=400)
 
-    def get_queryset(self):
-        datos = (
-            Prestamo.objects.values('ejemplar__sucursal__nombre')
-            .annotate(total=Count('id'))
-        )
-        return datos
+        filas = filas_por_keyset(queryset, self.campos)
+        if formato == 'csv':
+            respuesta = StreamingHttpResponse(csv_en_streaming(filas, self.campos), content_type='text/csv')
+        else:
+            respuesta = StreamingHttpResponse(ndjson_en_streaming(filas), content_type='application/x-ndjson')
+        respuesta['Content-Disposition'] = f'attachment; filename="{self.nombre_archivo}.{formato}"'
+        return respuesta
 
-    def list(self, request, *args, **kwargs):
-        queryset = list(self.get_queryset())
-        if not queryset:
-            return Response(self.mensaje_vacio)
-        return Response(queryset)
\ No newline at end of file
+# Exportar préstamos
+class ExportarPrestamosVistaAPI(ExportacionVistaAPI):
+    queryset = Prestamo.objects.all()
+    campos = (
+        'id', 'usuario_id', 'usuario__username', 'ejemplar_id', 'ejemplar__codigo_barras',
+        'ejemplar__libro_id', 'ejemplar__libro__titulo', 'ejemplar__sucursal_id',
+        'fecha_prestamo', 'fecha_devolucion', 'estado', 'multa',
+    )
+    campo_fecha = 'fecha_prestamo'
+    nombre_archivo = 'prestamos'
+
+# Exportar ejemplares
+class ExportarEjemplaresVistaAPI(ExportacionVistaAPI):
+    queryset = Ejemplar.objects.all()
+    campos = (
+        'id', 'codigo_barras', 'estado', 'libro_id', 'libro__titulo', 'libro__isbn',
+        'sucursal_id', 'sucursal__nombre',
+    )
+    nombre_archivo = 'ejemplares'
+
+# Exportar reservas
+class ExportarReservasVistaAPI(ExportacionVistaAPI):
+    queryset = Reserva.objects.all()
+    campos = (
+        'id', 'usuario_id', 'usuario__username', 'libro_id', 'libro__titulo',
+        'fecha_reserva', 'estado', 'posicion_cola',
+    )
+    campo_fecha = 'fecha_reserva__date'
+    nombre_archivo = 'reservas'
+
+# Aciertos y fallos de la caché de respuestas por vista
+class CacheEstadisticasVistaAPI(APIView):
+    permission_classes = [EsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(estadisticas())
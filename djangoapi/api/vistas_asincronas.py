@@ -0,0 +1,163 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.request import Request
+from .autenticacion import JWTAutenticacionSinConsulta
+from .busqueda import filtrar_libros
+from .condicional import respuesta_condicional, sello_disponibilidad, sello_disponibilidad_lote, sello_libros
+from .models import Ejemplar, Libro, Reserva
+from .paginacion import PaginacionCursor
+from .serializers import EjemplarSerializer, LibroSerializer, ReservaSerializer
+from .views import LibroDisponibilidadLoteVistaAPI
+
+# Lecturas del catálogo y la disponibilidad como vistas asíncronas, para servir con ASGI (djangoapi.asgi).
+# DRF no tiene vistas asíncronas: son vistas de Django con las mismas respuestas y permisos que sus pares de
+# api.views, sin la caché de respuestas ni ?stream=true. El ORM asíncrono corre cada consulta en un hilo con
+# sync_to_async, y aquí también la paginación por cursor de DRF y los sellos ETag; lo que no ocupa un hilo
+# es el resto de la petición (recibir el cuerpo, enviar la respuesta a un cliente lento).
+
+
+def _json(datos, status=200):
+    return JsonResponse(datos, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+async def _lista(queryset):
+    return [fila async for fila in queryset]
+
+
+# Base: JWT (si `autenticacion_requerida`), peticiones condicionales con `sello` y errores de DRF como JSON
+class VistaAsincrona(View):
+    http_method_names = ['get', 'head', 'options']
+    autenticacion_requerida = False
+    sello = None
+    mensaje_vacio = {'Alerta': 'No existen datos.'}
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if self.autenticacion_requerida:
+                await self.autenticar(request)
+            if self.sello is None or request.method not in ('GET', 'HEAD'):
+                return await super().dispatch(request, *args, **kwargs)
+            return await respuesta_condicional(
+                request, self.sello, lambda: super(VistaAsincrona, self).dispatch(request, *args, **kwargs), **kwargs
+            )
+        except APIException as error:
+            respuesta = _json({'detail': error.detail}, status=error.status_code)
+            if isinstance(error, NotAuthenticated):
+                respuesta['WWW-Authenticate'] = JWTAutenticacionSinConsulta().authenticate_header(request)
+            return respuesta
+
+    async def autenticar(self, request):
+        # En un hilo: con tokens sin el claim 'tipo' la autenticación consulta Usuario
+        autenticado = await sync_to_async(JWTAutenticacionSinConsulta().authenticate)(request)
+        if autenticado is None:
+            raise NotAuthenticated()
+        request.user = autenticado[0]
+
+
+# Listado con paginación por cursor y mensaje si no hay datos (como ListaAPIViewConMensajeVacio).
+# Cada listado fija `serializer_class` y define get_queryset()
+class ListaVistaAsincrona(VistaAsincrona):
+    serializer_class = None
+    orden_cursor = '-id'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.serializer_class is None or not callable(getattr(cls, 'get_queryset', None)):
+            raise ImproperlyConfigured(f'{cls.__name__} debe definir `serializer_class` y get_queryset().')
+
+    async def get(self, request, *args, **kwargs):
+        self.request = Request(request)
+        paginador = PaginacionCursor()
+        pagina = await sync_to_async(paginador.paginate_queryset)(self.get_queryset(), self.request, self)
+        if not pagina and paginador.es_primera_pagina(self.request):
+            return _json(self.mensaje_vacio)
+        return _json({
+            'next': paginador.get_next_link(),
+            'previous': paginador.get_previous_link(),
+            'results': self.serializer_class(pagina, many=True).data,
+        })
+
+
+# GET async/libros/
+class LibroListaVistaAsincrona(VistaAsincrona):
+    presupuesto_consultas = 1  # listado (el sello ETag sale de api.cache)
+    autenticacion_requerida = True
+    sello = staticmethod(sello_libros)
+
+    async def get(self, request, *args, **kwargs):
+        libros = await _lista(Libro.objects.con_conteo_ejemplares())
+        return _json(LibroSerializer(libros, many=True).data)
+
+
+# GET async/libros/buscar/
+class LibroBuscarVistaAsincrona(ListaVistaAsincrona):
+    presupuesto_consultas = 1
+    lectura_en_replica = True
+    serializer_class = LibroSerializer
+
+    @property
+    def orden_cursor(self):
+        if self.request.query_params.get('q'):
+            return ('-relevancia', 'id')
+        return 'id'
+
+    def get_queryset(self):
+        return filtrar_libros(Libro.objects.all(), self.request.query_params).con_conteo_ejemplares()
+
+
+# GET async/libros/<pk>/disponibilidad/
+class LibroDisponibilidadVistaAsincrona(VistaAsincrona):
+    presupuesto_consultas = 5  # sello ETag (2) + libro + contadores + reservas
+    lectura_en_replica = True
+    sello = staticmethod(sello_disponibilidad)
+
+    async def get(self, request, pk):
+        # El ORM asíncrono corre cada consulta en el hilo de la petición, sobre su única conexión: van en serie
+        if not await Libro.objects.filter(pk=pk).aexists():
+            # Mismo mensaje que get_object_or_404 en la vista síncrona
+            raise NotFound(f'No {Libro._meta.object_name} matches the given query.')
+        contadores, reservas = [await _lista(consulta) for consulta in Libro.consultas_disponibilidad([pk])]
+        return _json(Libro.armar_disponibilidad([pk], contadores, reservas)[pk])
+
+
+# GET async/libros/disponibilidad/?ids=1,2,3
+class LibroDisponibilidadLoteVistaAsincrona(VistaAsincrona):
+    presupuesto_consultas = 5  # sello ETag (2) + libros + contadores + reservas
+    lectura_en_replica = True
+    sello = staticmethod(sello_disponibilidad_lote)
+
+    async def get(self, request, *args, **kwargs):
+        ids, error = LibroDisponibilidadLoteVistaAPI.leer_ids(request.GET)
+        if error:
+            return _json({'error': error}, status=400)
+        existentes = await _lista(Libro.objects.filter(pk__in=ids).values_list('id', flat=True))
+        contadores, reservas = [await _lista(consulta) for consulta in Libro.consultas_disponibilidad(ids)]
+        resumen = Libro.armar_disponibilidad(existentes, contadores, reservas)
+        return _json([{"libro": libro_id, **resumen[libro_id]} for libro_id in sorted(existentes)])
+
+
+# GET async/sucursales/<pk>/inventario/
+class SucursalInventarioVistaAsincrona(ListaVistaAsincrona):
+    presupuesto_consultas = 2  # ejemplares + libros con sus contadores
+    lectura_en_replica = True
+    serializer_class = EjemplarSerializer
+    orden_cursor = 'id'
+
+    def get_queryset(self):
+        return Ejemplar.objects.filter(sucursal_id=self.kwargs['pk']).prefetch_related(
+            Prefetch('libro', queryset=Libro.objects.con_conteo_ejemplares())
+        )
+
+
+# GET async/reservas/cola/<libro_id>/
+class ReservaColaVistaAsincrona(ListaVistaAsincrona):
+    presupuesto_consultas = 1
+    serializer_class = ReservaSerializer
+    orden_cursor = ('posicion_cola', 'id')
+
+    def get_queryset(self):
+        return Reserva.objects.filter(libro_id=self.kwargs['libro_id']).order_by('posicion_cola')
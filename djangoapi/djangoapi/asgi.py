@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proyecto_api.settings')
+# Conexiones por petición: las persistentes no se reutilizan entre los hilos de sync_to_async (ver settings)
+os.environ.setdefault('DJANGO_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# Solo los procesos del servidor arrancan el barrido en proceso (no los comandos de gestión ni los tests)
+from api.tareas import iniciar_programador  # noqa: E402
+
+iniciar_programador()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -35,6 +36,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', # Middleware para manejar CORS
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.PresupuestoConsultasMiddleware', # Consultas por petición (Server-Timing y presupuesto)
+    'api.middleware.ReplicasLecturaMiddleware', # Lecturas de reportes y catálogo en réplicas
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,10 +75,40 @@ DATABASES = {
         'ENGINE': 'django.db.backends.mysql',
         'NAME': 'biblioteca',
         'USER': 'root',
-        'PASSWORD': ''
+        'PASSWORD': '',
+        # Cada proceso reutiliza su conexión hasta CONN_MAX_AGE segundos (0 = una por petición,
+        # None = sin límite) y comprueba que siga viva antes de reutilizarla. djangoapi.asgi pone
+        # DJANGO_CONN_MAX_AGE=0: con ASGI cada petición corre su ORM en un hilo propio y una conexión
+        # persistente quedaría abierta en cada hilo sin reutilizarse
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Réplicas de lectura (api.replicas): alias de DATABASES a los que van las lecturas de las vistas con
+# `lectura_en_replica = True`, p. ej. 'replica1': {..., 'HOST': 'replica1'} y REPLICAS_LECTURA = ['replica1'].
+# Vacío = todo a 'default'. Quien escribe lee de 'default' durante REPLICAS_PEGAJOSA_SEGUNDOS, que debe
+# superar el retraso de replicación habitual.
+DATABASE_ROUTERS = ['api.replicas.EnrutadorReplicas']
+REPLICAS_LECTURA = []
+REPLICAS_PEGAJOSA_SEGUNDOS = 5
+
+
+# Hash de contraseñas. El primero se usa para los hashes nuevos y los demás solo para verificar los
+# existentes, que Django rehace con el primero en el siguiente login. Se puede poner primero
+# ScryptPasswordHasher o Argon2PasswordHasher (requiere argon2-cffi); ver bench_login.
+PASSWORD_HASHERS = [
+    'api.hashers.PBKDF2Configurable',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+HASH_PBKDF2_ITERACIONES = 1_000_000  # valor por defecto de Django 5.2
+
+# Procesos para hashear contraseñas en el comando crear_usuarios (None = uno por CPU); la vista hashea en línea
+CARGA_USUARIOS_PROCESOS = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -124,7 +157,8 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Configuración de autenticación JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT con id y tipo en el token: sin consulta de Usuario por petición (api.autenticacion)
+        'api.autenticacion.JWTAutenticacionSinConsulta',
     )
 }
 AUTH_USER_MODEL = 'api.Usuario'
@@ -132,4 +166,50 @@ AUTH_USER_MODEL = 'api.Usuario'
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),     
-}
\ No newline at end of file
+    # El tipo de usuario va como claim del token; un cambio de tipo se aplica al refrescar el access token
+    "TOKEN_OBTAIN_SERIALIZER": "api.autenticacion.TokenBibliotecaSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.autenticacion.TokenRefrescoSerializer",
+}
+
+# Barrido de préstamos vencidos en proceso (segundos entre ejecuciones); None = desactivado, usar cron
+# con `python manage.py marcar_prestamos_vencidos`
+BARRIDO_VENCIDOS_INTERVALO = None
+
+# Caché de respuestas de lectura (api.cache). En producción, 'respuestas' debe apuntar a un backend
+# compartido por todos los procesos, p. ej. django.core.cache.backends.redis.RedisCache con
+# maxmemory-policy allkeys-lru; locmem es por proceso y sirve para desarrollo y tests.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respuestas': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'respuestas',
+        'TIMEOUT': 300,  # TTL en segundos
+        'OPTIONS': {'MAX_ENTRIES': 10000},  # locmem desaloja la entrada usada hace más tiempo
+    },
+    # Marcas que deben ver todos los procesos: estado de usuarios para revocar tokens (api.autenticacion)
+    # y "leer de la principal" tras escribir (api.replicas). En producción es obligatorio un backend
+    # compartido por todos los procesos, p. ej. RedisCache en una instancia propia con
+    # maxmemory-policy noeviction: con locmem cada proceso solo ve las marcas que escribió él y un usuario
+    # desactivado sigue entrando por los demás hasta que vence la marca. Una marca desalojada se vuelve a
+    # leer de la base de datos; MAX_ENTRIES alcanza para el estado de todos los usuarios activos.
+    'compartida': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'compartida',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Filas de Usuario que cargan las vistas que las necesitan (api.autenticacion); siempre por proceso
+    'usuarios': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'usuarios',
+        'TIMEOUT': 30,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Presupuesto de consultas por petición GET (api.middleware). Cada vista puede fijar el suyo con
+# `presupuesto_consultas`; al excederlo se registra un warning ('log') o se lanza una excepción ('error',
+# lo que usan los tests de api).
+PRESUPUESTO_CONSULTAS_POR_DEFECTO = 10
+PRESUPUESTO_CONSULTAS_ACCION = 'log'
@@ -1,6 +1,7 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 import api.views as v
+import api.vistas_asincronas as va
 
 urlpatterns = [
     # Autenticacion
@@ -12,10 +13,13 @@ urlpatterns = [
     path('libros/', v.LibroListaCrearVistaAPI.as_view()),
     path('libros/<int:pk>/', v.LibroObtenerActualizarEliminarVistaAPI.as_view()),
     path('libros/buscar/', v.LibroBuscarVistaAPI.as_view()),
+    path('libros/importar/', v.LibroImportarVistaAPI.as_view()),
     path('libros/<int:pk>/disponibilidad/', v.LibroDisponibilidadVistaAPI.as_view()),
+    path('libros/disponibilidad/', v.LibroDisponibilidadLoteVistaAPI.as_view()),
 
     # Usuarios
     path('usuarios/perfil/', v.UsuarioPerfilVistaAPI.as_view()),
+    path('usuarios/carga-masiva/', v.UsuarioCargaMasivaVistaAPI.as_view()),
     path('usuarios/historial-prestamos/', v.UsuarioHistorialPrestamosVistaAPI.as_view()),
     path('usuarios/mis-reservas/', v.UsuarioMisReservasVistaAPI.as_view()),
 
@@ -37,9 +41,27 @@ urlpatterns = [
     path('sucursales/<int:pk>/', v.SucursalObtenerVistaAPI.as_view()),
     path('sucursales/<int:pk>/inventario/', v.SucursalInventarioVistaAPI.as_view()),
     path('ejemplares/<int:pk>/transferir/', v.EjemplarTransferirVistaAPI.as_view()),
+    path('ejemplares/carga-masiva/', v.EjemplarCargaMasivaVistaAPI.as_view()),
+    path('ejemplares/transferir-masivo/', v.EjemplarTransferirMasivoVistaAPI.as_view()),
 
     # Reportes
     path('reportes/populares/', v.ReporteLibrosPopularesVistaAPI.as_view()),
     path('reportes/morosidad/', v.ReporteMorosidadVistaAPI.as_view()),
     path('reportes/estadisticas-sucursal/', v.ReporteEstadisticasSucursalVistaAPI.as_view()),
+
+    # Exportaciones
+    path('exportar/prestamos/', v.ExportarPrestamosVistaAPI.as_view()),
+    path('exportar/ejemplares/', v.ExportarEjemplaresVistaAPI.as_view()),
+    path('exportar/reservas/', v.ExportarReservasVistaAPI.as_view()),
+
+    # Caché de respuestas
+    path('cache/estadisticas/', v.CacheEstadisticasVistaAPI.as_view()),
+
+    # Lecturas asíncronas (para ASGI); mismas respuestas que las rutas sin el prefijo
+    path('async/libros/', va.LibroListaVistaAsincrona.as_view()),
+    path('async/libros/buscar/', va.LibroBuscarVistaAsincrona.as_view()),
+    path('async/libros/<int:pk>/disponibilidad/', va.LibroDisponibilidadVistaAsincrona.as_view()),
+    path('async/libros/disponibilidad/', va.LibroDisponibilidadLoteVistaAsincrona.as_view()),
+    path('async/sucursales/<int:pk>/inventario/', va.SucursalInventarioVistaAsincrona.as_view()),
+    path('async/reservas/cola/<int:libro_id>/', va.ReservaColaVistaAsincrona.as_view()),
 ]
\ No newline at end of file
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proyecto_api.settings')
 
 application = get_wsgi_application()
+
+# Solo los procesos del servidor arrancan el barrido en proceso (no los comandos de gestión ni los tests)
+from api.tareas import iniciar_programador  # noqa: E402
+
+iniciar_programador()